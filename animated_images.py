@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Animated Image Conversion
+Streams the frames of animated GIFs into animated WebP (and AVIF) files one at
+a time, so memory use stays flat however long the animation is
+"""
+
+from PIL import Image
+
+def is_animated(img):
+    """Check if an opened image has more than one frame"""
+    return getattr(img, 'is_animated', False) and getattr(img, 'n_frames', 1) > 1
+
+def frame_durations(img):
+    """
+    Display time of every frame in milliseconds
+    
+    Frames are only decoded one at a time; the image is left on its first frame.
+    """
+    durations = []
+    
+    for frame in range(img.n_frames):
+        img.seek(frame)
+        durations.append(img.info.get('duration', 0))
+    
+    img.seek(0)
+    return durations
+
+def loop_count(img):
+    """
+    Convert a GIF's loop setting to WebP/AVIF's total number of plays (0 = forever)
+    
+    A GIF without a loop extension plays once, and its loop count is the
+    number of repeats after the first play.
+    """
+    loop = img.info.get('loop')
+    
+    if loop is None:
+        return 1
+    if loop == 0:
+        return 0
+    return loop + 1
+
+class FrameStream(Image.Image):
+    """
+    Lazily transformed view of an animated image's frames
+    
+    The animated WebP and AVIF writers seek through each frame of the image
+    they save. This view seeks the source in step and holds just the current
+    frame, transformed (converted, resized) on demand, so no more than one
+    source frame and one output frame are in memory at once.
+    
+    The source decoder composites each frame onto the previous ones according
+    to its disposal method, so every frame handed over is a complete canvas.
+    """
+    
+    def __init__(self, source, transform=None):
+        super().__init__()
+        self._source = source
+        self._transform = transform or (lambda frame: frame.convert('RGBA'))
+        self._frame = None
+        self.n_frames = source.n_frames
+        self.is_animated = True
+        self.seek(0)
+    
+    def seek(self, frame):
+        """Move to a frame of the source and transform it"""
+        if frame == self._frame:
+            return
+        
+        self._source.seek(frame)
+        image = self._transform(self._source)
+        
+        self.im = image.im
+        self._mode = image.mode
+        self._size = image.size
+        self._frame = frame
+    
+    def tell(self):
+        """Current frame number"""
+        return self._frame
+
+def save_animated(img, output_path, format, durations, transform=None, **params):
+    """
+    Write an animated image frame by frame
+    
+    Args:
+        img: Opened animated source image
+        output_path: Path of the file to write
+        format: 'WEBP' or 'AVIF'
+        durations: Per-frame durations from frame_durations()
+        transform: Callable turning a source frame into an output frame,
+                   e.g. to resize it; defaults to converting to RGBA
+        **params: Encoder settings (quality, method, ...)
+    
+    Returns:
+        Size of the first output frame as (width, height)
+    """
+    stream = FrameStream(img, transform)
+    
+    stream.save(output_path, format, save_all=True, duration=durations,
+                loop=loop_count(img), **params)
+    
+    return stream.size
@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+"""
+Image Pipeline Benchmarks
+Measures throughput of the WebP conversion scripts on a sample of project images,
+and of the reference rewriter on the project's code
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import PIL
+from PIL import Image, ImageChops, ImageStat
+
+from convert_to_webp import ENCODER_PROFILES, find_and_convert_images, find_image_files
+from create_responsive_webp import (SIZES, convert_to_rgb, process_all_images, reduced_decode,
+                                    resize_image)
+from image_metrics import peak_rss_kb, reset_peak_rss
+from legacy_fallbacks import to_srgb
+from synthetic_corpus import CORPUS_FILENAME, CORPUS_LAYOUT, DEFAULT_RESOLUTIONS, generate_corpus
+from update_images_to_webp import (REFERENCE_PATTERNS, REWRITTEN_EXTENSIONS, find_code_files,
+                                   find_webp_files, find_webp_reference, plan_totals,
+                                   scan_references, update_all_files)
+
+# Version of the suite's JSON results format
+RESULTS_VERSION = 1
+
+# Slowdown or peak memory growth against a baseline run that counts as a regression
+REGRESSION_THRESHOLD = 0.10
+
+def copy_sample(source_dir, dest_dir, limit=None):
+    """
+    Copy source images (without their WebP outputs) into a scratch directory
+    
+    Returns:
+        Number of images copied
+    """
+    image_files = find_image_files(Path(source_dir))
+    if limit:
+        image_files = image_files[:limit]
+    
+    for index, file_path in enumerate(image_files):
+        # Prefix with the index so same-named files from different folders don't collide
+        shutil.copy2(file_path, Path(dest_dir) / f"{index:04d}-{file_path.name}")
+    
+    return len(image_files)
+
+def time_run(func, source_dir, limit, **kwargs):
+    """
+    Run a pipeline function on a fresh copy of the sample
+    
+    Returns:
+        tuple: (image_count, seconds)
+    """
+    with tempfile.TemporaryDirectory(prefix='webp-bench-') as scratch:
+        count = copy_sample(source_dir, scratch, limit)
+        
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            func(scratch, **kwargs)
+        elapsed = time.perf_counter() - start
+    
+    return count, elapsed
+
+def benchmark_jobs(source_dir, limit=None, job_counts=None):
+    """Compare images/second at several worker counts for both converters"""
+    cpu_count = os.cpu_count() or 1
+    job_counts = job_counts or sorted({1, 2, 4, cpu_count})
+    
+    print(f"\n⏱️  Parallel conversion benchmark ({cpu_count} CPUs)")
+    print(f"   Sample: {source_dir} (limit: {limit or 'all'})\n")
+    print(f"   {'Stage':<26}{'Jobs':>6}{'Images':>8}{'Seconds':>10}{'Images/s':>10}{'Speedup':>9}")
+    print("   " + "-"*69)
+    
+    stages = [
+        ('find_and_convert_images', find_and_convert_images),
+        ('process_all_images', process_all_images),
+    ]
+    
+    for stage_name, func in stages:
+        baseline = None
+        
+        for jobs in job_counts:
+            count, elapsed = time_run(func, source_dir, limit, jobs=jobs)
+            rate = count / elapsed if elapsed else 0.0
+            baseline = baseline or rate
+            speedup = rate / baseline if baseline else 0.0
+            
+            print(f"   {stage_name:<26}{jobs:>6}{count:>8}{elapsed:>10.2f}{rate:>10.2f}{speedup:>8.2f}x")
+    
+    print()
+
+def resize_variants(image_path, fast):
+    """
+    Decode an image and produce every size a fresh build writes, the way
+    generate_responsive_images does: the full-size variant from the full decode,
+    and in fast mode the smaller sizes from a reduced decode, cascaded
+    
+    Returns:
+        dict: width (None for full size) -> PIL Image
+    """
+    widths = sorted((config['width'] for config in SIZES.values() if config['width']), reverse=True)
+    img = Image.open(image_path)
+    img.load()
+    img, _ = to_srgb(img)
+    img = convert_to_rgb(img)
+    variants = {None: img}
+    
+    if fast:
+        reduced = reduced_decode(image_path, widths[0], img.mode)
+        if reduced:
+            img, _ = reduced
+    
+    for width in widths:
+        resized = resize_image(img, width, fast)
+        variants[width] = resized
+        if fast:
+            img = resized
+    
+    return variants
+
+def measure_resize(image_path, fast):
+    """
+    Time one resize pass and record how far it pushed peak RSS up
+    
+    Returns:
+        tuple: (variants, seconds, peak_growth_kb or None)
+    """
+    baseline = peak_rss_kb() if reset_peak_rss() else None
+    start = time.perf_counter()
+    variants = resize_variants(image_path, fast)
+    elapsed = time.perf_counter() - start
+    growth = peak_rss_kb() - baseline if baseline is not None else None
+    
+    return variants, elapsed, growth
+
+def psnr(reference, candidate):
+    """Peak signal-to-noise ratio in dB between two RGB images (inf if identical)"""
+    if candidate.size != reference.size:
+        # Reduced decoding can round the height by a pixel
+        candidate = candidate.resize(reference.size, Image.Resampling.LANCZOS)
+    
+    rms = ImageStat.Stat(ImageChops.difference(reference, candidate)).rms
+    mse = sum(value ** 2 for value in rms) / len(rms)
+    
+    return float('inf') if mse == 0 else 20 * math.log10(255 / math.sqrt(mse))
+
+def benchmark_resize(source_dir, limit=None, min_psnr=40.0):
+    """Compare the default resize path with fast-resize mode, image by image"""
+    image_files = find_image_files(Path(source_dir))
+    if limit:
+        image_files = image_files[:limit]
+    
+    print(f"\n⏱️  Resize benchmark: full decode + LANCZOS vs full and reduced decode + cascade")
+    print(f"   Sample: {source_dir} ({len(image_files)} images, tolerance: PSNR >= {min_psnr} dB)\n")
+    print(f"   {'Image':<28}{'Default':>10}{'Fast':>10}{'Saved':>10}{'Peak saved':>12}{'Min PSNR':>10}")
+    print("   " + "-"*80)
+    
+    total_default = 0.0
+    total_fast = 0.0
+    failures = 0
+    
+    for image_path in image_files:
+        default_variants, default_time, default_peak = measure_resize(image_path, fast=False)
+        fast_variants, fast_time, fast_peak = measure_resize(image_path, fast=True)
+        
+        min_quality = min(psnr(default_variants[width], fast_variants[width])
+                          for width in default_variants)
+        within_tolerance = min_quality >= min_psnr
+        failures += not within_tolerance
+        total_default += default_time
+        total_fast += fast_time
+        
+        peak_saved = (f"{(default_peak - fast_peak) / 1024:.1f}MB"
+                      if default_peak is not None and fast_peak is not None else "n/a")
+        marker = "" if within_tolerance else "  ❌"
+        
+        print(f"   {image_path.name[:27]:<28}{default_time*1000:>8.0f}ms{fast_time*1000:>8.0f}ms"
+              f"{(default_time - fast_time)*1000:>8.0f}ms{peak_saved:>12}{min_quality:>8.1f}dB{marker}")
+    
+    print("   " + "-"*80)
+    print(f"   {'Total':<28}{total_default*1000:>8.0f}ms{total_fast*1000:>8.0f}ms"
+          f"{(total_default - total_fast)*1000:>8.0f}ms")
+    
+    if failures:
+        print(f"\n❌ {failures} images fell below the PSNR tolerance")
+    else:
+        print(f"\n✅ All images within tolerance")
+    print()
+
+def benchmark_encoders(source_dir, limit=10, methods=None, qualities=None):
+    """Encode a sample at each method/quality pair and tabulate encode time against bytes saved"""
+    methods = methods or sorted({config['method'] for config in ENCODER_PROFILES.values()} | {0})
+    qualities = qualities or sorted({config['quality'] for config in SIZES.values()})
+    profile_names = {config['method']: name for name, config in ENCODER_PROFILES.items()}
+    
+    image_files = find_image_files(Path(source_dir))[:limit]
+    
+    # Decode once up front so only the encoder is timed
+    images = [convert_to_rgb(Image.open(image_path)) for image_path in image_files]
+    source_bytes = sum(os.path.getsize(image_path) for image_path in image_files)
+    
+    print(f"\n⏱️  Encoder benchmark: {len(images)} images from {source_dir} "
+          f"({source_bytes/1024/1024:.2f} MB of sources)\n")
+    print(f"   {'Method':<16}{'Quality':>8}{'Encode':>10}{'WebP size':>12}{'Saved':>8}{'vs max':>9}")
+    print("   " + "-"*63)
+    
+    results = {}
+    for method in methods:
+        for quality in qualities:
+            start = time.perf_counter()
+            webp_bytes = 0
+            
+            for img in images:
+                buffer = io.BytesIO()
+                img.save(buffer, 'WEBP', quality=quality, method=method)
+                webp_bytes += buffer.tell()
+            
+            results[method, quality] = (time.perf_counter() - start, webp_bytes)
+    
+    max_method = ENCODER_PROFILES['max']['method']
+    for (method, quality), (elapsed, webp_bytes) in results.items():
+        label = f"{method} ({profile_names[method]})" if method in profile_names else str(method)
+        saved = (1 - webp_bytes / source_bytes) * 100 if source_bytes else 0.0
+        reference = results.get((max_method, quality))
+        versus_max = f"{(webp_bytes / reference[1] - 1) * 100:+.1f}%" if reference else "n/a"
+        
+        print(f"   {label:<16}{quality:>8}{elapsed*1000:>8.0f}ms{webp_bytes/1024:>10.1f}KB"
+              f"{saved:>7.1f}%{versus_max:>9}")
+    
+    print()
+
+def legacy_scan_references(content, webp_files):
+    """
+    The previous reference rewriter, kept as the baseline for scan_references()
+    
+    One regex pass per pattern, each match spliced into the full content string
+    and its line counted from the start of the file.
+    """
+    changes = []
+    
+    for pattern, pattern_type in REFERENCE_PATTERNS:
+        pattern = pattern.replace('{extensions}', REWRITTEN_EXTENSIONS)
+        matches = list(re.finditer(pattern, content, re.IGNORECASE))
+        
+        for match in reversed(matches):  # Reverse to maintain positions
+            image_path = match.group(1)
+            webp_path = find_webp_reference(image_path, webp_files)
+            
+            if webp_path:
+                new_text = match.group(0).replace(image_path, webp_path)
+                start, end = match.span()
+                content = content[:start] + new_text + content[end:]
+                changes.append({'line': content[:start].count('\n') + 1, 'old': image_path,
+                                'new': webp_path, 'type': pattern_type})
+    
+    return content, changes
+
+def synthetic_bundle(size_mb, image_count=200):
+    """
+    Build a bundle-like source of about size_mb megabytes with an image reference every few lines
+    
+    Returns:
+        tuple: (content, webp_files) where half the referenced images have a WebP version
+    """
+    webp_files = {f"public/images/photo-{index}.webp" for index in range(0, image_count, 2)}
+    lines = []
+    size = 0
+    index = 0
+    
+    while size < size_mb * 1024 * 1024:
+        image = index % image_count
+        block = (f'const item{index} = {{ id: {index}, title: "Item {index}", tags: ["a", "b"] }};\n'
+                 f'  <img src="/images/photo-{image}.jpg" alt="Item {index}" />\n'
+                 f'.card-{index} {{ background: url(/images/photo-{image}.png) no-repeat; }}\n'
+                 f'export const meta{index} = {{ image: "/images/photo-{image}.jpeg" }};\n')
+        lines.append(block)
+        size += len(block)
+        index += 1
+    
+    return ''.join(lines), webp_files
+
+def benchmark_references(root_dir, sizes_mb=None, legacy_max_mb=2):
+    """
+    Check scan_references() against the previous rewriter on the project's
+    code files, then time both on synthetic multi-megabyte bundles
+    """
+    sizes_mb = sizes_mb or [1, 2, 4, 8, 16]
+    root_path = Path(root_dir)
+    webp_files = find_webp_files(root_path)
+    code_files = find_code_files(root_path)
+    
+    print(f"\n⏱️  Reference scanner benchmark")
+    print(f"   Project: {root_path.absolute()} ({len(code_files)} code files, {len(webp_files)} WebP files)")
+    
+    mismatches = []
+    for file_path in code_files:
+        try:
+            content = file_path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            continue
+        if scan_references(content, webp_files)[0] != legacy_scan_references(content, webp_files)[0]:
+            mismatches.append(file_path)
+    
+    if mismatches:
+        print(f"   ❌ Output differs from the previous rewriter in {len(mismatches)} files:")
+        for file_path in mismatches:
+            print(f"      {file_path.relative_to(root_path)}")
+    else:
+        print(f"   ✅ Output byte-identical to the previous rewriter on every code file")
+    
+    print(f"\n   {'Input':>8}{'References':>12}{'Previous':>12}{'Single pass':>13}{'Speedup':>9}")
+    print("   " + "-"*54)
+    
+    for size_mb in sizes_mb:
+        content, bundle_webp_files = synthetic_bundle(size_mb)
+        
+        start = time.perf_counter()
+        new_content, changes = scan_references(content, bundle_webp_files)
+        scan_time = time.perf_counter() - start
+        
+        if size_mb <= legacy_max_mb:
+            start = time.perf_counter()
+            legacy_content, _ = legacy_scan_references(content, bundle_webp_files)
+            legacy_time = time.perf_counter() - start
+            legacy_label = f"{legacy_time:.2f}s"
+            speedup = f"{legacy_time / scan_time:.0f}x" if scan_time else "n/a"
+            if legacy_content != new_content:
+                speedup += "  ❌ differs"
+        else:
+            legacy_label, speedup = "skipped", ""
+        
+        print(f"   {size_mb:>6}MB{len(changes):>12}{legacy_label:>12}{scan_time:>12.3f}s{speedup:>9}")
+    
+    print()
+
+def measure_stage(func, *args, **kwargs):
+    """
+    Run one pipeline stage with its output silenced
+    
+    Peak RSS covers this process only, so with several jobs the workers'
+    memory isn't included.
+    
+    Returns:
+        tuple: (return value, seconds, peak RSS in MB or None)
+    """
+    reset_peak_rss()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    
+    return result, elapsed, peak / 1024 if peak is not None else None
+
+def stage_result(unit, items, size_bytes, seconds, peak_mb):
+    """Throughput record for one stage, as stored in the results file"""
+    return {
+        'unit': unit,
+        'items': items,
+        'mb': size_bytes / 1024 / 1024,
+        'wall_seconds': seconds,
+        'items_per_second': items / seconds if seconds else 0.0,
+        'mb_per_second': size_bytes / 1024 / 1024 / seconds if seconds else 0.0,
+        'peak_rss_mb': peak_mb,
+    }
+
+def prepare_corpus(corpus_path, **corpus_options):
+    """
+    Generate the corpus into corpus_path, or reuse it if it was generated with the same options
+    
+    Returns:
+        dict: The corpus description from generate_corpus()
+    """
+    description_path = corpus_path / CORPUS_FILENAME
+    if description_path.exists():
+        with open(description_path, 'r', encoding='utf-8') as f:
+            corpus = json.load(f)
+        requested = dict(corpus_options, layout=CORPUS_LAYOUT,
+                         resolutions=[list(size) for size in corpus_options['resolutions']])
+        if all(corpus.get(key) == value for key, value in requested.items()):
+            print(f"   Reusing corpus: {corpus_path}")
+            return corpus
+    
+    print(f"   Generating corpus: {corpus_path}")
+    return generate_corpus(corpus_path, **corpus_options)
+
+def compare_results(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare each stage's wall time and peak RSS with a baseline run
+    
+    Returns:
+        dict: stage name -> list of regressions found (empty if none)
+    """
+    comparison = {}
+    
+    for stage_name, stage in results['stages'].items():
+        base = baseline['stages'].get(stage_name)
+        regressions = []
+        
+        if base:
+            slowdown = stage['wall_seconds'] / base['wall_seconds'] - 1
+            if slowdown > threshold:
+                regressions.append(f"{slowdown*100:.0f}% slower")
+            
+            if stage['peak_rss_mb'] and base['peak_rss_mb']:
+                growth = stage['peak_rss_mb'] / base['peak_rss_mb'] - 1
+                if growth > threshold:
+                    regressions.append(f"{growth*100:.0f}% more memory")
+        
+        comparison[stage_name] = regressions
+    
+    return comparison
+
+def benchmark_suite(output_path, baseline_path=None, corpus_dir=None, jobs=1, method=6,
+                    repeat=1, threshold=REGRESSION_THRESHOLD, **corpus_options):
+    """
+    Time find_and_convert_images, process_all_images and update_all_files
+    separately on a synthetic corpus, write the results as JSON and flag
+    regressions against an earlier results file
+    
+    Each stage runs on a fresh copy of the corpus; with repeat > 1 the
+    fastest run of each stage is kept.
+    
+    Args:
+        output_path: JSON file to write the results to
+        baseline_path: Results file of an earlier run to compare against, or None
+        corpus_dir: Directory to keep the corpus in between runs, or None for a temporary one
+        jobs: Worker processes for the image stages
+        method: WebP encoder effort (0-6)
+        repeat: Number of runs per stage
+        threshold: Fractional slowdown or memory growth flagged as a regression
+        **corpus_options: Passed to generate_corpus()
+    
+    Returns:
+        bool: True if any stage regressed against the baseline
+    """
+    print(f"\n⏱️  Pipeline benchmark suite ({os.cpu_count() or 1} CPUs, {jobs} jobs, method {method})")
+    
+    with tempfile.TemporaryDirectory(prefix='webp-suite-') as scratch:
+        scratch_path = Path(scratch)
+        corpus_path = Path(corpus_dir) if corpus_dir else scratch_path / 'corpus'
+        corpus = prepare_corpus(corpus_path, **corpus_options)
+        print(f"   {corpus['images']} images ({corpus['image_bytes']/1024/1024:.1f} MB), "
+              f"{corpus['code_files']} code files with {corpus['references']} image references\n")
+        
+        stages = {}
+        
+        def keep_fastest(stage_name, record):
+            if stage_name not in stages or record['wall_seconds'] < stages[stage_name]['wall_seconds']:
+                stages[stage_name] = record
+        
+        for run in range(repeat):
+            work_path = scratch_path / f"convert-{run}"
+            shutil.copytree(corpus_path, work_path)
+            _, elapsed, peak = measure_stage(find_and_convert_images, work_path,
+                                             jobs=jobs, method=method)
+            keep_fastest('find_and_convert_images',
+                         stage_result('images', corpus['images'], corpus['image_bytes'], elapsed, peak))
+            shutil.rmtree(work_path)
+            
+            # The reference rewrite runs on the responsive stage's output, so it has WebP files to point at
+            work_path = scratch_path / f"responsive-{run}"
+            shutil.copytree(corpus_path, work_path)
+            _, elapsed, peak = measure_stage(process_all_images, work_path, jobs=jobs, method=method)
+            keep_fastest('process_all_images',
+                         stage_result('images', corpus['images'], corpus['image_bytes'], elapsed, peak))
+            
+            plan, elapsed, peak = measure_stage(update_all_files, work_path, dry_run=False)
+            record = stage_result('code files', corpus['code_files'], corpus['code_bytes'], elapsed, peak)
+            record['references_updated'] = plan_totals(plan)[1]
+            keep_fastest('update_all_files', record)
+            shutil.rmtree(work_path)
+    
+    results = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'settings': {'jobs': jobs, 'method': method, 'repeat': repeat},
+        'corpus': corpus,
+        'stages': stages,
+    }
+    
+    comparison = {}
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        
+        if baseline.get('corpus') != corpus or baseline.get('settings') != results['settings']:
+            print(f"   ⚠️  Baseline {baseline_path} used a different corpus or settings; not compared\n")
+        else:
+            comparison = compare_results(results, baseline, threshold)
+            results['baseline'] = str(baseline_path)
+            results['regressions'] = {name: found for name, found in comparison.items() if found}
+    
+    print(f"   {'Stage':<26}{'Items':>7}{'Wall':>9}{'Items/s':>9}{'MB/s':>8}{'Peak RSS':>10}  vs baseline")
+    print("   " + "-"*82)
+    
+    for stage_name, stage in stages.items():
+        peak = f"{stage['peak_rss_mb']:.0f}MB" if stage['peak_rss_mb'] is not None else "n/a"
+        if stage_name not in comparison:
+            versus = ""
+        elif comparison[stage_name]:
+            versus = "❌ " + ", ".join(comparison[stage_name])
+        else:
+            versus = "✅ ok"
+        
+        print(f"   {stage_name:<26}{stage['items']:>7}{stage['wall_seconds']:>8.2f}s"
+              f"{stage['items_per_second']:>9.2f}{stage['mb_per_second']:>8.2f}{peak:>10}  {versus}")
+    
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {output_path}\n")
+    
+    return any(comparison.values())
+
+def parse_resolution(value):
+    """Parse a WIDTHxHEIGHT argument"""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got '{value}'")
+    return width, height
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the image conversion pipeline")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    jobs_parser = subparsers.add_parser('jobs', help="images/second at 1, 2, 4 and N workers")
+    jobs_parser.add_argument('--source', default='public', help="directory to sample images from")
+    jobs_parser.add_argument('--limit', type=int, help="maximum number of images to sample")
+    jobs_parser.add_argument('--jobs', type=int, nargs='+', help="worker counts to compare")
+    
+    resize_parser = subparsers.add_parser('resize', help="default vs fast-resize time, memory and quality")
+    resize_parser.add_argument('--source', default='public', help="directory to sample images from")
+    resize_parser.add_argument('--limit', type=int, help="maximum number of images to sample")
+    resize_parser.add_argument('--min-psnr', type=float, default=40.0,
+                               help="lowest acceptable PSNR against the default path (dB)")
+    
+    encoders_parser = subparsers.add_parser('encoders', help="encode time vs bytes per method/quality")
+    encoders_parser.add_argument('--source', default='public', help="directory to sample images from")
+    encoders_parser.add_argument('--limit', type=int, default=10, help="number of images to sample (default 10)")
+    encoders_parser.add_argument('--methods', type=int, nargs='+', help="WebP methods to compare (0-6)")
+    encoders_parser.add_argument('--qualities', type=int, nargs='+', help="qualities to compare")
+    
+    references_parser = subparsers.add_parser('references',
+                                              help="single-pass vs previous reference rewriting")
+    references_parser.add_argument('--source', default='.', help="project root to verify against")
+    references_parser.add_argument('--sizes', type=float, nargs='+', help="bundle sizes to time (MB)")
+    references_parser.add_argument('--legacy-max-mb', type=float, default=2,
+                                   help="largest bundle to run the previous rewriter on (default 2)")
+    
+    suite_parser = subparsers.add_parser('suite',
+                                         help="time each stage on a synthetic corpus, compare with a baseline")
+    suite_parser.add_argument('--output', default='benchmark-results.json',
+                              help="results file to write (default benchmark-results.json)")
+    suite_parser.add_argument('--baseline', help="results file of an earlier run to flag regressions against")
+    suite_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                              help=f"slowdown or memory growth counted as a regression (default {REGRESSION_THRESHOLD})")
+    suite_parser.add_argument('--jobs', type=int, default=1, help="worker processes for the image stages")
+    suite_parser.add_argument('--profile', choices=ENCODER_PROFILES, default='max',
+                              help="encoder effort profile (default max)")
+    suite_parser.add_argument('--repeat', type=int, default=1, help="runs per stage, fastest kept (default 1)")
+    suite_parser.add_argument('--corpus', help="directory to keep the generated corpus in and reuse")
+    suite_parser.add_argument('--seed', type=int, default=0, help="corpus random seed (default 0)")
+    suite_parser.add_argument('--resolutions', type=parse_resolution, nargs='+',
+                              default=DEFAULT_RESOLUTIONS, help="image sizes to generate, as WIDTHxHEIGHT")
+    suite_parser.add_argument('--copies', type=int, default=1,
+                              help="images per format, kind and resolution (default 1)")
+    suite_parser.add_argument('--code-files', type=int, default=20, help="TSX/CSS files (default 20)")
+    suite_parser.add_argument('--lines', type=int, default=200, help="lines per code file (default 200)")
+    suite_parser.add_argument('--density', type=float, default=0.2,
+                              help="fraction of code lines with an image reference (default 0.2)")
+    
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    args = parse_args()
+    
+    source = getattr(args, 'source', None)
+    if source and not Path(source).exists():
+        print(f"❌ Error: Directory '{source}' does not exist")
+        sys.exit(1)
+    
+    if args.command == 'jobs':
+        benchmark_jobs(args.source, args.limit, args.jobs)
+    elif args.command == 'resize':
+        benchmark_resize(args.source, args.limit, args.min_psnr)
+    elif args.command == 'encoders':
+        benchmark_encoders(args.source, args.limit, args.methods, args.qualities)
+    elif args.command == 'references':
+        benchmark_references(args.source, args.sizes, args.legacy_max_mb)
+    elif args.command == 'suite':
+        method = ENCODER_PROFILES[args.profile]['method']
+        regressed = benchmark_suite(args.output, args.baseline, args.corpus, args.jobs, method,
+                                    args.repeat, args.threshold, seed=args.seed,
+                                    resolutions=args.resolutions, copies=args.copies,
+                                    code_files=args.code_files, lines_per_file=args.lines,
+                                    reference_density=args.density)
+        if regressed:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
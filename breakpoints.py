@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Byte-Budget Breakpoints
+Picks each image's responsive widths from its own content, so that
+neighbouring variants differ by at least a given number of bytes, instead of
+using one fixed list of widths for every image
+"""
+
+import io
+import math
+
+from PIL import Image
+
+# Default minimum difference in file size between neighbouring variants
+DEFAULT_BYTE_STEP = 20 * 1024
+
+# No variant is made narrower than this, however small the byte step
+MIN_BREAKPOINT_WIDTH = 320
+
+# Most variants made per image, the full-size one included; the byte step is
+# widened for images that would otherwise get more
+MAX_BREAKPOINTS = 6
+
+# Widths are rounded down to a multiple of this, so they stay readable in srcset
+WIDTH_GRANULARITY = 8
+
+# File size is modelled from two quick encodes of the image, at
+# MIN_BREAKPOINT_WIDTH and at this multiple of it
+PROBE_RATIO = 4
+PROBE_METHOD = 0
+
+def probe_bytes(img, width, quality):
+    """Size in bytes of a quick WebP encode of the image scaled to the given width"""
+    height = max(1, round(img.height * width / img.width))
+    probe = img.resize((width, height), Image.Resampling.BILINEAR)
+    if probe.mode not in ('RGB', 'RGBA'):
+        probe = probe.convert('RGBA' if 'A' in probe.getbands() else 'RGB')
+    
+    buffer = io.BytesIO()
+    probe.save(buffer, 'WEBP', quality=quality, method=PROBE_METHOD)
+    return buffer.tell()
+
+def size_model(img, quality):
+    """
+    Fit bytes = scale * width ** exponent to two probe encodes of the image
+    
+    The exponent is close to 2 for noisy images, whose bytes grow with the
+    pixel count, and lower for smooth ones, which compress better as they grow.
+    
+    Returns:
+        tuple: (scale, exponent)
+    """
+    small = min(MIN_BREAKPOINT_WIDTH, img.width)
+    large = min(MIN_BREAKPOINT_WIDTH * PROBE_RATIO, img.width)
+    small_bytes = probe_bytes(img, small, quality)
+    
+    if large <= small:
+        return small_bytes / small ** 2, 2.0
+    
+    large_bytes = probe_bytes(img, large, quality)
+    exponent = math.log(large_bytes / small_bytes) / math.log(large / small)
+    exponent = min(max(exponent, 0.5), 2.5)
+    return large_bytes / large ** exponent, exponent
+
+def breakpoint_widths(img, byte_step=DEFAULT_BYTE_STEP, quality=85,
+                      min_width=MIN_BREAKPOINT_WIDTH, max_breakpoints=MAX_BREAKPOINTS):
+    """
+    Choose the widths to make variants of an image at
+    
+    Starting from the image's own width, each next width is the one whose
+    estimated file size is byte_step smaller, down to min_width. Widths are
+    never above the image's own, so nothing is upscaled, and never repeated.
+    
+    Args:
+        img: Decoded PIL Image
+        byte_step: Minimum estimated difference in bytes between neighbouring variants
+        quality: WebP quality the size estimates are made at
+        min_width: Narrowest variant to make
+        max_breakpoints: Most widths to return
+    
+    Returns:
+        list: Widths in pixels, largest (the image's own width) first
+    """
+    widths = [img.width]
+    if img.width <= min_width:
+        return widths
+    
+    scale, exponent = size_model(img, quality)
+    
+    def estimate(width):
+        return scale * width ** exponent
+    
+    # Widen the step if the whole range would need too many variants
+    byte_range = estimate(img.width) - estimate(min_width)
+    step = max(byte_step, byte_range / max(1, max_breakpoints - 1))
+    
+    # The last slot is kept for min_width, so small screens always get a small variant
+    target = estimate(img.width) - step
+    while target >= estimate(min_width) and len(widths) < max_breakpoints - 1:
+        width = int((target / scale) ** (1 / exponent))
+        width -= width % WIDTH_GRANULARITY
+        width = max(width, min_width)
+        if width >= widths[-1]:
+            break
+        widths.append(width)
+        target = estimate(width) - step
+    
+    if widths[-1] > min_width and estimate(widths[-1]) - estimate(min_width) >= byte_step:
+        widths.append(min_width)
+    
+    return widths
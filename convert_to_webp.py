@@ -4,23 +4,41 @@ Image to WebP Converter
 Converts all images (jpg, jpeg, png, gif) to WebP format in the project
 """
 
+import argparse
+import io
 import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
 from pathlib import Path
 from PIL import Image
 import sys
 
-# Supported image formats
-SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
+from animated_images import frame_durations, is_animated, save_animated
+from encode_modes import candidate_modes, classify_image, describe_choice, encode_webp_output
+from image_manifest import (MANIFEST_FILENAME, adopt_existing_outputs, cached_details,
+                            file_digest, get_section, is_up_to_date, load_manifest, make_entry,
+                            prune_orphans, relative_key, save_manifest, settings_fingerprint)
+from image_metrics import (PipelineMetrics, StageTimer, peak_rss_kb, quiet_output,
+                           reset_peak_rss, write_metrics)
+from large_images import DEFAULT_MAX_PIXELS, fit_within_limit, limit_size
+from legacy_fallbacks import COLOUR_MANAGED, to_srgb
+from perceptual_quality import DEFAULT_TARGET_SSIM, require_numpy
+from reference_index import skip_unreferenced
+from tree_walker import EXCLUDE_FOLDERS, walk_tree
 
-# Folders to exclude from conversion
-EXCLUDE_FOLDERS = {'node_modules', '.git', '.next', 'out', '__pycache__', 'venv'}
+# Encoder effort profiles. WebP 'method' trades encode time for file size,
+# from 0 (fastest) to 6 (smallest); run `benchmark_images.py encoders` to compare
+ENCODER_PROFILES = {
+    'fast': {'method': 2},      # Dev builds
+    'balanced': {'method': 4},
+    'max': {'method': 6},       # Release builds
+}
+DEFAULT_PROFILE = 'max'
 
-def should_skip_directory(path):
-    """Check if directory should be skipped"""
-    parts = Path(path).parts
-    return any(excluded in parts for excluded in EXCLUDE_FOLDERS)
-
-def convert_image_to_webp(image_path, quality=85, delete_original=False):
+def convert_image_to_webp(image_path, quality=85, delete_original=False, overwrite=False,
+                          method=6, target_ssim=None, cached_quality=None, report=None,
+                          auto_mode=False, max_pixels=DEFAULT_MAX_PIXELS, reject_oversize=False):
     """
     Convert an image to WebP format
     
@@ -28,43 +46,117 @@ def convert_image_to_webp(image_path, quality=85, delete_original=False):
         image_path: Path to the source image
         quality: WebP quality (0-100, default 85)
         delete_original: Whether to delete the original file
+        overwrite: Rebuild the WebP file even if it already exists
+        method: WebP encoder effort (0-6, default 6)
+        target_ssim: Search for the lowest quality meeting this SSIM score,
+                     starting from quality, instead of using quality as is
+        cached_quality: Quality choice from a previous build of the same source
+        report: Optional dict filled in with the quality choice made and
+                the time taken by each stage (see image_metrics.STAGES)
+        auto_mode: Pick lossless, lossy-with-alpha or lossy encoding for the image
+                   instead of flattening transparency and always encoding lossy
+        max_pixels: Downsize larger sources before decoding them in full
+        reject_oversize: Fail on sources over max_pixels instead of downsizing them
     
     Returns:
         Path to the new WebP file or None if conversion failed
     """
     try:
-        # Open the image
-        img = Image.open(image_path)
-        
-        # Convert RGBA to RGB if needed (WebP doesn't support transparency in lossy mode)
-        if img.mode in ('RGBA', 'LA', 'P'):
-            # Create a white background
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-            img = background
-        elif img.mode != 'RGB':
-            img = img.convert('RGB')
-        
         # Create WebP filename
         webp_path = image_path.with_suffix('.webp')
         
         # Skip if WebP already exists
-        if webp_path.exists():
+        if webp_path.exists() and not overwrite:
             print(f"⏭️  Skipped (already exists): {webp_path.name}")
             return None
         
-        # Save as WebP
-        img.save(webp_path, 'WEBP', quality=quality, method=6)
+        timer = StageTimer()
+        if report is not None:
+            report['timings'] = timer.timings
+        
+        with timer.stage('stat'):
+            original_size = os.path.getsize(image_path)
+        
+        # Open the image
+        with timer.stage('open'):
+            img = Image.open(image_path)
+        
+        # Pathological sources are dealt with before anything is decoded at full size
+        downsized = limit_size(img.size, max_pixels) != img.size
+        if downsized:
+            with timer.stage('decode'):
+                img = fit_within_limit(img, max_pixels, reject_oversize or is_animated(img))
+        
+        animated = is_animated(img)
+        modes = None
+        
+        if animated:
+            # convert() would keep only the first frame, so stream every frame instead
+            with timer.stage('decode'):
+                durations = frame_durations(img)
+            timer.call('encode', None, save_animated, img, webp_path, 'WEBP', durations,
+                       quality=quality, method=method, allow_mixed=auto_mode)
+            if report is not None:
+                report['animated'] = img.n_frames
+        else:
+            with timer.stage('decode'):
+                img.load()
+            
+            # WebP is served without the source's colour profile
+            img, colour = timer.call('convert', None, to_srgb, img)
+            
+            if auto_mode:
+                classification = timer.call('classify', None, classify_image, img)
+                modes = candidate_modes(classification)
+            
+            with timer.stage('convert'):
+                if modes and classification['alpha']:
+                    # Lossless and lossy WebP both keep the alpha channel
+                    img = img.convert('RGBA')
+                elif img.mode in ('RGBA', 'LA', 'P'):
+                    # Flatten transparency onto a white background
+                    background = Image.new('RGB', img.size, (255, 255, 255))
+                    if img.mode == 'P':
+                        img = img.convert('RGBA')
+                    background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+                    img = background
+                elif img.mode != 'RGB':
+                    img = img.convert('RGB')
+            
+            # Encode as WebP in memory, so encoding and writing are timed apart
+            with timer.stage('encode'):
+                if target_ssim or modes:
+                    data, choice = encode_webp_output(img, quality, method, target_ssim,
+                                                      cached_quality, modes)
+                    if report is not None:
+                        report['quality'] = choice
+                else:
+                    buffer = io.BytesIO()
+                    img.save(buffer, 'WEBP', quality=quality, method=method)
+                    data = buffer.getvalue()
+            
+            with timer.stage('write'):
+                webp_path.write_bytes(data)
         
         # Get file sizes
-        original_size = os.path.getsize(image_path)
         webp_size = os.path.getsize(webp_path)
         reduction = ((original_size - webp_size) / original_size) * 100
         
         print(f"✅ Converted: {image_path.name} → {webp_path.name}")
         print(f"   Size: {original_size/1024:.1f}KB → {webp_size/1024:.1f}KB (reduced by {reduction:.1f}%)")
+        if downsized:
+            print(f"   📐 Over the {max_pixels/1_000_000:g}MP limit: downsized to {img.size[0]}x{img.size[1]}")
+        if animated:
+            print(f"   🎞️  Animated: {img.n_frames} frames")
+        elif colour:
+            print(f"   🎨 Colour: converted to sRGB from {colour}")
+        if modes:
+            colors = classification['colors'] or 'many'
+            print(f"   🧩 Mode: {describe_choice(choice)} ({classification['kind']}, {colors} colours"
+                  f"{', alpha' if classification['alpha'] else ''})")
+        if target_ssim and not animated and 'fixed_bytes' in choice:
+            print(f"   🎯 Q{choice['quality']} meets SSIM {target_ssim} "
+                  f"(Q{quality} would be {choice['fixed_bytes']/1024:.1f}KB)")
         
         # Delete original if requested
         if delete_original:
@@ -72,12 +164,85 @@ def convert_image_to_webp(image_path, quality=85, delete_original=False):
             print(f"   🗑️  Deleted original: {image_path.name}")
         
         return webp_path
-        
+    
     except Exception as e:
         print(f"❌ Error converting {image_path.name}: {str(e)}")
         return None
 
-def find_and_convert_images(root_dir, quality=85, delete_original=False):
+def find_image_files(root_path):
+    """Find all supported images under root_path, in walk order"""
+    return walk_tree(root_path).image_paths()
+
+def run_jobs(worker, items, jobs=1):
+    """
+    Run worker over items, serially or on a process pool
+    
+    Args:
+        worker: Picklable callable taking a single item
+        items: List of work items
+        jobs: Number of worker processes (1 runs in-process)
+    
+    Yields:
+        Worker results in the same order as items
+    """
+    if jobs <= 1 or len(items) <= 1:
+        yield from map(worker, items)
+        return
+    
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as executor:
+        yield from executor.map(worker, items, chunksize=1)
+
+def _convert_worker(item, quality, delete_original, method, target_ssim, auto_mode=False,
+                    max_pixels=DEFAULT_MAX_PIXELS, reject_oversize=False):
+    """Convert one image, capturing its log output for the parent process"""
+    file_path, overwrite, cached = item
+    log = io.StringIO()
+    source_stat = file_path.stat()
+    report = {}
+    
+    # Reuse the quality chosen last time if the source itself hasn't changed
+    digest = file_digest(file_path) if cached else None
+    cached_quality = cached['quality'] if cached and cached['sha256'] == digest else None
+    
+    # Each worker handles one image at a time, so its peak is this image's
+    rss_reset = reset_peak_rss()
+    with redirect_stdout(log):
+        webp_path = convert_image_to_webp(file_path, quality, delete_original, overwrite, method,
+                                          target_ssim, cached_quality, report, auto_mode,
+                                          max_pixels, reject_oversize)
+    peak_kb = peak_rss_kb() if rss_reset else None
+    if peak_kb and webp_path:
+        log.write(f"   🧠 Peak RSS: {peak_kb/1024:.0f}MB\n")
+    
+    if webp_path:
+        status = 'converted'
+        webp_size = os.path.getsize(webp_path)
+        digest = None if delete_original else digest or file_digest(file_path)
+    elif file_path.with_suffix('.webp').exists():
+        status = 'skipped'
+        webp_size = 0
+        digest = None
+    else:
+        status = 'error'
+        webp_size = 0
+        digest = None
+    
+    return {
+        'status': status,
+        'original_size': source_stat.st_size,
+        'source_stat': source_stat,
+        'digest': digest,
+        'webp_size': webp_size,
+        'report': report,
+        'timings': report.pop('timings', []),
+        'peak_rss_kb': peak_kb,
+        'log': log.getvalue(),
+    }
+
+def find_and_convert_images(root_dir, quality=85, delete_original=False, jobs=1,
+                            manifest_path=None, method=6, target_ssim=None, auto_mode=False,
+                            inventory=None, metrics=None, max_pixels=DEFAULT_MAX_PIXELS,
+                            reject_oversize=False, referenced_only=False):
     """
     Find all images in directory and convert them to WebP
     
@@ -85,6 +250,18 @@ def find_and_convert_images(root_dir, quality=85, delete_original=False):
         root_dir: Root directory to search
         quality: WebP quality (0-100)
         delete_original: Whether to delete original files
+        jobs: Number of worker processes to convert with
+        manifest_path: Build manifest to skip unchanged images with, or None
+                       to only skip images whose WebP file already exists
+        method: WebP encoder effort (0-6)
+        target_ssim: Pick each image's quality to meet this SSIM score, or None
+                     to encode everything at quality
+        auto_mode: Choose lossless, lossy-with-alpha or lossy encoding per image
+        inventory: tree_walker.walk_tree() result for root_dir, if already walked
+        metrics: image_metrics.PipelineMetrics to record each image's stage timings in
+        max_pixels: Downsize sources with more pixels than this
+        reject_oversize: Skip sources over max_pixels instead of downsizing them
+        referenced_only: Skip images no code file references (see reference_index.py)
     """
     root_path = Path(root_dir)
     
@@ -94,7 +271,14 @@ def find_and_convert_images(root_dir, quality=85, delete_original=False):
     
     print(f"\n🔍 Scanning for images in: {root_path.absolute()}")
     print(f"   Quality: {quality}")
+    print(f"   Target SSIM: {target_ssim or 'off'}")
+    print(f"   Encoder method: {method}")
+    print(f"   Encode mode: {'auto' if auto_mode else 'lossy'}")
     print(f"   Delete originals: {delete_original}")
+    print(f"   Parallel jobs: {jobs}")
+    print(f"   Max pixels: {max_pixels/1_000_000:g}MP ({'reject' if reject_oversize else 'downsize'} larger)")
+    print(f"   Manifest: {manifest_path or 'disabled'}")
+    print(f"   Referenced images only: {referenced_only}")
     print(f"   Excluding folders: {', '.join(EXCLUDE_FOLDERS)}\n")
     
     converted_count = 0
@@ -102,46 +286,121 @@ def find_and_convert_images(root_dir, quality=85, delete_original=False):
     error_count = 0
     total_original_size = 0
     total_webp_size = 0
+    total_targeted_size = 0
+    total_fixed_size = 0
+    animated_count = 0
+    mode_counts = {}
+    mode_bytes = {}
+    peak_rss = None
     
-    # Walk through all directories
-    for dirpath, dirnames, filenames in os.walk(root_path):
-        # Skip excluded directories
-        if should_skip_directory(dirpath):
-            dirnames[:] = []  # Don't recurse into subdirectories
-            continue
-        
-        # Filter out excluded subdirectories
-        dirnames[:] = [d for d in dirnames if d not in EXCLUDE_FOLDERS]
+    if inventory is None:
+        inventory = walk_tree(root_path)
+    image_files = inventory.image_paths()
+    stats = inventory.stats()
+    
+    if referenced_only:
+        image_files = skip_unreferenced(root_path, inventory, image_files,
+                                        [manifest_path] if manifest_path else [])
+    
+    if manifest_path:
+        manifest = load_manifest(manifest_path)
+        section = get_section(manifest, 'convert')
+        fingerprint = settings_fingerprint({'quality': quality, 'method': method,
+                                            'target_ssim': target_ssim, 'auto_mode': auto_mode,
+                                            'max_pixels': max_pixels, 'srgb': COLOUR_MANAGED})
+        work_items = []
+        seen_keys = set()
         
-        # Process each file
-        for filename in filenames:
-            file_path = Path(dirpath) / filename
+        # Unchanged images are settled from the manifest without opening them
+        for file_path in image_files:
+            key = relative_key(file_path, root_path)
+            seen_keys.add(key)
+            source_stat = stats[file_path]
+            entry = section.get(key)
             
-            # Check if it's a supported image format
-            if file_path.suffix.lower() in SUPPORTED_FORMATS:
-                # Get original size
-                original_size = os.path.getsize(file_path)
-                total_original_size += original_size
-                
-                # Convert to WebP
-                webp_path = convert_image_to_webp(file_path, quality, delete_original)
-                
-                if webp_path:
-                    converted_count += 1
-                    webp_size = os.path.getsize(webp_path)
-                    total_webp_size += webp_size
-                elif webp_path is None and file_path.with_suffix('.webp').exists():
-                    skipped_count += 1
-                else:
-                    error_count += 1
+            if entry is None:
+                webp_key = relative_key(file_path.with_suffix('.webp'), root_path)
+                entry = adopt_existing_outputs(file_path, source_stat, fingerprint,
+                                               [webp_key], root_path)
+                if entry:
+                    section[key] = entry
+            
+            if is_up_to_date(entry, file_path, source_stat, fingerprint, root_path):
+                skipped_count += 1
+                total_original_size += source_stat.st_size
+            else:
+                cached = None
+                if entry and entry['settings'] == fingerprint:
+                    cached = cached_details(entry, 'quality')
+                work_items.append((file_path, True, cached))
+        
+        if skipped_count:
+            print(f"⏭️  Unchanged since last build: {skipped_count} images")
+    else:
+        work_items = [(file_path, False, None) for file_path in image_files]
+    
+    worker = partial(_convert_worker, quality=quality, delete_original=delete_original,
+                     method=method, target_ssim=target_ssim, auto_mode=auto_mode,
+                     max_pixels=max_pixels, reject_oversize=reject_oversize)
+    
+    # Results come back in submission order, so log lines and totals are
+    # identical whether the images were converted serially or in parallel
+    for (file_path, _, _), result in zip(work_items, run_jobs(worker, work_items, jobs)):
+        print(result['log'], end='')
+        total_original_size += result['original_size']
+        
+        if result['status'] == 'converted':
+            converted_count += 1
+            total_webp_size += result['webp_size']
+            animated_count += 'animated' in result['report']
+            choice = result['report'].get('quality', {})
+            if 'fixed_bytes' in choice:
+                total_targeted_size += result['webp_size']
+                total_fixed_size += choice['fixed_bytes']
+            if 'mode' in choice:
+                mode_counts[choice['mode']] = mode_counts.get(choice['mode'], 0) + 1
+                mode_bytes[choice['mode']] = mode_bytes.get(choice['mode'], 0) + result['webp_size']
+        elif result['status'] == 'skipped':
+            skipped_count += 1
+        else:
+            error_count += 1
+        
+        if result['peak_rss_kb'] and result['status'] == 'converted':
+            if peak_rss is None or result['peak_rss_kb'] > peak_rss[0]:
+                peak_rss = (result['peak_rss_kb'], file_path.name)
+        
+        if metrics is not None and result['timings']:
+            metrics.record(relative_key(file_path, root_path), result['timings'],
+                           status=result['status'], source_bytes=result['original_size'],
+                           output_bytes=result['webp_size'],
+                           peak_rss_mb=result['peak_rss_kb'] / 1024 if result['peak_rss_kb'] else None)
+        
+        if manifest_path:
+            key = relative_key(file_path, root_path)
+            if result['digest']:
+                webp_key = relative_key(file_path.with_suffix('.webp'), root_path)
+                section[key] = make_entry(result['source_stat'], result['digest'],
+                                          fingerprint, [webp_key], result['report'])
+            else:
+                # Failed, or the original was deleted and its WebP is now the source of truth
+                section.pop(key, None)
+    
+    if manifest_path:
+        for removed in prune_orphans(section, seen_keys, root_path):
+            print(f"🧹 Removed orphaned output: {removed}")
+        save_manifest(manifest_path, manifest)
     
     # Print summary
     print("\n" + "="*60)
     print("📊 CONVERSION SUMMARY")
     print("="*60)
     print(f"✅ Successfully converted: {converted_count} images")
-    print(f"⏭️  Skipped (already exist): {skipped_count} images")
+    print(f"⏭️  Skipped (up to date): {skipped_count} images")
     print(f"❌ Errors: {error_count} images")
+    if animated_count:
+        print(f"🎞️  Animated: {animated_count} images (all frames kept)")
+    if peak_rss:
+        print(f"🧠 Highest peak RSS: {peak_rss[0]/1024:.0f}MB ({peak_rss[1]})")
     
     if converted_count > 0:
         total_reduction = ((total_original_size - total_webp_size) / total_original_size) * 100
@@ -150,45 +409,119 @@ def find_and_convert_images(root_dir, quality=85, delete_original=False):
         print(f"   WebP size: {total_webp_size/1024/1024:.2f} MB")
         print(f"   Reduction: {total_reduction:.1f}%")
     
-    print("="*60 + "\n")
-
-def main():
-    """Main function"""
-    print("\n" + "="*60)
-    print("🖼️  IMAGE TO WEBP CONVERTER")
-    print("="*60)
+    if mode_counts:
+        print(f"\n🧩 Encode modes:")
+        for mode in sorted(mode_counts):
+            print(f"   {mode}: {mode_counts[mode]} images, {mode_bytes[mode]/1024/1024:.2f} MB")
     
-    # Check if PIL/Pillow is installed
-    try:
-        from PIL import Image
-    except ImportError:
-        print("\n❌ Error: Pillow library not found!")
-        print("   Install it with: pip install Pillow")
-        sys.exit(1)
+    if total_fixed_size:
+        targeted_saving = (1 - total_targeted_size / total_fixed_size) * 100
+        print(f"\n🎯 SSIM-targeted: {total_targeted_size/1024/1024:.2f} MB vs "
+              f"{total_fixed_size/1024/1024:.2f} MB at fixed Q{quality} ({targeted_saving:.1f}% saved)")
     
-    # Get current directory
-    current_dir = Path.cwd()
+    print("="*60 + "\n")
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Convert project images to WebP")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="number of worker processes (0 = one per CPU, default 1)")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="don't ask for confirmation")
+    parser.add_argument('--profile', choices=ENCODER_PROFILES, default=DEFAULT_PROFILE,
+                        help=f"encoder effort profile (default {DEFAULT_PROFILE})")
+    parser.add_argument('--target-ssim', type=float, nargs='?', const=DEFAULT_TARGET_SSIM,
+                        help=f"pick each image's quality to meet this SSIM (default {DEFAULT_TARGET_SSIM})")
+    parser.add_argument('--auto-mode', action='store_true',
+                        help="pick lossless, lossy-with-alpha or lossy encoding per image")
+    parser.add_argument('--manifest', default=MANIFEST_FILENAME,
+                        help=f"build manifest path (default {MANIFEST_FILENAME})")
+    parser.add_argument('--no-manifest', dest='manifest', action='store_const', const=None,
+                        help="only skip images whose WebP file already exists")
+    parser.add_argument('--all-images', action='store_true',
+                        help="also convert images no code file references")
+    parser.add_argument('--max-pixels', type=float, default=DEFAULT_MAX_PIXELS / 1_000_000, metavar='MP',
+                        help=f"downsize sources over this many megapixels (default {DEFAULT_MAX_PIXELS / 1_000_000:g})")
+    parser.add_argument('--reject-oversize', action='store_true',
+                        help="skip sources over --max-pixels instead of downsizing them")
+    parser.add_argument('--metrics-jsonl', metavar='PATH',
+                        help="write each image's stage timings and a summary to PATH as JSON lines")
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help="write stage timing histograms to PATH in Prometheus text format")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="no log output (implies --yes); use with the metrics options")
+    args = parser.parse_args()
     
-    # Configuration
-    quality = 85  # WebP quality (0-100)
-    delete_original = False  # Set to True to delete original files
+    if args.quiet:
+        args.yes = True
     
-    print(f"\n⚙️  SETTINGS:")
-    print(f"   Quality: {quality}")
-    print(f"   Delete originals: {delete_original}")
-    print(f"   (Edit the script to change these settings)\n")
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
     
-    # Ask for confirmation
-    response = input("🚀 Start conversion? (y/n): ").lower().strip()
+    if args.target_ssim:
+        require_numpy()
     
-    if response != 'y':
-        print("❌ Conversion cancelled")
-        return
+    return args
+
+def main():
+    """Main function"""
+    args = parse_args()
+    metrics = PipelineMetrics('convert') if args.metrics_jsonl or args.metrics_prom else None
     
-    # Convert images
-    find_and_convert_images(current_dir, quality, delete_original)
+    with quiet_output(args.quiet):
+        print("\n" + "="*60)
+        print("🖼️  IMAGE TO WEBP CONVERTER")
+        print("="*60)
+        
+        # Check if PIL/Pillow is installed
+        try:
+            from PIL import Image
+        except ImportError:
+            print("\n❌ Error: Pillow library not found!")
+            print("   Install it with: pip install Pillow")
+            sys.exit(1)
+        
+        # Get current directory
+        current_dir = Path.cwd()
+        
+        # Configuration
+        quality = 85  # WebP quality (0-100)
+        delete_original = False  # Set to True to delete original files
+        method = ENCODER_PROFILES[args.profile]['method']
+        
+        print(f"\n⚙️  SETTINGS:")
+        print(f"   Quality: {quality}")
+        print(f"   Target SSIM: {args.target_ssim or 'off'}")
+        print(f"   Profile: {args.profile} (method {method})")
+        print(f"   Encode mode: {'auto' if args.auto_mode else 'lossy'}")
+        print(f"   Delete originals: {delete_original}")
+        print(f"   Parallel jobs: {args.jobs}")
+        print(f"   Max pixels: {args.max_pixels:g}MP")
+        print(f"   Manifest: {args.manifest or 'disabled'}")
+        print(f"   Referenced images only: {not args.all_images}")
+        print(f"   (Edit the script to change these settings)\n")
+        
+        # Ask for confirmation
+        if not args.yes:
+            response = input("🚀 Start conversion? (y/n): ").lower().strip()
+            
+            if response != 'y':
+                print("❌ Conversion cancelled")
+                return
+        
+        # Convert images
+        find_and_convert_images(current_dir, quality, delete_original, args.jobs, args.manifest,
+                                method, args.target_ssim, args.auto_mode, metrics=metrics,
+                                max_pixels=int(args.max_pixels * 1_000_000),
+                                reject_oversize=args.reject_oversize,
+                                referenced_only=not args.all_images)
+        
+        if metrics:
+            metrics.print_summary()
+        
+        print("✨ Done!")
     
-    print("✨ Done!")
+    write_metrics(metrics, args.metrics_jsonl, args.metrics_prom)
 
 if __name__ == "__main__":
     main()
@@ -4,11 +4,41 @@ Responsive WebP Image Generator
 Creates multiple sizes of images optimized for different screen sizes
 """
 
+import argparse
+import io
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
 from pathlib import Path
-from PIL import Image
+from PIL import Image, features
 import sys
 
+from animated_images import frame_durations, is_animated, save_animated
+from breakpoints import DEFAULT_BYTE_STEP, breakpoint_widths
+from convert_to_webp import DEFAULT_PROFILE, ENCODER_PROFILES, run_jobs
+from duplicate_images import (DEFAULT_THRESHOLD, conversion_costs, encode_seconds,
+                              print_duplicate_report, skip_duplicates)
+from encode_modes import candidate_modes, classify_image, describe_choice, encode_webp_output
+from generated_images import (GENERATED_MODULE, catalog_entry, catalog_from_section,
+                              describe_outputs, save_module, variant_record)
+from hashed_names import (DEFAULT_GRACE_DAYS, HEADERS_SNIPPET, collect_garbage, hash_outputs,
+                          immutable_headers, retire_outputs, save_headers_snippet)
+from image_manifest import (MANIFEST_FILENAME, adopt_existing_outputs, cached_details,
+                            file_digest, get_section, is_up_to_date, load_manifest, make_entry,
+                            prune_orphans, relative_key, remove_outputs, save_manifest,
+                            settings_fingerprint)
+from image_metrics import (PipelineMetrics, StageTimer, peak_rss_kb, quiet_output,
+                           reset_peak_rss, write_metrics)
+from large_images import (DEFAULT_MAX_PIXELS, LARGE_IMAGE_PIXELS, decoded_mb, fit_within_limit,
+                          limit_size, resize_in_bands)
+from legacy_fallbacks import COLOUR_MANAGED, describe_fallback, optimize_fallback, to_srgb
+from perceptual_quality import DEFAULT_TARGET_SSIM, require_numpy
+from placeholders import (PLACEHOLDER_INDEX, make_placeholder, placeholder_for_file, public_path,
+                          save_index)
+from reference_index import skip_unreferenced
+from tree_walker import EXCLUDE_FOLDERS, SUPPORTED_FORMATS, walk_tree
+
 # Image size configurations
 SIZES = {
     'mobile': {'width': 640, 'quality': 80, 'suffix': '-mobile'},
@@ -17,41 +47,90 @@ SIZES = {
     'original': {'width': None, 'quality': 85, 'suffix': ''},  # Keep original size
 }
 
-# Supported image formats
-SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
-
-# Folders to exclude
-EXCLUDE_FOLDERS = {'node_modules', '.git', '.next', 'out', '__pycache__', 'venv'}
+# AVIF encoder settings, used alongside WebP when AVIF output is enabled.
+# AVIF reaches the same visual quality at a lower quality number than WebP
+AVIF_SETTINGS = {'quality': 50, 'speed': 6}
 
-def should_skip_directory(path):
-    """Check if directory should be skipped"""
-    parts = Path(path).parts
-    return any(excluded in parts for excluded in EXCLUDE_FOLDERS)
+# In fast-resize mode, images are first shrunk by an integer factor (a cheap
+# box reduce) until they are within this multiple of the target width, and
+# LANCZOS only runs on the remainder
+FAST_REDUCING_GAP = 3.0
 
-def resize_image(img, target_width):
+def resize_image(img, target_width, fast=False, banded=False):
     """
     Resize image maintaining aspect ratio
     
     Args:
         img: PIL Image object
         target_width: Target width in pixels
+        fast: Reduce by an integer factor before resampling (see FAST_REDUCING_GAP)
+        banded: Resample band by band to bound memory (see large_images.resize_in_bands);
+                takes precedence over fast
     
     Returns:
         Resized PIL Image object
     """
-    if target_width is None:
-        return img
-    
-    # Calculate new height maintaining aspect ratio
-    width_percent = target_width / float(img.size[0])
-    target_height = int(float(img.size[1]) * width_percent)
+    target_size = scaled_size(img.size, target_width)
     
     # Only resize if image is larger than target
-    if img.size[0] > target_width:
-        return img.resize((target_width, target_height), Image.Resampling.LANCZOS)
+    if target_size != img.size:
+        if banded:
+            return resize_in_bands(img, target_size)
+        reducing_gap = FAST_REDUCING_GAP if fast else None
+        return img.resize(target_size, Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
     
     return img
 
+def scaled_size(size, target_width):
+    """Size resize_image() produces for an image of the given size"""
+    if target_width is None or size[0] <= target_width:
+        return size
+    
+    # Calculate new height maintaining aspect ratio
+    width_percent = target_width / float(size[0])
+    return (target_width, int(float(size[1]) * width_percent))
+
+def draft_for_width(img, target_width):
+    """
+    Ask the decoder for a reduced-scale decode that is still at least target_width wide
+    
+    Only JPEG supports this (DCT scaling by 1/2, 1/4 or 1/8); other formats are
+    left untouched. Must be called before the image data is loaded.
+    
+    Returns:
+        Integer scale denominator applied (1 if no reduction was possible)
+    """
+    full_width, full_height = img.size
+    if img.format != 'JPEG' or full_width <= target_width:
+        return 1
+    
+    target_height = max(1, full_height * target_width // full_width)
+    img.draft(img.mode, (target_width, target_height))
+    
+    return full_width // img.size[0]
+
+def reduced_decode(image_path, target_width, mode):
+    """
+    Decode an image a second time at a reduced scale still at least target_width wide
+    
+    Used for the smaller sizes when the full-size variant needs the full decode:
+    resampling from a 1/2 or 1/4 scale decode costs far less than from the full one.
+    
+    Returns:
+        tuple: (image converted to sRGB and the given mode, scale denominator),
+        or None if the format has no reduced-scale decoding
+    """
+    img = Image.open(image_path)
+    scale = draft_for_width(img, target_width)
+    if scale == 1:
+        img.close()
+        return None
+    
+    img.load()
+    img, _ = to_srgb(img)
+    img = img.convert(mode) if mode == 'RGBA' else convert_to_rgb(img)
+    return img, scale
+
 def convert_to_rgb(img):
     """Convert image to RGB format"""
     if img.mode in ('RGBA', 'LA', 'P'):
@@ -59,7 +138,8 @@ def convert_to_rgb(img):
         if img.mode == 'P':
             img = img.convert('RGBA')
         if img.mode in ('RGBA', 'LA'):
-            background.paste(img, mask=img.split()[-1])
+            # The image's own alpha is the mask, without splitting out a copy of every band
+            background.paste(img, mask=img)
         else:
             background.paste(img)
         return background
@@ -67,61 +147,418 @@ def convert_to_rgb(img):
         return img.convert('RGB')
     return img
 
-def generate_responsive_images(image_path, delete_original=False):
+def working_set_mb(size, widths):
+    """
+    Rough peak of decoded pixel data for an image of the given size when
+    every variant is made up front: the source, its converted copy and each
+    resized variant (full-size variants share the converted copy)
+    """
+    variants = sum(decoded_mb(scaled_size(size, width)) for width in widths
+                   if width and width < size[0])
+    return decoded_mb(size) * 2 + variants
+
+def fixed_sizes(source_width):
+    """
+    The SIZES an image of the given width gets
+    
+    Sizes at least as wide as the image would be the full-size variant again
+    (nothing is upscaled), so they are left out rather than written as duplicates.
+    """
+    return {size_name: config for size_name, config in SIZES.items()
+            if config['width'] is None or config['width'] < source_width}
+
+def quality_for_width(width):
+    """Quality of the narrowest SIZES entry at least width wide, or the full-size quality"""
+    wider = [config for config in SIZES.values() if config['width'] and config['width'] >= width]
+    if not wider:
+        return SIZES['original']['quality']
+    return min(wider, key=lambda config: config['width'])['quality']
+
+def breakpoint_sizes(widths):
+    """
+    Size configurations for breakpoints.breakpoint_widths() output
+    
+    The first width is the image's own and becomes the 'original' size, so the
+    full-size WebP keeps its name; the others are named after their width.
+    """
+    sizes = {'original': SIZES['original']}
+    for width in widths[1:]:
+        sizes[f"{width}w"] = {'width': width, 'quality': quality_for_width(width),
+                              'suffix': f"-{width}w"}
+    return sizes
+
+def variant_paths(image_path, extension='.webp', sizes=None):
+    """Map each size name (of SIZES by default) to the file generated for it in the given format"""
+    return {
+        size_name: image_path.parent / f"{image_path.stem}{config['suffix']}{extension}"
+        for size_name, config in (sizes or SIZES).items()
+    }
+
+def output_paths(image_path, avif=False):
+    """All files generated for an image: the WebP variants, plus AVIF ones if enabled"""
+    paths = list(variant_paths(image_path).values())
+    if avif:
+        paths.extend(variant_paths(image_path, '.avif').values())
+    return paths
+
+def require_avif():
+    """Exit with an upgrade hint if this Pillow build can't encode AVIF"""
+    if not features.check('avif'):
+        raise SystemExit("❌ Error: this Pillow build has no AVIF support\n"
+                         "   Upgrade it with: pip install -U Pillow")
+
+def _save_webp(img, webp_path, quality, method, target_ssim=None, cached=None, modes=None,
+               timer=None, size_name=None):
+    """
+    Encode one WebP variant, timing the encode and the write under size_name
+    
+    Returns:
+        dict: the quality (and, with modes, the encode mode) used, plus the
+              fixed-quality size when SSIM-targeted
+    """
+    timer = timer or StageTimer()
+    
+    with timer.stage('encode', size_name):
+        if target_ssim or modes:
+            data, choice = encode_webp_output(img, quality, method, target_ssim, cached, modes)
+        else:
+            buffer = io.BytesIO()
+            img.save(buffer, 'WEBP', quality=quality, method=method)
+            data, choice = buffer.getvalue(), {'quality': quality}
+    
+    with timer.stage('write', size_name):
+        webp_path.write_bytes(data)
+    
+    return choice
+
+def _save_avif(img, avif_path, timer=None, size_name=None):
+    """Encode one AVIF variant, timed under size_name with an .avif suffix"""
+    timer = timer or StageTimer()
+    variant = f"{size_name}.avif" if size_name else None
+    
+    with timer.stage('encode', variant):
+        buffer = io.BytesIO()
+        img.save(buffer, 'AVIF', **AVIF_SETTINGS)
+    
+    with timer.stage('write', variant):
+        avif_path.write_bytes(buffer.getvalue())
+
+def _animated_frame(frame, width, fast=False):
+    """Turn one frame of an animated source into a frame of a variant"""
+    return resize_image(frame.convert('RGBA'), width, fast)
+
+def _save_animated_webp(img, webp_path, quality, method, durations, transform, allow_mixed):
+    """
+    Encode one animated WebP variant, streaming the source frames
+    
+    Returns:
+        dict: the quality used, in the same form as _save_webp()
+    """
+    save_animated(img, webp_path, 'WEBP', durations, transform,
+                  quality=quality, method=method, allow_mixed=allow_mixed)
+    return {'quality': quality, 'mode': 'animated'}
+
+def generate_responsive_images(image_path, delete_original=False, overwrite=False,
+                               fast_resize=False, method=6, target_ssim=None,
+                               cached_qualities=None, report=None, avif=False,
+                               auto_mode=False, memory_budget_mb=None,
+                               max_pixels=DEFAULT_MAX_PIXELS, reject_oversize=False,
+                               breakpoint_step=None, fallbacks=False, hashed_names=False):
     """
     Generate multiple responsive sizes for an image
     
     Args:
         image_path: Path to source image
         delete_original: Whether to delete original file
+        overwrite: Rebuild variants even if they already exist
+        fast_resize: Cascade the sizes largest to smallest, each resampled from
+                     the previous one; for JPEGs the smaller sizes start from a
+                     second, reduced-scale decode when the full-size variant
+                     needs the full one
+        method: WebP encoder effort (0-6, default 6)
+        target_ssim: Search each size's quality to meet this SSIM score,
+                     starting from its SIZES quality
+        cached_qualities: Quality choices from a previous build of the same source
+        report: Optional dict filled in with the sizes planned, the width and
+                quality chosen for each size, bytes written per format, any
+                AVIF files generated, every variant's dimensions and bytes
+                (see generated_images.py), the image's blur placeholder (see
+                placeholders.py), the fallback optimization result (see
+                legacy_fallbacks.py) and the time taken by each stage
+                (see image_metrics.STAGES)
+        avif: Also encode every size to AVIF, in parallel with the WebP encode
+        auto_mode: Pick lossless, lossy-with-alpha or lossy WebP encoding for the
+                   image instead of flattening transparency onto white
+        memory_budget_mb: Process the image memory-capped if making every
+                          variant up front would need more decoded pixel data than this
+        max_pixels: Downsize larger sources before anything else is done with them
+        reject_oversize: Fail on sources over max_pixels instead of downsizing them
+        breakpoint_step: Pick the widths from the image itself, so neighbouring
+                         variants differ by about this many bytes, instead of
+                         using SIZES (see breakpoints.py)
+        fallbacks: Re-encode the source itself afterwards, if it is a JPEG or
+                   PNG, as a smaller fallback (see legacy_fallbacks.py)
+        hashed_names: Rename the variants written after their content hash
+                      (see hashed_names.py); existing variants are never
+                      found under their plain names, so every size is made
+    
+    Sizes are never upscaled: those at least as wide as the source are not made.
+    
+    Animated sources keep every frame: each size is streamed frame by frame
+    into an animated WebP (and AVIF), with the source's timing and loop count.
+    
+    Images with a wide-gamut colour profile are converted to sRGB once
+    decoded, since WebP outputs are served without the profile.
+    
+    Memory-capped processing (always used from LARGE_IMAGE_PIXELS up) decodes
+    JPEGs at a reduced scale where no full-size output is needed, resizes band
+    by band, and makes, writes and frees one size at a time, largest first.
     
     Returns:
         Dictionary of generated files
     """
     try:
+        timer = StageTimer()
+        if report is not None:
+            report['timings'] = timer.timings
+        
+        with timer.stage('stat'):
+            original_size = os.path.getsize(image_path)
+        
         # Open image
-        img = Image.open(image_path)
-        original_size = os.path.getsize(image_path)
+        with timer.stage('open'):
+            img = Image.open(image_path)
         
         print(f"\n📸 Processing: {image_path.name}")
         print(f"   Original size: {img.size[0]}x{img.size[1]} ({original_size/1024:.1f}KB)")
         
-        # Convert to RGB if needed
-        img = convert_to_rgb(img)
+        # Pathological sources are dealt with before anything is decoded at full size
+        if limit_size(img.size, max_pixels) != img.size:
+            if is_animated(img):
+                reject_oversize = True
+            with timer.stage('decode'):
+                img = fit_within_limit(img, max_pixels, reject_oversize)
+            print(f"   📐 Over the {max_pixels/1_000_000:g}MP limit: downsized to "
+                  f"{img.size[0]}x{img.size[1]}")
+        full_size = img.size
+        source_format = img.format
         
-        generated_files = {}
-        total_webp_size = 0
+        # Decide which sizes the image gets
+        skipped = 0
+        if breakpoint_step and not is_animated(img):
+            # Breakpoints come from the pixels, and the full-size variant is
+            # always one of them, so a reduced decode would not help anyway
+            with timer.stage('decode'):
+                img.load()
+            widths = timer.call('breakpoints', None, breakpoint_widths, img, breakpoint_step,
+                                SIZES['original']['quality'])
+            sizes = breakpoint_sizes(widths)
+            print(f"   📏 Breakpoints: {', '.join(f'{width}w' for width in widths)}")
+        else:
+            sizes = fixed_sizes(img.size[0])
+            skipped = len(SIZES) - len(sizes)
+            if skipped:
+                print(f"   ♻️  Skipped {skipped} sizes at least as wide as the source "
+                      f"(they would duplicate the full-size variant)")
+        if report is not None:
+            report['sizes'] = list(sizes)
+            report['skipped'] = skipped
         
-        # Generate each size
-        for size_name, config in SIZES.items():
-            # Create WebP filename
-            base_name = image_path.stem
-            webp_name = f"{base_name}{config['suffix']}.webp"
-            webp_path = image_path.parent / webp_name
-            
+        # Work out which sizes still need to be written
+        avif_paths = variant_paths(image_path, '.avif', sizes)
+        pending = []
+        for size_name, webp_path in variant_paths(image_path, sizes=sizes).items():
             # Skip if already exists
-            if webp_path.exists():
+            exists = webp_path.exists() and (not avif or avif_paths[size_name].exists())
+            if exists and not overwrite:
                 print(f"   ⏭️  {size_name.capitalize()}: Already exists")
+                if report is not None:
+                    report.setdefault('variants', []).extend(
+                        describe_outputs([webp_path, avif_paths[size_name]]))
                 continue
+            pending.append((size_name, webp_path))
+        
+        widths = [sizes[size_name]['width'] for size_name, _ in pending]
+        estimate_mb = working_set_mb(img.size, widths)
+        capped = (img.size[0] * img.size[1] >= LARGE_IMAGE_PIXELS or
+                  bool(memory_budget_mb and estimate_mb > memory_budget_mb))
+        if capped and pending:
+            budget = f"{memory_budget_mb:.0f}MB budget" if memory_budget_mb else "large image"
+            print(f"   🧠 Memory-capped ({budget}): ~{estimate_mb:.0f}MB of pixel data "
+                  f"if every size were made at once")
+        
+        if fast_resize or capped:
+            # Largest first, so each size can be resampled from the previous, smaller result
+            pending.sort(key=lambda item: -(sizes[item[0]]['width'] or float('inf')))
             
-            # Resize image
-            resized_img = resize_image(img, config['width'])
-            
-            # Save as WebP
-            resized_img.save(
-                webp_path,
-                'WEBP',
-                quality=config['quality'],
-                method=6
-            )
-            
-            webp_size = os.path.getsize(webp_path)
-            total_webp_size += webp_size
+            # Without a full-size output to write, the one decode can be at a reduced scale
+            if pending and None not in widths:
+                full_width, full_height = img.size
+                scale = draft_for_width(img, max(widths))
+                if scale > 1:
+                    saved_mb = full_width * full_height * (1 - 1 / scale**2) * 4 / 1024 / 1024
+                    print(f"   ⚡ Reduced decode: 1/{scale} scale ({img.size[0]}x{img.size[1]}), "
+                          f"~{saved_mb:.1f}MB less decoded pixel data")
+        
+        animated = is_animated(img)
+        if animated:
+            with timer.stage('decode'):
+                durations = frame_durations(img)
+            # AVIF encodes read the frames through a handle of their own
+            avif_source = Image.open(image_path) if avif else None
+            print(f"   🎞️  Animated: {img.n_frames} frames")
+            if report is not None:
+                report['animated'] = img.n_frames
+        else:
+            with timer.stage('decode'):
+                img.load()
+            img, colour = timer.call('convert', None, to_srgb, img)
+            if colour:
+                print(f"   🎨 Colour: converted to sRGB from {colour}")
+        
+        classification = None
+        if auto_mode and not animated:
+            classification = timer.call('classify', None, classify_image, img)
+        if classification:
+            colors = classification['colors'] or 'many'
+            print(f"   🧩 {classification['kind'].capitalize()}, {colors} colours"
+                  f"{', alpha' if classification['alpha'] else ''}")
+        
+        # With the full-size output to write, the smaller sizes come from a second,
+        # reduced-scale decode instead, which is cheaper than filtering the full one down
+        second_decode = (fast_resize and not capped and not animated and source_format == 'JPEG'
+                         and None in widths and any(widths))
+        
+        # Convert to RGB if needed, keeping transparency when the mode allows it
+        source_size = img.size
+        if animated:
+            pass  # Frames are converted one at a time as they are encoded
+        elif classification and classification['alpha']:
+            img = timer.call('convert', None, img.convert, 'RGBA')
+        else:
+            img = timer.call('convert', None, convert_to_rgb, img)
+        
+        # Blur placeholder, from the pixels already decoded
+        placeholder = timer.call('resize', 'placeholder', make_placeholder, img, full_size)
+        if report is not None:
+            report['placeholder'] = placeholder
+        
+        generated_files = {}
+        total_webp_size = 0
+        total_avif_size = 0
+        
+        # Encoders release the GIL, so WebP and AVIF encodes run side by side
+        # while the next size is being resized. Each format gets its own
+        # single-thread queue, because Image.save() keeps per-call state on the
+        # image and sizes can share one image when no resize was needed.
+        with ThreadPoolExecutor(max_workers=1) as webp_pool, \
+             ThreadPoolExecutor(max_workers=1) as avif_pool:
+            encodes = []
             
-            generated_files[size_name] = webp_path
+            # Generate each size
+            for size_name, webp_path in pending:
+                config = sizes[size_name]
+                
+                if animated:
+                    transform = partial(_animated_frame, width=config['width'], fast=fast_resize)
+                    webp_job = webp_pool.submit(timer.call, 'encode', size_name,
+                                                _save_animated_webp, img, webp_path,
+                                                config['quality'], method, durations,
+                                                transform, auto_mode)
+                    avif_job = (avif_pool.submit(timer.call, 'encode', f"{size_name}.avif",
+                                                 save_animated, avif_source, avif_paths[size_name],
+                                                 'AVIF', durations, transform, **AVIF_SETTINGS)
+                                if avif else None)
+                    output_size = scaled_size(source_size, config['width'])
+                    encodes.append((size_name, webp_path, output_size, webp_job, avif_job))
+                    continue
+                
+                if second_decode and config['width']:
+                    second_decode = False
+                    reduced = timer.call('decode', 'reduced', reduced_decode, image_path,
+                                         max(width for width in widths if width), img.mode)
+                    if reduced:
+                        img, scale = reduced
+                        decode_ms = timer.timings[-1][2] * 1000
+                        saved_mb = ((source_size[0] * source_size[1] - img.size[0] * img.size[1])
+                                    * len(img.getbands()) / 1024 / 1024)
+                        print(f"   ⚡ Reduced decode for the smaller sizes: 1/{scale} scale "
+                              f"({img.size[0]}x{img.size[1]}) in {decode_ms:.0f}ms, "
+                              f"{saved_mb:.1f}MB less pixel data to resample")
+                        if report is not None:
+                            report['reduced_decode'] = {'scale': scale,
+                                                        'seconds': round(decode_ms / 1000, 3),
+                                                        'saved_mb': round(saved_mb, 1)}
+                
+                # Resize image
+                with timer.stage('resize', size_name):
+                    resized_img = resize_image(img, config['width'], fast_resize, banded=capped)
+                if fast_resize and config['width']:
+                    img = resized_img
+                
+                # Save as WebP (and AVIF)
+                modes = None
+                if classification:
+                    modes = candidate_modes(classification, resized_img.size != source_size)
+                cached = (cached_qualities or {}).get(size_name)
+                webp_job = webp_pool.submit(_save_webp, resized_img, webp_path, config['quality'],
+                                            method, target_ssim, cached, modes, timer, size_name)
+                if capped:
+                    # Encode the formats in turn from the one image, without a copy
+                    webp_job.result()
+                avif_job = (avif_pool.submit(_save_avif, resized_img if capped else resized_img.copy(),
+                                             avif_paths[size_name], timer, size_name)
+                            if avif else None)
+                encodes.append((size_name, webp_path, resized_img.size, webp_job, avif_job))
+                
+                if capped:
+                    # Written and freed before the next size is made
+                    if avif_job:
+                        avif_job.result()
+                    del resized_img
             
-            print(f"   ✅ {size_name.capitalize()}: {resized_img.size[0]}x{resized_img.size[1]} "
-                  f"({webp_size/1024:.1f}KB, Q{config['quality']})")
+            for size_name, webp_path, (width, height), webp_job, avif_job in encodes:
+                choice = webp_job.result()
+                if (target_ssim or auto_mode) and report is not None:
+                    report.setdefault('qualities', {})[size_name] = choice
+                
+                webp_size = os.path.getsize(webp_path)
+                total_webp_size += webp_size
+                
+                generated_files[size_name] = webp_path
+                if report is not None:
+                    report.setdefault('widths', {})[size_name] = width
+                    report.setdefault('variants', []).append(
+                        variant_record(webp_path, (width, height), webp_size))
+                
+                avif_note = ""
+                if avif_job:
+                    avif_job.result()
+                    avif_size = os.path.getsize(avif_paths[size_name])
+                    total_avif_size += avif_size
+                    avif_note = f", AVIF {avif_size/1024:.1f}KB"
+                    if report is not None:
+                        report.setdefault('avif', {})[size_name] = avif_paths[size_name]
+                        report['variants'].append(
+                            variant_record(avif_paths[size_name], (width, height), avif_size))
+                
+                print(f"   ✅ {size_name.capitalize()}: {width}x{height} "
+                      f"({webp_size/1024:.1f}KB, {describe_choice(choice)}{avif_note})")
+        
+        if report is not None:
+            report['bytes'] = {'webp': total_webp_size, 'avif': total_avif_size}
+        
+        if hashed_names and generated_files:
+            timer.call('write', None, hash_outputs, generated_files, report)
+            print(f"   #️⃣  Named by content hash, e.g. {next(iter(generated_files.values())).name}")
+        
+        # Only once every variant has been made from the untouched source
+        if fallbacks and generated_files and not delete_original and not animated:
+            fallback = timer.call('fallback', None, optimize_fallback, image_path)
+            if fallback:
+                print(f"   🗜️  Fallback: {describe_fallback(fallback)}")
+                if report is not None:
+                    report['fallback'] = fallback
         
         if generated_files:
             reduction = ((original_size - total_webp_size) / original_size) * 100
@@ -134,95 +571,475 @@ def generate_responsive_images(image_path, delete_original=False):
                 print(f"   🗑️  Deleted original")
         
         return generated_files
-        
+    
     except Exception as e:
         print(f"   ❌ Error: {str(e)}")
         return {}
 
-def generate_srcset_snippet(base_name, sizes_generated):
-    """Generate HTML srcset snippet for responsive images"""
-    srcset_parts = []
-    
-    size_widths = {
-        'mobile': '640w',
-        'tablet': '1024w',
-        'desktop': '1920w',
-    }
+def generate_srcset_snippet(base_name, variant_widths, fallback_name=None, avif=False):
+    """
+    Generate HTML srcset snippet for responsive images
+    
+    Args:
+        base_name: Image filename without extension
+        variant_widths: Width of each WebP variant generated, keyed by its path
+        fallback_name: Filename for the <img> fallback, normally the original
+                       image (defaults to the full-size WebP)
+        avif: Put an AVIF <source> ahead of the WebP one
+    """
+    variants = sorted(variant_widths.items(), key=lambda item: item[1])
+    if not variants:
+        return ""
+    
+    # Each width is served up to its own size, the widest beyond it
+    widths = [width for _, width in variants]
+    conditions = [f"(max-width: {width}px) {width}px" for width in widths[:-1]]
+    sizes = ',\n           '.join(conditions + [f"{widths[-1]}px"])
     
-    for size_name in ['mobile', 'tablet', 'desktop']:
-        if size_name in sizes_generated:
-            suffix = SIZES[size_name]['suffix']
-            srcset_parts.append(f"/images/{base_name}{suffix}.webp {size_widths[size_name]}")
+    formats = [('.avif', 'image/avif')] if avif else []
+    formats.append(('.webp', 'image/webp'))
+    sources = []
     
-    if srcset_parts:
+    # Browsers pick the first <source> whose type they support
+    for extension, mime_type in formats:
+        srcset_parts = [f"/images/{path.with_suffix(extension).name} {width}w"
+                        for path, width in variants]
         srcset = ',\n            '.join(srcset_parts)
-        return f"""
-<picture>
-  <source
+        sources.append(f"""  <source
     srcSet="{{
             {srcset}
          }}"
-    sizes="(max-width: 640px) 640px,
-           (max-width: 1024px) 1024px,
-           1920px"
-    type="image/webp"
-  />
-  <img src="/images/{base_name}.webp" alt="" />
+    sizes="{sizes}"
+    type="{mime_type}"
+  />""")
+    
+    fallback_name = fallback_name or f"{base_name}.webp"
+    source_block = '\n'.join(sources)
+    return f"""
+<picture>
+{source_block}
+  <img src="/images/{fallback_name}" alt="" />
 </picture>
 """
-    return ""
 
-def process_all_images(root_dir, delete_original=False):
-    """Process all images in directory"""
+def is_responsive_source(file_path):
+    """Check if a file is a source image and not an already generated variant"""
+    return (file_path.suffix.lower() in SUPPORTED_FORMATS and
+            not any(size_config['suffix'] in file_path.stem
+                    for size_config in SIZES.values() if size_config['suffix']))
+
+def find_source_images(root_path, inventory=None):
+    """Find all source images under root_path, in walk order"""
+    if inventory is None:
+        inventory = walk_tree(root_path)
+    
+    return [file_path for file_path in inventory.image_paths() if is_responsive_source(file_path)]
+
+def responsive_fingerprint(method=6, fast_resize=False, target_ssim=None, avif=False,
+                           auto_mode=False, max_pixels=DEFAULT_MAX_PIXELS, breakpoint_step=None,
+                           fallbacks=False, hashed_names=False):
+    """Manifest settings fingerprint of the responsive variants built with these settings"""
+    return settings_fingerprint({'sizes': SIZES, 'breakpoint_step': breakpoint_step,
+                                 'srgb': COLOUR_MANAGED, 'fallbacks': fallbacks,
+                                 'hashed_names': hashed_names,
+                                 'method': method,
+                                 'fast_resize': fast_resize,
+                                 'target_ssim': target_ssim,
+                                 'avif': AVIF_SETTINGS if avif else None,
+                                 'auto_mode': auto_mode,
+                                 'max_pixels': max_pixels})
+
+def _responsive_worker(item, delete_original, fast_resize, method, target_ssim, avif,
+                       auto_mode=False, memory_budget_mb=None, max_pixels=DEFAULT_MAX_PIXELS,
+                       reject_oversize=False, breakpoint_step=None, fallbacks=False,
+                       hashed_names=False):
+    """Generate variants for one image, capturing its log output for the parent process"""
+    file_path, overwrite, cached = item
+    log = io.StringIO()
+    source_stat = file_path.stat()
+    report = {}
+    
+    # Reuse the qualities chosen last time if the source itself hasn't changed
+    digest = file_digest(file_path) if cached else None
+    cached_qualities = cached['qualities'] if cached and cached['sha256'] == digest else None
+    
+    # Each worker handles one image at a time, so its peak is this image's
+    rss_reset = reset_peak_rss()
+    with redirect_stdout(log):
+        generated = generate_responsive_images(file_path, delete_original, overwrite,
+                                               fast_resize, method, target_ssim,
+                                               cached_qualities, report, avif, auto_mode,
+                                               memory_budget_mb, max_pixels, reject_oversize,
+                                               breakpoint_step, fallbacks, hashed_names)
+    peak_kb = peak_rss_kb() if rss_reset else None
+    if peak_kb and generated:
+        log.write(f"   🧠 Peak RSS: {peak_kb/1024:.0f}MB\n")
+    
+    # The manifest records the source as optimized, not as it was found
+    if report.get('fallback', {}).get('written'):
+        source_stat = file_path.stat()
+    
+    # Only a complete set of variants is recorded
+    if generated and len(generated) == len(report['sizes']) and not delete_original:
+        digest = digest or file_digest(file_path)
+    else:
+        digest = None
+    
+    return {
+        'generated': generated,
+        'source_stat': source_stat,
+        'digest': digest,
+        'report': report,
+        'timings': report.pop('timings', []),
+        'peak_rss_kb': peak_kb,
+        'log': log.getvalue(),
+    }
+
+def process_all_images(root_dir, delete_original=False, jobs=1, manifest_path=None,
+                       inventory=None, fast_resize=False, method=6, target_ssim=None,
+                       avif=False, auto_mode=False, metrics=None, memory_budget_mb=None,
+                       max_pixels=DEFAULT_MAX_PIXELS, reject_oversize=False,
+                       breakpoint_step=None, placeholder_index=None, generated_module=None,
+                       fallbacks=False, referenced_only=False, hashed_names=False,
+                       grace_days=DEFAULT_GRACE_DAYS, headers_snippet=None, dedupe=False,
+                       dedupe_threshold=DEFAULT_THRESHOLD):
+    """
+    Process all images in directory, optionally on several worker processes
+    
+    Args:
+        root_dir: Root directory to search
+        delete_original: Whether to delete original files
+        jobs: Number of worker processes to generate variants with
+        manifest_path: Build manifest to skip unchanged images with, or None
+                       to only skip variants that already exist
+        inventory: tree_walker.walk_tree() result for root_dir, if already walked
+        fast_resize: Use reduced-scale decoding and cascaded downscaling
+        method: WebP encoder effort (0-6)
+        target_ssim: Pick each variant's quality to meet this SSIM score, or None
+                     to use the qualities in SIZES
+        avif: Also generate an AVIF file for every size
+        auto_mode: Choose lossless, lossy-with-alpha or lossy WebP encoding per image
+        metrics: image_metrics.PipelineMetrics to record each image's stage timings in
+        memory_budget_mb: Memory budget for decoded pixel data, shared between the
+                          jobs; images that would exceed their share are processed
+                          memory-capped. None for no budget.
+        max_pixels: Downsize sources with more pixels than this
+        reject_oversize: Skip sources over max_pixels instead of downsizing them
+        breakpoint_step: Pick each image's widths so neighbouring variants differ
+                         by about this many bytes, or None to use SIZES
+        placeholder_index: Path to write every image's blur placeholder to, keyed
+                           by the public path of its full-size WebP, or None
+        generated_module: Path to write the TypeScript module describing every
+                          image's variants to (see generated_images.py), or None
+        fallbacks: Also re-encode JPEG and PNG sources as smaller fallbacks
+                   (see legacy_fallbacks.py)
+        referenced_only: Skip images no code file references (see reference_index.py)
+        hashed_names: Name variants after their content hash (see hashed_names.py);
+                      needs the manifest, which maps each source to its current
+                      names. Replaced variants are kept for grace_days before
+                      being deleted.
+        grace_days: Days a replaced content-hashed variant stays on disk
+        headers_snippet: Path to write the headers rules marking the content-hashed
+                         variants immutable to, or None
+        dedupe: Only convert one copy of images under public/ that show the same
+                picture (see duplicate_images.py); the other copies keep the
+                variants they already have
+        dedupe_threshold: Most differing perceptual hash bits for near-duplicates,
+                          or None for byte-identical copies only
+    
+    Returns:
+        dict: duplicate_images.find_duplicates() report, when deduplicating
+    """
     root_path = Path(root_dir)
     
     if not root_path.exists():
         print(f"❌ Error: Directory '{root_dir}' does not exist")
         return
     
+    if hashed_names and not manifest_path:
+        print(f"❌ Error: Content-hashed names need the build manifest")
+        return
+    
     print(f"\n🔍 Scanning for images in: {root_path.absolute()}")
-    print(f"   Generating sizes: {', '.join(SIZES.keys())}")
+    if breakpoint_step:
+        print(f"   Generating sizes: breakpoints {breakpoint_step/1024:g}KB apart")
+    else:
+        print(f"   Generating sizes: {', '.join(SIZES.keys())}")
+    print(f"   Formats: {'AVIF + WebP' if avif else 'WebP'}")
     print(f"   Delete originals: {delete_original}")
+    print(f"   Encoder method: {method}")
+    print(f"   Target SSIM: {target_ssim or 'off'}")
+    print(f"   Encode mode: {'auto' if auto_mode else 'lossy'}")
+    print(f"   Parallel jobs: {jobs}")
+    print(f"   Fast resize: {fast_resize}")
+    print(f"   Memory budget: {f'{memory_budget_mb:g}MB' if memory_budget_mb else 'none'}")
+    print(f"   Max pixels: {max_pixels/1_000_000:g}MP ({'reject' if reject_oversize else 'downsize'} larger)")
+    print(f"   Manifest: {manifest_path or 'disabled'}")
+    print(f"   Placeholder index: {placeholder_index or 'disabled'}")
+    print(f"   Image module: {generated_module or 'disabled'}")
+    print(f"   Optimize fallbacks: {fallbacks}")
+    print(f"   Referenced images only: {referenced_only}")
+    print(f"   Content-hashed names: {f'on ({grace_days:g} day grace period)' if hashed_names else 'off'}")
+    if dedupe:
+        print(f"   Deduplicate: {'exact copies' if dedupe_threshold is None else f'within {dedupe_threshold} bits'}")
+    else:
+        print(f"   Deduplicate: off")
     print(f"   Excluding folders: {', '.join(EXCLUDE_FOLDERS)}")
     
     images_processed = 0
+    animated_count = 0
     total_variants = 0
+    skipped_sizes = 0
+    total_fixed_size = 0
+    total_targeted_size = 0
+    format_bytes = {'WebP': 0, 'AVIF': 0}
+    mode_counts = {}
+    mode_bytes = {}
+    fallback_count = 0
+    fallback_before = 0
+    fallback_after = 0
+    peak_rss = None
     srcset_snippets = {}
+    placeholders = {}
+    catalog = {}
+    costs = {}
+    duplicates = None
     
-    # Walk through directories
-    for dirpath, dirnames, filenames in os.walk(root_path):
-        if should_skip_directory(dirpath):
-            dirnames[:] = []
-            continue
+    if inventory is None:
+        inventory = walk_tree(root_path)
+    source_images = find_source_images(root_path, inventory)
+    stats = inventory.stats()
+    
+    if referenced_only:
+        # The pipeline's own generated files list every image, so they don't count
+        generated_files = [path for path in (manifest_path, placeholder_index, generated_module,
+                                             headers_snippet) if path]
+        source_images = skip_unreferenced(root_path, inventory, source_images, generated_files)
+    
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    
+    if dedupe:
+        source_images, duplicates = skip_duplicates(
+            root_path, source_images, stats,
+            get_section(manifest, 'duplicates') if manifest else None, dedupe_threshold)
+    
+    if manifest_path:
+        section = get_section(manifest, 'responsive')
+        fingerprint = responsive_fingerprint(method, fast_resize, target_ssim, avif, auto_mode,
+                                             max_pixels, breakpoint_step, fallbacks, hashed_names)
+        # Replaced content-hashed variants, kept until the grace period is over
+        retired = get_section(manifest, 'retired')
+        work_items = []
+        seen_keys = set()
+        unchanged_count = 0
         
-        dirnames[:] = [d for d in dirnames if d not in EXCLUDE_FOLDERS]
+        # Unchanged images are settled from the manifest without opening them
+        for file_path in source_images:
+            key = relative_key(file_path, root_path)
+            seen_keys.add(key)
+            source_stat = stats[file_path]
+            entry = section.get(key)
+            
+            # Outputs under plain names can't be adopted as hashed ones
+            if entry is None and not hashed_names:
+                output_keys = [relative_key(path, root_path)
+                               for path in output_paths(file_path, avif)]
+                entry = adopt_existing_outputs(file_path, source_stat, fingerprint,
+                                               output_keys, root_path)
+                if entry:
+                    section[key] = entry
+            
+            if is_up_to_date(entry, file_path, source_stat, fingerprint, root_path):
+                unchanged_count += 1
+                # Built before placeholders were recorded: a tiny decode is enough
+                if placeholder_index and 'placeholder' not in entry:
+                    try:
+                        entry['placeholder'] = placeholder_for_file(file_path)
+                    except OSError as e:
+                        print(f"   ⚠️  No placeholder for {key}: {e}")
+            else:
+                cached = None
+                if entry and entry['settings'] == fingerprint:
+                    cached = cached_details(entry, 'qualities')
+                work_items.append((file_path, True, cached))
         
-        for filename in filenames:
-            file_path = Path(dirpath) / filename
+        if unchanged_count:
+            print(f"\n⏭️  Unchanged since last build: {unchanged_count} images")
+    else:
+        work_items = [(file_path, False, None) for file_path in source_images]
+    
+    worker = partial(_responsive_worker, delete_original=delete_original,
+                     fast_resize=fast_resize, method=method, target_ssim=target_ssim, avif=avif,
+                     auto_mode=auto_mode,
+                     memory_budget_mb=memory_budget_mb / jobs if memory_budget_mb else None,
+                     max_pixels=max_pixels, reject_oversize=reject_oversize,
+                     breakpoint_step=breakpoint_step, fallbacks=fallbacks,
+                     hashed_names=hashed_names)
+    
+    # Results arrive in walk order regardless of the number of jobs
+    for (file_path, _, _), result in zip(work_items, run_jobs(worker, work_items, jobs)):
+        print(result['log'], end='')
+        generated = result['generated']
+        if 'placeholder' in result['report']:
+            placeholders[relative_key(file_path, root_path)] = result['report']['placeholder']
+        image = catalog_entry(result['report'].get('variants', []), root_path)
+        if image:
+            # A source that failed to decode still has its existing variants, but no placeholder
+            if 'placeholder' in result['report']:
+                image['blurDataURL'] = result['report']['placeholder']['blurDataURL']
+            catalog[public_path(file_path, root_path)] = image
+        
+        if generated:
+            images_processed += 1
+            animated_count += 'animated' in result['report']
+            total_variants += len(generated)
+            costs[relative_key(file_path, root_path)] = (
+                sum(result['report']['bytes'].values()), encode_seconds(result['timings']))
+            skipped_sizes += result['report']['skipped']
+            format_bytes['WebP'] += result['report']['bytes']['webp']
+            format_bytes['AVIF'] += result['report']['bytes']['avif']
             
-            # Check if it's a supported image format and not already a variant
-            if (file_path.suffix.lower() in SUPPORTED_FORMATS and
-                not any(size_config['suffix'] in file_path.stem 
-                       for size_config in SIZES.values() if size_config['suffix'])):
-                
-                generated = generate_responsive_images(file_path, delete_original)
+            fallback = result['report'].get('fallback')
+            if fallback and fallback['written']:
+                fallback_count += 1
+                fallback_before += fallback['before']
+                fallback_after += fallback['after']
+            
+            for size_name, choice in result['report'].get('qualities', {}).items():
+                if size_name not in generated or not generated[size_name].exists():
+                    continue
+                variant_size = generated[size_name].stat().st_size
+                if 'fixed_bytes' in choice:
+                    total_fixed_size += choice['fixed_bytes']
+                    total_targeted_size += variant_size
+                if 'mode' in choice:
+                    mode_counts[choice['mode']] = mode_counts.get(choice['mode'], 0) + 1
+                    mode_bytes[choice['mode']] = mode_bytes.get(choice['mode'], 0) + variant_size
+            
+            # Generate srcset snippet, falling back to the original image
+            fallback_name = None if delete_original else file_path.name
+            variant_widths = {generated[size_name]: width
+                              for size_name, width in result['report']['widths'].items()}
+            snippet = generate_srcset_snippet(file_path.stem, variant_widths, fallback_name, avif)
+            if snippet:
+                srcset_snippets[file_path.stem] = snippet
+        
+        if generated and result['peak_rss_kb']:
+            if peak_rss is None or result['peak_rss_kb'] > peak_rss[0]:
+                peak_rss = (result['peak_rss_kb'], file_path.name)
+        
+        if metrics is not None and result['timings']:
+            report = result['report']
+            metrics.record(relative_key(file_path, root_path), result['timings'],
+                           status='built' if generated else 'error',
+                           source_bytes=result['source_stat'].st_size,
+                           output_bytes=sum(report.get('bytes', {}).values()),
+                           peak_rss_mb=result['peak_rss_kb'] / 1024 if result['peak_rss_kb'] else None)
+        
+        if manifest_path:
+            key = relative_key(file_path, root_path)
+            old_entry = section.pop(key, None)
+            
+            if result['digest']:
+                generated_paths = list(generated.values())
+                generated_paths.extend(result['report'].get('avif', {}).values())
+                output_keys = [relative_key(path, root_path) for path in generated_paths]
+                details = {'placeholder': result['report']['placeholder'],
+                           'image': catalog_entry(result['report']['variants'], root_path)}
+                if target_ssim or auto_mode:
+                    details['qualities'] = result['report']['qualities']
+                # What converting it again would cost, for the duplicate report
+                details['encode_seconds'] = round(encode_seconds(result['timings']), 3)
+                section[key] = make_entry(result['source_stat'], result['digest'],
+                                          fingerprint, output_keys, details)
                 
-                if generated:
-                    images_processed += 1
-                    total_variants += len(generated)
-                    
-                    # Generate srcset snippet
-                    snippet = generate_srcset_snippet(file_path.stem, generated)
-                    if snippet:
-                        srcset_snippets[file_path.stem] = snippet
+                # Variants for sizes that were dropped from SIZES or no longer apply,
+                # and with hashed names, every variant whose content changed
+                if old_entry:
+                    stale = set(old_entry['outputs']) - set(output_keys)
+                    if hashed_names:
+                        for output in retire_outputs(retired, stale):
+                            print(f"   ⏳ Retired variant (deleted after {grace_days:g} days): {output}")
+                    else:
+                        for removed in remove_outputs(sorted(stale), root_path):
+                            print(f"   🧹 Removed stale variant: {removed}")
+    
+    if manifest_path:
+        if hashed_names:
+            for output in prune_orphans(section, seen_keys, root_path,
+                                        partial(retire_outputs, retired)):
+                print(f"⏳ Retired orphaned variant (deleted after {grace_days:g} days): {output}")
+        else:
+            for removed in prune_orphans(section, seen_keys, root_path):
+                print(f"🧹 Removed orphaned variant: {removed}")
+        
+        # Pages and caches may still point at a replaced variant for a while
+        for removed in collect_garbage(retired, section, root_path, grace_days):
+            print(f"🧹 Removed retired variant: {removed}")
+        
+        if hashed_names and headers_snippet:
+            rules = immutable_headers(section, retired, root_path)
+            if save_headers_snippet(headers_snippet, rules):
+                print(f"\n📌 Immutable headers snippet updated: {len(rules)} files ({headers_snippet})")
+        
+        # Unchanged images keep what was recorded when they were built
+        costs = {**conversion_costs(section), **costs}
+        if generated_module:
+            catalog = catalog_from_section(section, root_path)
+        placeholders = {key: entry['placeholder'] for key, entry in section.items()
+                        if 'placeholder' in entry}
+        save_manifest(manifest_path, manifest)
+    
+    if placeholder_index:
+        index = {public_path(variant_paths(root_path / key)['original'], root_path): placeholder
+                 for key, placeholder in placeholders.items()}
+        if hashed_names:
+            # Keyed by the full-size variant's current name, which code now references
+            index = {section[key]['image']['src']: placeholder
+                     for key, placeholder in placeholders.items() if section[key].get('image')}
+        if save_index(placeholder_index, index):
+            print(f"\n🌫️  Placeholder index updated: {len(index)} images ({placeholder_index})")
+    
+    if generated_module and save_module(generated_module, catalog):
+        print(f"\n🧾 Image module updated: {len(catalog)} images ({generated_module})")
     
     # Print summary
     print("\n" + "="*70)
     print("📊 GENERATION SUMMARY")
     print("="*70)
     print(f"✅ Images processed: {images_processed}")
+    if animated_count:
+        print(f"🎞️  Animated: {animated_count} images (all frames kept)")
     print(f"📦 Total variants created: {total_variants}")
-    print(f"📏 Sizes per image: {len([s for s in SIZES.values() if s['width'] or s['width'] is None])}")
+    if images_processed:
+        print(f"📏 Variants per image: {total_variants / images_processed:.1f}")
+    if skipped_sizes:
+        print(f"♻️  Duplicate variants not written: {skipped_sizes}")
+    
+    if images_processed:
+        print(f"💾 Bytes written: " + ", ".join(
+            f"{name} {size/1024/1024:.2f} MB" for name, size in format_bytes.items() if size))
+    
+    if fallback_count:
+        fallback_saving = (1 - fallback_after / fallback_before) * 100
+        print(f"🗜️  Fallbacks optimized: {fallback_count} files, {fallback_before/1024/1024:.2f} MB → "
+              f"{fallback_after/1024/1024:.2f} MB ({fallback_saving:.1f}% saved)")
+    
+    if peak_rss:
+        print(f"🧠 Highest peak RSS: {peak_rss[0]/1024:.0f}MB ({peak_rss[1]})")
+    
+    if mode_counts:
+        print(f"🧩 Encode modes: " + ", ".join(
+            f"{mode} {mode_counts[mode]} variants ({mode_bytes[mode]/1024/1024:.2f} MB)"
+            for mode in sorted(mode_counts)))
+    
+    if total_fixed_size:
+        targeted_saving = (1 - total_targeted_size / total_fixed_size) * 100
+        print(f"🎯 SSIM-targeted variants: {total_targeted_size/1024/1024:.2f} MB vs "
+              f"{total_fixed_size/1024/1024:.2f} MB at the SIZES qualities ({targeted_saving:.1f}% saved)")
+    
+    if duplicates and duplicates['clusters']:
+        print_duplicate_report(duplicates, costs, limit=10)
     
     # Print srcset examples
     if srcset_snippets:
@@ -242,45 +1059,173 @@ def process_all_images(root_dir, delete_original=False):
     print("\n💡 TIP: Use <picture> tags with srcSet for best performance!")
     print("   Browsers will automatically choose the right size.")
     print("="*70 + "\n")
+    
+    return duplicates
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Generate responsive WebP variants")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="number of worker processes (0 = one per CPU, default 1)")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="don't ask for confirmation")
+    parser.add_argument('--profile', choices=ENCODER_PROFILES, default=DEFAULT_PROFILE,
+                        help=f"encoder effort profile (default {DEFAULT_PROFILE})")
+    parser.add_argument('--manifest', default=MANIFEST_FILENAME,
+                        help=f"build manifest path (default {MANIFEST_FILENAME})")
+    parser.add_argument('--no-manifest', dest='manifest', action='store_const', const=None,
+                        help="only skip variants that already exist")
+    parser.add_argument('--placeholder-index', default=PLACEHOLDER_INDEX, metavar='PATH',
+                        help=f"blur placeholder index to write (default {PLACEHOLDER_INDEX})")
+    parser.add_argument('--no-placeholder-index', dest='placeholder_index', action='store_const',
+                        const=None, help="don't write a placeholder index")
+    parser.add_argument('--image-module', default=GENERATED_MODULE, metavar='PATH',
+                        help=f"TypeScript module describing every image to write (default {GENERATED_MODULE})")
+    parser.add_argument('--no-image-module', dest='image_module', action='store_const',
+                        const=None, help="don't write an image module")
+    parser.add_argument('--fast-resize', action='store_true',
+                        help="reduced-scale JPEG decoding and cascaded downscaling "
+                             "for the smaller sizes")
+    parser.add_argument('--target-ssim', type=float, nargs='?', const=DEFAULT_TARGET_SSIM,
+                        help=f"pick each variant's quality to meet this SSIM (default {DEFAULT_TARGET_SSIM})")
+    parser.add_argument('--avif', action='store_true',
+                        help="also generate AVIF versions of every size")
+    parser.add_argument('--auto-mode', action='store_true',
+                        help="pick lossless, lossy-with-alpha or lossy encoding per image")
+    parser.add_argument('--breakpoints', type=float, nargs='?', const=DEFAULT_BYTE_STEP / 1024, metavar='KB',
+                        help=f"pick each image's widths so neighbouring variants differ by KB "
+                             f"(default {DEFAULT_BYTE_STEP / 1024:g}) instead of the fixed sizes")
+    parser.add_argument('--optimize-fallbacks', action='store_true',
+                        help="re-encode JPEG/PNG originals as progressive JPEG / recompressed PNG "
+                             "without metadata")
+    parser.add_argument('--all-images', action='store_true',
+                        help="also process images no code file references")
+    parser.add_argument('--hashed-names', action='store_true',
+                        help="name variants after their content hash, for immutable caching")
+    parser.add_argument('--gc-grace-days', type=float, default=DEFAULT_GRACE_DAYS, metavar='DAYS',
+                        help=f"keep replaced content-hashed variants this long (default {DEFAULT_GRACE_DAYS})")
+    parser.add_argument('--headers-snippet', default=HEADERS_SNIPPET, metavar='PATH',
+                        help=f"immutable Cache-Control headers for the content-hashed variants "
+                             f"(default {HEADERS_SNIPPET})")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="convert one copy of each duplicate image under public/")
+    parser.add_argument('--dedupe-threshold', type=int, default=DEFAULT_THRESHOLD, metavar='BITS',
+                        help=f"most perceptual hash bits two images may differ in to count as "
+                             f"duplicates; -1 for byte-identical only (default {DEFAULT_THRESHOLD})")
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help="decoded pixel memory shared by all jobs; larger images are processed memory-capped")
+    parser.add_argument('--max-pixels', type=float, default=DEFAULT_MAX_PIXELS / 1_000_000, metavar='MP',
+                        help=f"downsize sources over this many megapixels (default {DEFAULT_MAX_PIXELS / 1_000_000:g})")
+    parser.add_argument('--reject-oversize', action='store_true',
+                        help="skip sources over --max-pixels instead of downsizing them")
+    parser.add_argument('--metrics-jsonl', metavar='PATH',
+                        help="write each image's stage timings and a summary to PATH as JSON lines")
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help="write stage timing histograms to PATH in Prometheus text format")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="no log output (implies --yes); use with the metrics options")
+    args = parser.parse_args()
+    
+    if args.hashed_names and not args.manifest:
+        parser.error("--hashed-names needs the build manifest")
+    
+    if args.quiet:
+        args.yes = True
+    
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    
+    if args.dedupe_threshold < 0:
+        args.dedupe_threshold = None
+    
+    if args.target_ssim:
+        require_numpy()
+    
+    if args.avif:
+        require_avif()
+    
+    return args
 
 def main():
     """Main function"""
-    print("\n" + "="*70)
-    print("🖼️  RESPONSIVE WEBP IMAGE GENERATOR")
-    print("="*70)
+    args = parse_args()
+    metrics = PipelineMetrics('responsive') if args.metrics_jsonl or args.metrics_prom else None
     
-    # Check if PIL/Pillow is installed
-    try:
-        from PIL import Image
-    except ImportError:
-        print("\n❌ Error: Pillow library not found!")
-        print("   Install it with: pip install Pillow")
-        sys.exit(1)
-    
-    current_dir = Path.cwd()
-    
-    # Configuration
-    delete_original = False  # Set to True to delete originals
-    
-    print(f"\n⚙️  CONFIGURATION:")
-    print(f"   Sizes to generate:")
-    for size_name, config in SIZES.items():
-        width_str = f"{config['width']}px" if config['width'] else "original"
-        print(f"      • {size_name.capitalize()}: {width_str} @ Q{config['quality']}")
-    print(f"\n   Delete originals: {delete_original}")
-    print(f"   (Edit the script to change these settings)")
-    
-    # Ask for confirmation
-    response = input("\n🚀 Start generation? (y/n): ").lower().strip()
-    
-    if response != 'y':
-        print("❌ Generation cancelled")
-        return
-    
-    # Process images
-    process_all_images(current_dir, delete_original)
+    with quiet_output(args.quiet):
+        print("\n" + "="*70)
+        print("🖼️  RESPONSIVE WEBP IMAGE GENERATOR")
+        print("="*70)
+        
+        # Check if PIL/Pillow is installed
+        try:
+            from PIL import Image
+        except ImportError:
+            print("\n❌ Error: Pillow library not found!")
+            print("   Install it with: pip install Pillow")
+            sys.exit(1)
+        
+        current_dir = Path.cwd()
+        
+        # Configuration
+        delete_original = False  # Set to True to delete originals
+        
+        print(f"\n⚙️  CONFIGURATION:")
+        print(f"   Sizes to generate:")
+        if args.breakpoints:
+            print(f"      • Per image: breakpoints {args.breakpoints:g}KB apart")
+        else:
+            for size_name, config in SIZES.items():
+                width_str = f"{config['width']}px" if config['width'] else "original"
+                print(f"      • {size_name.capitalize()}: {width_str} @ Q{config['quality']}")
+        method = ENCODER_PROFILES[args.profile]['method']
+        print(f"\n   Profile: {args.profile} (method {method})")
+        print(f"   Delete originals: {delete_original}")
+        print(f"   Parallel jobs: {args.jobs}")
+        print(f"   Fast resize: {args.fast_resize}")
+        print(f"   Memory budget: {f'{args.memory_budget:g}MB' if args.memory_budget else 'none'}")
+        print(f"   Max pixels: {args.max_pixels:g}MP")
+        print(f"   Target SSIM: {args.target_ssim or 'off'}")
+        print(f"   AVIF: {args.avif}")
+        print(f"   Encode mode: {'auto' if args.auto_mode else 'lossy'}")
+        print(f"   Manifest: {args.manifest or 'disabled'}")
+        print(f"   Placeholder index: {args.placeholder_index or 'disabled'}")
+        print(f"   Image module: {args.image_module or 'disabled'}")
+        print(f"   Optimize fallbacks: {args.optimize_fallbacks}")
+        print(f"   Referenced images only: {not args.all_images}")
+        print(f"   Content-hashed names: {args.hashed_names}")
+        print(f"   Deduplicate: {args.dedupe}")
+        print(f"   (Edit the script to change these settings)")
+        
+        # Ask for confirmation
+        if not args.yes:
+            response = input("\n🚀 Start generation? (y/n): ").lower().strip()
+            
+            if response != 'y':
+                print("❌ Generation cancelled")
+                return
+        
+        # Process images
+        process_all_images(current_dir, delete_original, args.jobs, args.manifest,
+                           fast_resize=args.fast_resize, method=method, target_ssim=args.target_ssim,
+                           avif=args.avif, auto_mode=args.auto_mode, metrics=metrics,
+                           memory_budget_mb=args.memory_budget,
+                           max_pixels=int(args.max_pixels * 1_000_000),
+                           reject_oversize=args.reject_oversize,
+                           breakpoint_step=int(args.breakpoints * 1024) if args.breakpoints else None,
+                           placeholder_index=args.placeholder_index,
+                           generated_module=args.image_module,
+                           fallbacks=args.optimize_fallbacks,
+                           referenced_only=not args.all_images,
+                           hashed_names=args.hashed_names, grace_days=args.gc_grace_days,
+                           headers_snippet=args.headers_snippet, dedupe=args.dedupe,
+                           dedupe_threshold=args.dedupe_threshold)
+        
+        if metrics:
+            metrics.print_summary()
+        
+        print("✨ Done!")
     
-    print("✨ Done!")
+    write_metrics(metrics, args.metrics_jsonl, args.metrics_prom)
 
 if __name__ == "__main__":
     main()
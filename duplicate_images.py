@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Duplicate Image Detection
+Finds copies of the same picture under public/ (byte-identical files, and
+re-encodes or format changes at the same size) by exact and perceptual hash,
+so only one canonical copy is converted and references can point at it
+"""
+
+import argparse
+import os
+import posixpath
+import re
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from animated_images import is_animated
+from generated_images import GENERATED_MODULE
+from hashed_names import HEADERS_SNIPPET, plain_name
+from image_manifest import (MANIFEST_FILENAME, file_digest, get_section, is_up_to_date,
+                            load_manifest, make_entry, relative_key, save_manifest,
+                            settings_fingerprint)
+from placeholders import PLACEHOLDER_INDEX
+from tree_walker import walk_tree
+from update_images_to_webp import (OUTPUT_REFERENCE_RE, REFERENCE_PATTERNS, REFERENCE_RE,
+                                   load_patch_plan, plan_totals, save_patch_plan,
+                                   splice_edits, update_all_files)
+
+# Only served images are deduplicated; elsewhere each copy may be imported
+# by a relative path, which can't be rewritten without knowing the importer
+DEDUPE_DIR = 'public/'
+
+# Side of the difference hash grid: 8 gives a 64-bit hash
+DHASH_SIZE = 8
+
+# Most differing hash bits for two images to count as the same picture; a
+# re-encode or format change flips a few, a different photo about half
+DEFAULT_THRESHOLD = 4
+
+# A near-duplicate is confirmed on a DETAIL_SIZE square grayscale thumbnail,
+# where no cell may differ by more than DETAIL_TOLERANCE levels: the hash alone
+# can't tell apart images made from one template (cards differing only in
+# their text), while re-encodes stay within a few levels everywhere
+DETAIL_SIZE = 16
+DETAIL_TOLERANCE = 12
+
+# Near-duplicates must be within this fraction of each other's width and
+# height: pointing a thumbnail's references at the full-size copy would make
+# its pages heavier, not lighter
+SIZE_TOLERANCE = 0.02
+
+# Part of the manifest fingerprint; bump when the hash computation changes
+HASH_SETTINGS = {'dhash_size': DHASH_SIZE, 'detail_size': DETAIL_SIZE, 'version': 1}
+
+def dhash(gray):
+    """
+    Difference hash of a grayscale image: one bit per neighbouring pixel pair
+    of a tiny copy, set where brightness falls from left to right
+    
+    Returns:
+        int: DHASH_SIZE * DHASH_SIZE bits
+    """
+    # Full filtering, no reducing gap: a shortcut that depends on the source size
+    # would hash the same picture differently at different sizes and formats
+    pixels = gray.resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS).tobytes()
+    
+    bits = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+def hamming_distance(a, b):
+    """Number of bits in which two hashes differ"""
+    return bin(a ^ b).count('1')
+
+def image_hashes(image_path):
+    """
+    Exact and perceptual hash of an image file, with what decides whether two
+    similar-looking images can stand in for each other
+    
+    Returns:
+        dict: 'sha256', 'dhash' and 'detail' (hex), 'width', 'height', 'alpha', 'animated'
+    """
+    with Image.open(image_path) as img:
+        width, height = img.size
+        alpha = 'A' in img.getbands() or 'transparency' in img.info
+        animated = is_animated(img)
+        
+        # JPEGs decode at a reduced scale; both hashes only need a few pixels
+        img.draft('L', (DETAIL_SIZE * 8, DETAIL_SIZE * 8))
+        gray = img.convert('L')
+        bits = dhash(gray)
+        detail = gray.resize((DETAIL_SIZE, DETAIL_SIZE), Image.Resampling.LANCZOS).tobytes()
+    
+    return {'sha256': file_digest(image_path), 'dhash': f"{bits:0{DHASH_SIZE * DHASH_SIZE // 4}x}",
+            'detail': detail.hex(), 'width': width, 'height': height, 'alpha': alpha,
+            'animated': animated}
+
+def canonical_rank(record):
+    """
+    Sort key putting the copy to keep first: the most pixels, then the one
+    nearest the top of public/, then the shortest path
+    """
+    return (-record['width'] * record['height'], record['key'].count('/'), len(record['key']),
+            record['key'])
+
+def near_distance(canonical, record, threshold):
+    """
+    Hash distance between two images if they are near-duplicates, or None
+    
+    Animations, and images that differ in transparency or size, never are;
+    a close hash is confirmed on the detail thumbnails.
+    """
+    if canonical['animated'] or record['animated'] or canonical['alpha'] != record['alpha']:
+        return None
+    if (abs(canonical['width'] - record['width']) > canonical['width'] * SIZE_TOLERANCE or
+            abs(canonical['height'] - record['height']) > canonical['height'] * SIZE_TOLERANCE):
+        return None
+    
+    distance = hamming_distance(int(canonical['dhash'], 16), int(record['dhash'], 16))
+    if distance > threshold:
+        return None
+    
+    detail = zip(bytes.fromhex(canonical['detail']), bytes.fromhex(record['detail']))
+    return distance if max(abs(a - b) for a, b in detail) <= DETAIL_TOLERANCE else None
+
+def cluster_duplicates(records, threshold=DEFAULT_THRESHOLD):
+    """
+    Group images showing the same picture
+    
+    Byte-identical files always group; others join the first group whose
+    canonical copy is within the threshold. Comparing against the canonical
+    copy only keeps a chain of small differences from joining unrelated images.
+    
+    Args:
+        records: image_hashes() of each image, with its 'key' and 'bytes'
+        threshold: Most differing dHash bits, or None for identical files only
+    
+    Returns:
+        list: {'canonical': record, 'duplicates': [(record, distance), ...]}
+              for every group with more than one image; distance is None for
+              identical files
+    """
+    clusters = []
+    by_digest = {}
+    
+    for record in sorted(records, key=canonical_rank):
+        cluster = by_digest.get(record['sha256'])
+        distance = None
+        
+        if cluster is None and threshold is not None:
+            for candidate in clusters:
+                distance = near_distance(candidate['canonical'], record, threshold)
+                if distance is not None:
+                    cluster = candidate
+                    break
+        
+        if cluster is None:
+            cluster = {'canonical': record, 'duplicates': []}
+            clusters.append(cluster)
+        else:
+            cluster['duplicates'].append((record, distance))
+        by_digest.setdefault(record['sha256'], cluster)
+    
+    return [cluster for cluster in clusters if cluster['duplicates']]
+
+def find_duplicates(root_path, image_paths, stats=None, section=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Hash the images under public/ and group the duplicates
+    
+    Args:
+        root_path: Project root
+        image_paths: Source images to check; others are ignored
+        stats: os.stat_result of each path, if already known (see tree_walker)
+        section: Manifest section to reuse and record each image's hashes in, or None
+        threshold: Most differing dHash bits for near-duplicates, or None
+    
+    Returns:
+        dict: 'clusters' (see cluster_duplicates()), 'canonical_of' (duplicate
+              key -> canonical key), and how many images were 'hashed' and
+              'cached', and the 'seconds' it took
+    """
+    root_path = Path(root_path)
+    start = time.perf_counter()
+    fingerprint = settings_fingerprint(HASH_SETTINGS)
+    records = []
+    hashed = cached = 0
+    
+    for file_path in image_paths:
+        key = relative_key(file_path, root_path)
+        if not key.startswith(DEDUPE_DIR):
+            continue
+        
+        source_stat = stats[file_path] if stats else file_path.stat()
+        entry = section.get(key) if section is not None else None
+        
+        if is_up_to_date(entry, file_path, source_stat, fingerprint, root_path):
+            cached += 1
+        else:
+            try:
+                details = image_hashes(file_path)
+            except OSError as e:
+                print(f"   ⚠️  Can't hash {key}: {e}")
+                continue
+            entry = make_entry(source_stat, details.pop('sha256'), fingerprint, [], details)
+            hashed += 1
+            if section is not None:
+                section[key] = entry
+        
+        records.append({'key': key, 'bytes': source_stat.st_size, **entry})
+    
+    # Images filtered out of this run keep their hashes; deleted ones are dropped
+    if section is not None:
+        for key in [key for key in section if not (root_path / key).exists()]:
+            del section[key]
+    
+    clusters = cluster_duplicates(records, threshold)
+    canonical_of = {record['key']: cluster['canonical']['key']
+                    for cluster in clusters for record, _ in cluster['duplicates']}
+    
+    return {'clusters': clusters, 'canonical_of': canonical_of, 'hashed': hashed,
+            'cached': cached, 'seconds': time.perf_counter() - start}
+
+def skip_duplicates(root_path, image_paths, stats=None, section=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Leave out every copy of a picture but its canonical one, saying how many were skipped
+    
+    Returns:
+        tuple: (the images to convert, in the given order; find_duplicates() report)
+    """
+    report = find_duplicates(root_path, image_paths, stats, section, threshold)
+    canonical_of = report['canonical_of']
+    kept = [file_path for file_path in image_paths
+            if relative_key(file_path, root_path) not in canonical_of]
+    
+    print(f"\n♊ Hashed {report['hashed']} images ({report['cached']} from the manifest) "
+          f"in {report['seconds']:.2f}s")
+    if canonical_of:
+        print(f"   Skipping {len(canonical_of)} duplicates of {len(report['clusters'])} images; "
+              f"only their canonical copies are converted")
+    
+    return kept, report
+
+def encode_seconds(timings):
+    """Time spent encoding in a StageTimer's timings, across all variants and formats"""
+    return sum(seconds for stage, _, seconds in timings if stage == 'encode')
+
+def conversion_costs(section):
+    """
+    What converting each source cost, from the responsive manifest section
+    
+    Returns:
+        dict: key -> (bytes of variants, seconds spent encoding or None if not recorded)
+    """
+    return {key: (sum(variant['bytes'] for variant in entry['image']['variants']),
+                  entry.get('encode_seconds'))
+            for key, entry in section.items() if entry.get('image')}
+
+def print_duplicate_report(report, costs=None, limit=None):
+    """
+    Print each group of duplicates and what not converting them saved
+    
+    Args:
+        report: find_duplicates() result
+        costs: conversion_costs() of the canonical copies, or None; a duplicate
+               would have cost what its canonical copy did
+        limit: Most groups to list, or None for all
+    """
+    clusters = report['clusters']
+    duplicates = [(record, cluster['canonical']['key'])
+                  for cluster in clusters for record, _ in cluster['duplicates']]
+    source_bytes = sum(record['bytes'] for record, _ in duplicates)
+    
+    print(f"\n♊ Duplicate images: {len(duplicates)} copies of {len(clusters)} images, "
+          f"{source_bytes/1024/1024:.2f} MB of sources")
+    
+    shown = clusters if limit is None else clusters[:limit]
+    for cluster in shown:
+        print(f"\n   📌 {cluster['canonical']['key']}")
+        for record, distance in cluster['duplicates']:
+            match = 'identical' if distance is None else f"{distance} bits apart"
+            print(f"      = {record['key']} ({record['bytes']/1024:.1f}KB, {match})")
+    if len(shown) < len(clusters):
+        print(f"\n   ... and {len(clusters) - len(shown)} more")
+    
+    if not costs or not duplicates:
+        return
+    
+    known = [costs[canonical] for _, canonical in duplicates if canonical in costs]
+    if known:
+        variant_bytes = sum(cost[0] for cost in known)
+        timed = [cost[1] for cost in known if cost[1] is not None]
+        avoided = f"{variant_bytes/1024/1024:.2f} MB of variants"
+        if timed:
+            avoided += f" and {sum(timed):.1f}s of encoding"
+        print(f"\n💾 Not converting the duplicates avoided {avoided} "
+              f"({len(known)} of {len(duplicates)} copies measured)")
+
+class DuplicateReferenceScanner:
+    """
+    Points references at the canonical copy of a duplicate image
+    
+    Called as scan(content, webp_files), like update_images_to_webp's
+    scan_references(). References to a duplicate source (found with the same
+    patterns scan_references() uses) become references to its canonical
+    copy. References to a duplicate's variants, from an earlier WebP rewrite,
+    become references to the canonical copy's variant of the same size, when
+    that exists. Only root-relative and root-based paths are followed.
+    """
+    
+    def __init__(self, canonical_of, outputs=None):
+        """
+        Args:
+            canonical_of: Duplicate key -> canonical key (see find_duplicates())
+            outputs: Variants that exist, relative to the root and under their
+                     plain names; None to check the WebP files scanned with
+        """
+        self.canonical_of = canonical_of
+        self.stems = {posixpath.splitext(key)[0]: posixpath.splitext(canonical)[0]
+                      for key, canonical in canonical_of.items()}
+        self.outputs = outputs
+    
+    def canonical_output(self, rel_path, outputs):
+        """Canonical copy's counterpart of a duplicate's variant, or None"""
+        stem, extension = posixpath.splitext(plain_name(rel_path))
+        base, variant = stem, ''
+        if base not in self.stems and '-' in posixpath.basename(stem):
+            base, variant = stem.rsplit('-', 1)
+            variant = '-' + variant
+        if base not in self.stems:
+            return None
+        
+        target = self.stems[base] + variant + extension
+        # AVIF variants are written alongside the WebP ones
+        check = target[:-len(extension)] + '.webp'
+        return target if check in outputs else None
+    
+    def resolve(self, reference, source, outputs):
+        """
+        Reference to use in place of one to a duplicate, written the same
+        way, or None; the query and fragment are kept
+        """
+        path, suffix = re.match(r'([^?#]*)(.*)', reference).groups()
+        
+        # As written relative to the root, or as a URL served from public/
+        check_paths = [(path.lstrip('/'), path[:len(path) - len(path.lstrip('/'))])]
+        if path.startswith('/'):
+            check_paths.insert(0, ('public' + path, None))
+        
+        for check_path, prefix in check_paths:
+            if source:
+                target = self.canonical_of.get(check_path)
+            else:
+                target = self.canonical_output(check_path, outputs)
+            if not target:
+                continue
+            
+            if prefix is None:
+                return '/' + target[len('public/'):] + suffix
+            return prefix + target + suffix
+        
+        return None
+    
+    def __call__(self, content, webp_files):
+        """
+        Find references to duplicates, in a single pass per kind
+        
+        Returns:
+            tuple: (new content, changes in file order; see splice_edits())
+        """
+        outputs = self.outputs
+        if outputs is None:
+            outputs = {plain_name(path) for path in webp_files}
+        edits = []
+        
+        for match in REFERENCE_RE.finditer(content):
+            outer = match.lastindex
+            image_path = match.group(outer + 1)
+            new_path = self.resolve(image_path, True, outputs)
+            if new_path:
+                edits.append((match.start(outer + 1), match.end(outer + 1), new_path, {
+                    'old': image_path, 'new': new_path,
+                    'type': REFERENCE_PATTERNS[(outer - 1) // 2][1]}))
+        
+        for match in OUTPUT_REFERENCE_RE.finditer(content):
+            new_path = self.resolve(match.group(0), False, outputs)
+            if new_path:
+                edits.append((match.start(), match.end(), new_path, {
+                    'old': match.group(0), 'new': new_path, 'type': 'duplicate variant'}))
+        
+        return splice_edits(content, sorted(edits, key=lambda edit: edit[0]))
+
+def update_duplicate_references(root_dir, canonical_of, dry_run=True, webp_files=None,
+                                code_files=None, plan=None, outputs=None):
+    """
+    Point references to duplicate images at their canonical copies
+    
+    Args:
+        root_dir: Root directory of the project
+        canonical_of: Duplicate key -> canonical key (see find_duplicates())
+        dry_run: Only report changes, don't write them
+        webp_files: WebP paths relative to root_dir, if already known
+        code_files: Code file paths to scan, if already known
+        plan: Patch plan from an earlier dry run to apply instead of scanning again
+        outputs: Variants that exist under their plain names (see DuplicateReferenceScanner)
+    
+    Returns:
+        dict: The patch plan (when applying, the changes actually made)
+    """
+    return update_all_files(root_dir, dry_run, webp_files, code_files, plan,
+                            scan=DuplicateReferenceScanner(canonical_of, outputs), mode='dedupe')
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Find duplicate images under public/ and point references at one copy")
+    parser.add_argument('root', nargs='?', default='.', help="project root (default: current directory)")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="apply the reference changes without asking for confirmation")
+    parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD, metavar='BITS',
+                        help=f"most of the {DHASH_SIZE * DHASH_SIZE} perceptual hash bits two images "
+                             f"may differ in to count as one; -1 for byte-identical only "
+                             f"(default {DEFAULT_THRESHOLD})")
+    parser.add_argument('--manifest', default=MANIFEST_FILENAME,
+                        help=f"build manifest path, relative to the root (default {MANIFEST_FILENAME})")
+    parser.add_argument('--no-manifest', dest='manifest', action='store_const', const=None,
+                        help="hash every image again")
+    parser.add_argument('--limit', type=int, default=50,
+                        help="most groups to list (default 50, 0 for all)")
+    parser.add_argument('--plan-out', metavar='PATH',
+                        help="write the dry-run patch plan to PATH as JSON and stop")
+    parser.add_argument('--apply-plan', metavar='PATH',
+                        help="apply a patch plan written by --plan-out instead of scanning")
+    args = parser.parse_args()
+    
+    if args.threshold < 0:
+        args.threshold = None
+    
+    if args.manifest:
+        args.manifest = os.path.join(args.root, args.manifest)
+    
+    return args
+
+def main():
+    """Main function"""
+    args = parse_args()
+    
+    print("\n" + "="*70)
+    print("♊ DUPLICATE IMAGES")
+    print("="*70)
+    
+    root_path = Path(args.root)
+    if not root_path.is_dir():
+        print(f"❌ Error: Directory '{args.root}' does not exist")
+        sys.exit(1)
+    
+    inventory = walk_tree(root_path)
+    manifest = load_manifest(args.manifest) if args.manifest else None
+    section = get_section(manifest, 'duplicates') if manifest else None
+    report = find_duplicates(root_path, inventory.image_paths(), inventory.stats(), section, args.threshold)
+    if manifest:
+        save_manifest(args.manifest, manifest)
+    
+    print(f"\n🔍 Hashed {report['hashed']} images ({report['cached']} from the manifest) "
+          f"in {report['seconds']:.2f}s")
+    costs = conversion_costs(get_section(manifest, 'responsive')) if manifest else None
+    print_duplicate_report(report, costs, args.limit or None)
+    
+    # The pipeline's own generated files list every image, duplicates included
+    generated = {(root_path / path).absolute()
+                 for path in (PLACEHOLDER_INDEX, GENERATED_MODULE, HEADERS_SNIPPET)}
+    if args.manifest:
+        generated.add(Path(args.manifest).absolute())
+    code_files = [path for path in inventory.code_paths() if path.absolute() not in generated]
+    
+    if args.apply_plan:
+        print(f"\n📥 Applying patch plan: {args.apply_plan}")
+        update_duplicate_references(root_path, report['canonical_of'], dry_run=False,
+                                    plan=load_patch_plan(args.apply_plan, mode='dedupe'))
+        print("✨ Done!")
+        return
+    
+    plan = update_duplicate_references(root_path, report['canonical_of'], dry_run=True,
+                                       webp_files=inventory.webp_set(), code_files=code_files)
+    files_modified, total_changes = plan_totals(plan)
+    
+    if args.plan_out:
+        save_patch_plan(plan, args.plan_out)
+        print(f"💾 Patch plan written to {args.plan_out} (apply it with --apply-plan)")
+        return
+    
+    if files_modified == 0:
+        print("✨ No changes needed! No references point at a duplicate image.")
+        return
+    
+    print(f"\n⚠️  This will modify {files_modified} files and update {total_changes} image references.")
+    if not args.yes:
+        response = input("\n🚀 Proceed with actual update? (y/n): ").lower().strip()
+        
+        if response != 'y':
+            print("❌ Update cancelled")
+            return
+    
+    update_duplicate_references(root_path, report['canonical_of'], dry_run=False, plan=plan)
+    print("✨ Done!")
+
+if __name__ == "__main__":
+    main()
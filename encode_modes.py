@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+WebP Encode Mode Selection
+Classifies images as photographs or flat graphics, with or without transparency,
+and encodes them lossless, lossy with alpha or lossy to match
+"""
+
+import io
+
+from PIL import Image
+
+from perceptual_quality import encode_to_target
+
+# An image with at most this many colours is a flat graphic (logo, icon,
+# screenshot) and is encoded lossless
+GRAPHIC_MAX_COLORS = 256
+
+# More colours than this is a photograph and is encoded lossy; anything in
+# between is encoded both ways and the smaller output kept
+PHOTO_MIN_COLORS = 4096
+
+# Colours are counted on a nearest-neighbour thumbnail, which keeps exact
+# pixel values but bounds the cost on large sources
+CLASSIFY_MAX_SIDE = 512
+
+# In lossless mode WebP's quality setting is compression effort, not fidelity
+LOSSLESS_EFFORT = 80
+
+def has_alpha(img):
+    """Check if an image has an alpha channel that is actually used"""
+    if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+        alpha = img.convert('RGBA').getchannel('A')
+        return alpha.getextrema()[0] < 255
+    return False
+
+def classify_image(img):
+    """
+    Classify an image for encoding
+    
+    Returns:
+        dict: 'alpha' (bool), 'colors' (count, or None if above PHOTO_MIN_COLORS)
+              and 'kind' ('graphic', 'mixed' or 'photo')
+    """
+    alpha = has_alpha(img)
+    sample = img.convert('RGBA' if alpha else 'RGB')
+    
+    scale = CLASSIFY_MAX_SIDE / max(sample.size)
+    if scale < 1:
+        size = (max(1, int(sample.size[0] * scale)), max(1, int(sample.size[1] * scale)))
+        sample = sample.resize(size, Image.Resampling.NEAREST)
+    
+    colors = sample.getcolors(PHOTO_MIN_COLORS)
+    count = len(colors) if colors else None
+    
+    if count is None:
+        kind = 'photo'
+    elif count <= GRAPHIC_MAX_COLORS:
+        kind = 'graphic'
+    else:
+        kind = 'mixed'
+    
+    return {'alpha': alpha, 'colors': count, 'kind': kind}
+
+def candidate_modes(classification, resampled=False):
+    """
+    Encode modes worth trying for a classified image, in order of preference
+    
+    Args:
+        classification: Result of classify_image() on the source
+        resampled: The output is a resized copy; resampling blends edges into
+                   new colours, so graphics are tried lossy as well
+    """
+    lossy = 'lossy-alpha' if classification['alpha'] else 'lossy'
+    
+    if classification['kind'] == 'graphic' and not resampled:
+        return ['lossless']
+    if classification['kind'] == 'graphic':
+        return ['lossless', lossy]
+    if classification['kind'] == 'mixed':
+        return ['lossless', lossy]
+    return [lossy]
+
+def encode_webp_output(img, quality, method=6, target_ssim=None, cached=None, modes=None):
+    """
+    Encode an image to WebP in memory, in the best of the candidate modes
+    
+    Args:
+        img: PIL Image, RGB or (for alpha-preserving modes) RGBA
+        quality: Lossy quality, or the starting point of an SSIM search
+        method: WebP encoder effort (0-6)
+        target_ssim: Search lossy qualities for this SSIM score
+        cached: Choice recorded by a previous build of the same source
+        modes: Candidate modes from candidate_modes(); defaults to plain lossy.
+               When several are given, the smallest output is kept.
+    
+    Returns:
+        tuple: (encoded bytes, {'quality': ..., 'mode': ..., 'fixed_bytes': ... if targeted})
+    """
+    if cached and cached.get('mode'):
+        modes = [cached['mode']]
+    
+    best_data, best_choice = None, None
+    
+    for mode in modes or ['lossy']:
+        if mode == 'lossless':
+            buffer = io.BytesIO()
+            img.save(buffer, 'WEBP', lossless=True, quality=LOSSLESS_EFFORT, method=method)
+            data, choice = buffer.getvalue(), {'quality': LOSSLESS_EFFORT}
+        elif target_ssim:
+            data, choice = encode_to_target(img, target_ssim, quality, method, cached)
+        else:
+            buffer = io.BytesIO()
+            img.save(buffer, 'WEBP', quality=quality, method=method)
+            data, choice = buffer.getvalue(), {'quality': quality}
+        
+        if best_data is None or len(data) < len(best_data):
+            best_data, best_choice = data, dict(choice, mode=mode)
+    
+    return best_data, best_choice
+
+def describe_choice(choice):
+    """Short label for a log line, e.g. 'Q82' or 'lossless'"""
+    if choice.get('mode') == 'lossless':
+        return 'lossless'
+    if choice.get('mode') == 'animated':
+        return f"Q{choice['quality']}, animated"
+    if choice.get('mode') == 'lossy-alpha':
+        return f"Q{choice['quality']}, alpha"
+    return f"Q{choice['quality']}"
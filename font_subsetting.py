@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Font Subsetting
+Converts self-hosted TTF/OTF fonts to WOFF2 subsetted to the characters the
+site's text uses, and points @font-face rules in CSS at the WOFF2 files
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from image_manifest import (MANIFEST_FILENAME, file_digest, get_section, is_up_to_date,
+                            load_manifest, make_entry, prune_orphans, relative_key, save_manifest,
+                            settings_fingerprint)
+from tree_walker import walk_tree
+from update_images_to_webp import (load_patch_plan, plan_totals, save_patch_plan, splice_edits,
+                                   update_all_files)
+
+try:
+    from fontTools import subset
+except ImportError:
+    subset = None
+
+# Characters every subset keeps, whatever the text uses: printable ASCII and
+# common typographic punctuation, so text added later rarely falls back
+SAFE_CHARACTERS = (''.join(chr(code) for code in range(0x20, 0x7f))
+                   + '\u00a0©®°·×–—‘’“”•…€™£')
+
+# Folders, relative to the root, whose files hold the site's text
+TEXT_DIRS = ('src',)
+
+# Stylesheets whose @font-face rules are rewritten
+STYLESHEET_EXTENSIONS = {'.css', '.scss'}
+
+# Formats named in @font-face src lists for the fonts converted
+FONT_FORMATS = {'.ttf', '.otf'}
+
+# An @font-face rule, its src descriptor, and one source in the descriptor's list
+FONT_FACE_RE = re.compile(r'@font-face\s*\{[^{}]*\}', re.IGNORECASE)
+SRC_DESCRIPTOR_RE = re.compile(r'(?<![\w-])src\s*:\s*([^;{}]*[^;{}\s])', re.IGNORECASE)
+FONT_SOURCE_RE = re.compile(r'url\(\s*(["\']?)([^"\')]+)\1\s*\)'
+                            r'(?:\s*format\(\s*(["\']?)[\w-]+\3\s*\))?(?:\s*tech\([^)]*\))?'
+                            r'|local\([^)]*\)', re.IGNORECASE)
+
+def require_fonttools():
+    """Exit with an install hint if fontTools isn't available"""
+    if subset is None:
+        raise SystemExit("❌ Error: fontTools is required to subset fonts\n"
+                         "   Install it with: pip install fonttools brotli")
+
+def collect_text(inventory, text_dirs=TEXT_DIRS):
+    """
+    Every character in the code files under the text folders
+    
+    Markup and code are plain ASCII, which the safe set covers anyway, so
+    taking whole files finds all the text without parsing JSX or strings.
+    
+    Returns:
+        set: Characters, without whitespace control characters
+    """
+    prefixes = tuple(text_dir.rstrip('/') + '/' for text_dir in text_dirs)
+    characters = set()
+    
+    for entry in inventory.code_files:
+        if not entry.rel_path.startswith(prefixes):
+            continue
+        try:
+            characters.update(entry.path.read_bytes().decode('utf-8'))
+        except (OSError, UnicodeDecodeError):
+            continue
+    
+    return {char for char in characters if char >= ' '}
+
+def subset_text(characters, safe_chars=SAFE_CHARACTERS):
+    """The text fonts are subsetted to: used and safe characters, in code point order"""
+    return ''.join(sorted(set(characters) | set(safe_chars)))
+
+def subset_settings(text):
+    """Settings that change a subset's output, for the manifest fingerprint"""
+    return {
+        'flavor': 'woff2',
+        'text': hashlib.sha256(text.encode('utf-8')).hexdigest()[:16],
+        'layout_features': '*',
+        'desubroutinize': True,
+    }
+
+def woff2_path(font_path):
+    """Path of the WOFF2 file generated from a font"""
+    return Path(font_path).with_suffix('.woff2')
+
+def subset_font(font_path, output_path, text):
+    """
+    Write a WOFF2 subset of a font, atomically
+    
+    All OpenType layout features are kept, so kerning and the ligatures of
+    the characters kept still work.
+    
+    Returns:
+        int: Number of glyphs in the subset
+    """
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.notdef_outline = True
+    options.drop_tables += ['FFTM']  # FontForge timestamps
+    # Flattened CFF charstrings compress better under Brotli than subroutines
+    options.desubroutinize = True
+    
+    font = subset.load_font(os.fspath(font_path), options)
+    try:
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text=text)
+        subsetter.subset(font)
+        
+        tmp_path = output_path.with_name(output_path.name + '.tmp')
+        subset.save_font(font, os.fspath(tmp_path), options)
+        os.replace(tmp_path, output_path)
+        return len(font.getGlyphOrder())
+    finally:
+        font.close()
+
+def optimize_fonts(root_dir, inventory=None, manifest_path=None, safe_chars=SAFE_CHARACTERS,
+                   text_dirs=TEXT_DIRS):
+    """
+    Convert every TTF/OTF font in the project to a subsetted WOFF2 next to it
+    
+    Args:
+        root_dir: Project root
+        inventory: tree_walker.walk_tree() result for root_dir, if already walked
+        manifest_path: Build manifest to skip unchanged fonts with, or None to
+                       only skip WOFF2 files that already exist
+        safe_chars: Characters kept whether or not the text uses them
+        text_dirs: Folders, relative to the root, whose files hold the site's text
+    
+    Returns:
+        dict: 'fonts' built or reused (path, 'before' and 'after' bytes,
+              'glyphs', 'cached'), 'failed' paths, and the 'woff2_files' that
+              exist, relative to the root
+    """
+    require_fonttools()
+    
+    root_path = Path(root_dir)
+    if inventory is None:
+        inventory = walk_tree(root_path)
+    
+    text = subset_text(collect_text(inventory, text_dirs), safe_chars)
+    fingerprint = settings_fingerprint(subset_settings(text))
+    print(f"\n🔤 Subsetting {len(inventory.fonts)} fonts to {len(text)} characters "
+          f"({len(text) - len(set(text) & set(safe_chars))} beyond the safe set)")
+    
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    section = get_section(manifest, 'fonts') if manifest else {}
+    report = {'fonts': [], 'failed': [], 'woff2_files': set()}
+    seen_keys = set()
+    
+    for entry in inventory.fonts:
+        key = entry.rel_path
+        seen_keys.add(key)
+        output_path = woff2_path(entry.path)
+        output = relative_key(output_path, root_path)
+        recorded = section.get(key)
+        
+        if manifest is None:
+            cached = output_path.exists()
+        else:
+            cached = is_up_to_date(recorded, entry.path, entry.stat, fingerprint, root_path)
+            if not cached and output_path.exists() and not (recorded and output in recorded['outputs']):
+                # A WOFF2 shipped alongside the font, not one built here
+                print(f"   ⚠️  {key}: {output} exists and wasn't built from it, leaving both alone")
+                continue
+        
+        if cached:
+            after = output_path.stat().st_size
+            glyphs = recorded.get('glyphs') if recorded else None
+        else:
+            try:
+                glyphs = subset_font(entry.path, output_path, text)
+            except Exception as e:
+                print(f"   ❌ {key}: {e}")
+                report['failed'].append(key)
+                continue
+            after = output_path.stat().st_size
+            if manifest is not None:
+                section[key] = make_entry(entry.stat, file_digest(entry.path), fingerprint, [output],
+                                          {'glyphs': glyphs, 'bytes': after})
+            print(f"   🔤 {key}: {entry.stat.st_size/1024:.1f}KB → {after/1024:.1f}KB "
+                  f"({glyphs} glyphs)")
+        
+        report['woff2_files'].add(output)
+        report['fonts'].append({'path': key, 'before': entry.stat.st_size, 'after': after,
+                                'glyphs': glyphs, 'cached': cached})
+    
+    if manifest is not None:
+        for removed in prune_orphans(section, seen_keys, root_path):
+            print(f"   🗑️  Removed orphaned output: {removed}")
+        save_manifest(manifest_path, manifest)
+    
+    return report
+
+def print_font_report(report):
+    """Print the totals of an optimize_fonts() report"""
+    fonts = report['fonts']
+    before = sum(font['before'] for font in fonts)
+    after = sum(font['after'] for font in fonts)
+    cached = sum(1 for font in fonts if font['cached'])
+    
+    print(f"\n📊 Fonts: {len(fonts)} subsetted ({cached} unchanged, {len(report['failed'])} failed)")
+    if before:
+        print(f"   {before/1024:.1f}KB → {after/1024:.1f}KB "
+              f"(saved {(before - after)/before*100:.1f}%)")
+
+def find_woff2_reference(font_url, woff2_files):
+    """
+    WOFF2 URL to use in place of a TTF/OTF one, if a WOFF2 version exists
+    
+    Paths are checked as update_images_to_webp.find_webp_reference() checks
+    them: relative to the root, as written, and served from public/.
+    
+    Returns:
+        The URL with a .woff2 extension (and its query or fragment), or None
+    """
+    path, suffix = re.match(r'([^?#]*)(.*)', font_url).groups()
+    stem, extension = os.path.splitext(path)
+    if extension.lower() not in FONT_FORMATS:
+        return None
+    
+    woff2_url = stem + '.woff2'
+    check_paths = [
+        woff2_url.lstrip('/'),
+        woff2_url,
+        'public' + woff2_url if woff2_url.startswith('/') else None,
+    ]
+    
+    for check_path in check_paths:
+        if check_path and check_path in woff2_files:
+            return woff2_url + suffix
+    
+    return None
+
+def rewrite_src(value, woff2_files):
+    """
+    New value of an @font-face src descriptor, with its TTF/OTF sources
+    replaced by their WOFF2 versions and moved to the front, so browsers
+    pick them over any other file listed
+    
+    Returns:
+        tuple: (new value, [(old URL, new URL)]), or (None, []) if nothing changes
+    """
+    sources = list(FONT_SOURCE_RE.finditer(value))
+    if not sources:
+        return None, []
+    
+    # Only plain comma-separated lists are rewritten
+    separators = [value[previous.end():current.start()]
+                  for previous, current in zip(sources, sources[1:])]
+    if (value[:sources[0].start()] or value[sources[-1].end():]
+            or any(separator.strip() != ',' for separator in separators)):
+        return None, []
+    
+    replaced, kept, urls = [], [], []
+    for source in sources:
+        woff2_url = source.group(2) and find_woff2_reference(source.group(2), woff2_files)
+        if not woff2_url:
+            kept.append(source.group(0))
+            continue
+        
+        quote = source.group(1)
+        format_quote = source.group(3) if source.group(3) is not None else "'"
+        replaced.append(f"url({quote}{woff2_url}{quote}) format({format_quote}woff2{format_quote})")
+        urls.append((source.group(2), woff2_url))
+    
+    if not replaced:
+        return None, []
+    
+    separator = separators[0] if separators else ', '
+    return separator.join(replaced + kept), urls
+
+def scan_font_faces(content, woff2_files):
+    """
+    Find @font-face rules with TTF/OTF sources that have a WOFF2 version
+    
+    Called as scan(content, webp_files), like update_images_to_webp's
+    scan_references(), with the WOFF2 paths in place of the WebP ones.
+    
+    Returns:
+        tuple: (new content, changes in file order; see splice_edits())
+    """
+    edits = []
+    
+    for rule in FONT_FACE_RE.finditer(content):
+        for descriptor in SRC_DESCRIPTOR_RE.finditer(rule.group(0)):
+            new_value, urls = rewrite_src(descriptor.group(1), woff2_files)
+            if not new_value:
+                continue
+            
+            start = rule.start() + descriptor.start(1)
+            edits.append((start, start + len(descriptor.group(1)), new_value, {
+                'old': ', '.join(old for old, _ in urls),
+                'new': ', '.join(new for _, new in urls),
+                'type': '@font-face src',
+            }))
+    
+    return splice_edits(content, edits)
+
+def stylesheets(code_files):
+    """The CSS files among code files"""
+    return [path for path in code_files if Path(path).suffix.lower() in STYLESHEET_EXTENSIONS]
+
+def existing_woff2_files(root_path, inventory):
+    """WOFF2 versions of the inventory's fonts that exist, relative to the root"""
+    return {relative_key(woff2_path(entry.path), root_path) for entry in inventory.fonts
+            if woff2_path(entry.path).exists()}
+
+def update_font_faces(root_dir, dry_run=True, woff2_files=None, code_files=None, plan=None):
+    """
+    Point @font-face rules in stylesheets at the WOFF2 versions of their fonts
+    
+    Args:
+        root_dir: Root directory of the project
+        dry_run: Only report changes, don't write them
+        woff2_files: WOFF2 paths relative to root_dir, if already known
+        code_files: Code file paths, if already known; only stylesheets are scanned
+        plan: Patch plan from an earlier dry run to apply instead of scanning again
+    
+    Returns:
+        dict: The patch plan (when applying, the changes actually made)
+    """
+    root_path = Path(root_dir)
+    if woff2_files is None or code_files is None:
+        inventory = walk_tree(root_path)
+        woff2_files = existing_woff2_files(root_path, inventory) if woff2_files is None else woff2_files
+        code_files = inventory.code_paths() if code_files is None else code_files
+    
+    start = time.perf_counter()
+    plan = update_all_files(root_path, dry_run, woff2_files, stylesheets(code_files), plan,
+                            scan=scan_font_faces, mode='fonts', reference_kind='font')
+    print(f"⏱️  @font-face rewrite planned in {(time.perf_counter() - start)*1000:.0f}ms")
+    
+    return plan
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Subset TTF/OTF fonts to WOFF2 and point @font-face rules at them")
+    parser.add_argument('root', nargs='?', default='.', help="project root (default: current directory)")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="apply the CSS changes without asking for confirmation")
+    parser.add_argument('--manifest', default=MANIFEST_FILENAME,
+                        help=f"build manifest path, relative to the root (default {MANIFEST_FILENAME})")
+    parser.add_argument('--no-manifest', dest='manifest', action='store_const', const=None,
+                        help="only skip WOFF2 files that already exist")
+    parser.add_argument('--safe-chars', default='',
+                        help="extra characters to keep in every subset, besides printable ASCII "
+                             "and common punctuation")
+    parser.add_argument('--text-dir', action='append', dest='text_dirs', metavar='DIR',
+                        help=f"folder whose files hold the site's text, relative to the root; "
+                             f"repeatable (default {', '.join(TEXT_DIRS)})")
+    parser.add_argument('--plan-out', metavar='PATH',
+                        help="write the dry-run patch plan to PATH as JSON and stop")
+    parser.add_argument('--apply-plan', metavar='PATH',
+                        help="apply a patch plan written by --plan-out instead of scanning")
+    args = parser.parse_args()
+    
+    if args.manifest:
+        args.manifest = os.path.join(args.root, args.manifest)
+    
+    require_fonttools()
+    
+    return args
+
+def main():
+    """Main function"""
+    args = parse_args()
+    
+    print("\n" + "="*70)
+    print("🔤 FONT SUBSETTING")
+    print("="*70)
+    
+    root_path = Path(args.root)
+    if not root_path.is_dir():
+        print(f"❌ Error: Directory '{args.root}' does not exist")
+        sys.exit(1)
+    
+    if args.apply_plan:
+        print(f"\n📥 Applying patch plan: {args.apply_plan}")
+        update_font_faces(root_path, dry_run=False, plan=load_patch_plan(args.apply_plan, mode='fonts'))
+        print("✨ Done!")
+        return
+    
+    inventory = walk_tree(root_path)
+    report = optimize_fonts(root_path, inventory, args.manifest, SAFE_CHARACTERS + args.safe_chars,
+                            args.text_dirs or TEXT_DIRS)
+    print_font_report(report)
+    
+    plan = update_font_faces(root_path, dry_run=True, woff2_files=report['woff2_files'],
+                             code_files=inventory.code_paths())
+    files_modified, total_changes = plan_totals(plan)
+    
+    if args.plan_out:
+        save_patch_plan(plan, args.plan_out)
+        print(f"💾 Patch plan written to {args.plan_out} (apply it with --apply-plan)")
+        return
+    
+    if files_modified == 0:
+        print("✨ No changes needed! No @font-face rules with TTF/OTF fonts to point at WOFF2.")
+        return
+    
+    print(f"\n⚠️  This will modify {files_modified} files and update {total_changes} @font-face rules.")
+    if not args.yes:
+        response = input("\n🚀 Proceed with actual update? (y/n): ").lower().strip()
+        
+        if response != 'y':
+            print("❌ Update cancelled")
+            return
+    
+    update_font_faces(root_path, dry_run=False, woff2_files=report['woff2_files'], plan=plan)
+    print("✨ Done!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Generated Image Module
+Writes a typed TypeScript module mapping each source image to its variants,
+intrinsic dimensions, formats and byte sizes, so components can reserve
+space for images before they load
+"""
+
+import json
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from image_manifest import write_if_changed
+from placeholders import public_path
+
+# Default module location, relative to the project root, importable as '@/lib/images.generated'
+GENERATED_MODULE = 'src/lib/images.generated.ts'
+
+# Output file extensions and the format names the module uses for them
+OUTPUT_FORMATS = {'.webp': 'webp', '.avif': 'avif'}
+
+MODULE_HEADER = '''\
+// Generated by the image pipeline (create_responsive_webp.py). Do not edit.
+
+import type { ImageLoader } from "next/image"
+
+export type ImageFormat = "webp" | "avif"
+
+export interface ImageVariant {
+  src: string
+  width: number
+  height: number
+  format: ImageFormat
+  bytes: number
+}
+
+export interface GeneratedImage {
+  /** The full-size WebP */
+  src: string
+  /** Intrinsic size of the full-size variant */
+  width: number
+  height: number
+  formats: ImageFormat[]
+  variants: ImageVariant[]
+  blurDataURL?: string
+}
+'''
+
+# Next.js <Image> loader serving the generated variants: the narrowest WebP
+# at least as wide as requested, looked up by source or full-size WebP path
+MODULE_LOADER = '''\
+const byPath: Record<string, GeneratedImage> = {}
+for (const [source, image] of Object.entries(images) as [string, GeneratedImage][]) {
+  byPath[source] = image
+  byPath[image.src] = image
+}
+
+export const imageLoader: ImageLoader = ({ src, width }) => {
+  const image = byPath[src]
+  if (!image) return src
+  const webp = image.variants.filter((variant) => variant.format === "webp")
+  return (webp.find((variant) => variant.width >= width) ?? webp[webp.length - 1]).src
+}
+'''
+
+def variant_record(path, size, byte_count):
+    """Description of one output file, as generate_responsive_images() reports it"""
+    return {'path': Path(path), 'width': size[0], 'height': size[1],
+            'format': OUTPUT_FORMATS[Path(path).suffix.lower()], 'bytes': byte_count}
+
+def describe_outputs(paths):
+    """
+    Describe existing output files from their headers, without decoding them
+    
+    Returns:
+        list: variant_record() of each path that exists and is an output format
+    """
+    records = []
+    
+    for path in paths:
+        if Path(path).suffix.lower() not in OUTPUT_FORMATS:
+            continue
+        try:
+            with Image.open(path) as img:
+                size = img.size
+            records.append(variant_record(path, size, os.path.getsize(path)))
+        except OSError:
+            continue
+    
+    return records
+
+def catalog_entry(variants, root_path):
+    """
+    Module entry for one source image
+    
+    Args:
+        variants: variant_record() of every output generated for it
+        root_path: Project root, for public paths
+    
+    Returns:
+        dict: The GeneratedImage fields, or None if there are no WebP variants
+    """
+    webp = [record for record in variants if record['format'] == 'webp']
+    if not webp:
+        return None
+    
+    full_size = max(webp, key=lambda record: record['width'])
+    ordered = sorted(variants, key=lambda record: (record['format'] != 'webp', record['width']))
+    
+    return {
+        'src': public_path(full_size['path'], root_path),
+        'width': full_size['width'],
+        'height': full_size['height'],
+        'formats': sorted({record['format'] for record in variants},
+                          key=lambda name: name != 'webp'),
+        'variants': [{'src': public_path(record['path'], root_path),
+                      'width': record['width'], 'height': record['height'],
+                      'format': record['format'], 'bytes': record['bytes']}
+                     for record in ordered],
+    }
+
+def catalog_from_section(section, root_path):
+    """
+    Module entries for every source in a manifest section, keyed by the
+    source's public path
+    
+    Entries built before the module existed are described from their outputs
+    on disk once, and the result kept in the manifest.
+    """
+    catalog = {}
+    
+    for key, entry in section.items():
+        if 'image' not in entry:
+            entry['image'] = catalog_entry(
+                describe_outputs(root_path / output for output in entry['outputs']), root_path)
+        if not entry['image']:
+            continue
+        
+        image = dict(entry['image'])
+        if 'placeholder' in entry:
+            image['blurDataURL'] = entry['placeholder']['blurDataURL']
+        catalog[public_path(root_path / key, root_path)] = image
+    
+    return catalog
+
+def render_module(catalog):
+    """TypeScript source of the module for a catalog of module entries"""
+    body = json.dumps(catalog, indent=2, sort_keys=True)
+    return (f"{MODULE_HEADER}\n"
+            f"export const images = {body} satisfies Record<string, GeneratedImage>\n\n"
+            f"export type ImageKey = keyof typeof images\n\n"
+            f"{MODULE_LOADER}")
+
+def save_module(module_path, catalog):
+    """
+    Write the module if its content changed (see image_manifest.write_if_changed)
+    
+    Returns:
+        bool: True if the file was written
+    """
+    return write_if_changed(module_path, render_module(catalog))
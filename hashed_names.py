@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Content-Hashed Output Names
+Names generated variants after a short hash of their content, so a rebuilt
+image always gets a new URL and every output can be cached as immutable;
+outputs that are replaced are kept for a grace period before being deleted
+"""
+
+import json
+import os
+import posixpath
+import re
+import time
+from pathlib import Path
+
+from image_manifest import file_digest, remove_outputs, write_if_changed
+from placeholders import public_path
+
+# Hex digits of the content hash in an output's name, e.g. hero-mobile.3f9a0c2e.webp
+HASH_LENGTH = 8
+
+# An output name with a content hash: (plain stem, hash, extension)
+HASHED_NAME_RE = re.compile(r'^(.+)\.([0-9a-f]{' + str(HASH_LENGTH) + r'})(\.(?:webp|avif))$',
+                            re.IGNORECASE)
+
+# How long a replaced output stays on disk, for pages and caches still pointing at it
+DEFAULT_GRACE_DAYS = 7
+
+# Default headers snippet location, relative to the project root
+HEADERS_SNIPPET = 'immutable-headers.json'
+
+# A year, the longest lifetime caches honour
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def hashed_path(path, digest):
+    """Path of an output named after its content hash"""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.{digest[:HASH_LENGTH]}{path.suffix}")
+
+def plain_name(rel_path):
+    """An output path without its content hash, as generate_responsive_images() first writes it"""
+    directory, name = posixpath.split(rel_path)
+    match = HASHED_NAME_RE.match(name)
+    if not match:
+        return rel_path
+    return posixpath.join(directory, match.group(1) + match.group(3))
+
+def rename_to_hashed(path):
+    """
+    Rename a freshly written output after its content hash
+    
+    Returns:
+        Path: The new path
+    """
+    new_path = hashed_path(path, file_digest(path))
+    os.replace(path, new_path)
+    return new_path
+
+def hash_outputs(generated_files, report=None):
+    """
+    Rename the variants generate_responsive_images() just wrote, updating its
+    results (the generated files, and the report's AVIF files and variant
+    records) to the hashed paths
+    """
+    renamed = {}
+    for size_name, path in generated_files.items():
+        renamed[path] = generated_files[size_name] = rename_to_hashed(path)
+    
+    if report is None:
+        return
+    
+    for size_name, path in report.get('avif', {}).items():
+        renamed[path] = report['avif'][size_name] = rename_to_hashed(path)
+    for record in report.get('variants', []):
+        record['path'] = renamed.get(record['path'], record['path'])
+
+def current_names(section):
+    """
+    Plain name of every recorded output -> its current hashed name
+    
+    Sources that differ only in extension share plain names; the last in key
+    order wins, so the result doesn't depend on the order entries were made.
+    
+    Args:
+        section: Manifest section of the hashed build
+    
+    Returns:
+        dict: Paths relative to the root
+    """
+    return {plain_name(output): output for key in sorted(section) for output in section[key]['outputs']}
+
+def retire_outputs(retired, outputs, now=None):
+    """
+    Record outputs that were replaced, to be deleted after the grace period
+    
+    Args:
+        retired: Manifest section of retired outputs (path -> time retired)
+        outputs: Paths relative to the root
+    
+    Returns:
+        list: The outputs, sorted
+    """
+    now = now or time.time()
+    for output in outputs:
+        retired.setdefault(output, now)
+    return sorted(outputs)
+
+def collect_garbage(retired, section, root_path, grace_days=DEFAULT_GRACE_DAYS, now=None):
+    """
+    Delete retired outputs once they have been replaced for the grace period
+    
+    An output rebuilt with the same content (and so the same name) is live
+    again, and only forgotten.
+    
+    Returns:
+        list: Removed paths relative to the root
+    """
+    live = {output for entry in section.values() for output in entry['outputs']}
+    cutoff = (now or time.time()) - grace_days * 24 * 60 * 60
+    removed = []
+    
+    for output, retired_at in sorted(retired.items()):
+        if output in live:
+            del retired[output]
+        elif retired_at <= cutoff:
+            removed.extend(remove_outputs([output], root_path))
+            del retired[output]
+    
+    return removed
+
+def immutable_headers(section, retired, root_path):
+    """
+    Headers rules marking every hashed output that is served, retired ones
+    included, as immutable; the same objects work in vercel.json's "headers"
+    and in the list Next.js' headers() returns
+    
+    Returns:
+        list: {'source': public path, 'headers': [...]} rules, by path
+    """
+    outputs = {output for entry in section.values() for output in entry['outputs']}
+    outputs.update(retired)
+    
+    return [{'source': public_path(root_path / output, root_path),
+             'headers': [{'key': 'Cache-Control', 'value': IMMUTABLE_CACHE_CONTROL}]}
+            for output in sorted(outputs)
+            if output.startswith('public/') and HASHED_NAME_RE.match(posixpath.basename(output))]
+
+def save_headers_snippet(snippet_path, rules):
+    """
+    Write the headers snippet if its content changed (see image_manifest.write_if_changed)
+    
+    Returns:
+        bool: True if the file was written
+    """
+    return write_if_changed(snippet_path, json.dumps({'headers': rules}, indent=2) + '\n')
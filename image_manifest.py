@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Image Build Manifest
+Remembers what each source image was built from so unchanged images are skipped
+without being opened, and stale or orphaned outputs are rebuilt or removed
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# Bump when the manifest layout changes; older manifests are discarded
+MANIFEST_VERSION = 1
+
+# Default manifest filename, created in the root directory being processed
+MANIFEST_FILENAME = '.webp-manifest.json'
+
+def load_manifest(manifest_path):
+    """Load a manifest from disk, or return an empty one"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'sections': {}}
+    
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'sections': {}}
+    
+    return manifest
+
+def save_manifest(manifest_path, manifest):
+    """Write the manifest atomically so an interrupted run never leaves it half written"""
+    manifest_path = Path(manifest_path)
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    
+    os.replace(tmp_path, manifest_path)
+
+def write_if_changed(path, content):
+    """
+    Write a generated text file atomically, and only if its content changed,
+    so dev servers watching it don't reload for nothing
+    
+    Returns:
+        bool: True if the file was written
+    """
+    path = Path(path)
+    
+    try:
+        if path.read_text(encoding='utf-8') == content:
+            return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    
+    return True
+
+def get_section(manifest, name):
+    """Get the entries for one tool, keyed by source path relative to the root"""
+    return manifest['sections'].setdefault(name, {})
+
+def settings_fingerprint(settings):
+    """Hash encoder settings so any change to them invalidates existing outputs"""
+    encoded = json.dumps(settings, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+def file_digest(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    
+    return digest.hexdigest()
+
+def relative_key(path, root_path):
+    """Manifest key for a path: relative to the root, with forward slashes"""
+    return Path(path).relative_to(root_path).as_posix()
+
+def make_entry(source_stat, digest, fingerprint, outputs, details=None):
+    """
+    Build a manifest entry for a freshly built source
+    
+    Args:
+        source_stat: os.stat_result of the source image
+        digest: SHA-256 of the source image
+        fingerprint: settings_fingerprint() of the encoder settings used
+        outputs: Output paths relative to the root
+        details: Extra per-image build results to keep (e.g. chosen qualities)
+    """
+    entry = {
+        'mtime_ns': source_stat.st_mtime_ns,
+        'size': source_stat.st_size,
+        'sha256': digest,
+        'settings': fingerprint,
+        'outputs': sorted(outputs),
+    }
+    entry.update(details or {})
+    
+    return entry
+
+def cached_details(entry, key):
+    """
+    Per-image build results from an entry, for reuse if the source turns out unchanged
+    
+    Returns:
+        dict: {'sha256': ..., key: ...}, or None if the entry has nothing under key
+    """
+    if not entry or key not in entry:
+        return None
+    
+    return {'sha256': entry['sha256'], key: entry[key]}
+
+def is_up_to_date(entry, source_path, source_stat, fingerprint, root_path):
+    """
+    Check whether a source's recorded outputs are still valid
+    
+    The source is only hashed when its mtime changed but its size did not
+    (a touch or a checkout); in that case a matching hash refreshes the entry.
+    
+    Returns:
+        bool: True if the outputs can be reused as they are
+    """
+    if not entry or entry.get('settings') != fingerprint:
+        return False
+    
+    if not all(os.path.exists(root_path / output) for output in entry['outputs']):
+        return False
+    
+    if entry['size'] != source_stat.st_size:
+        return False
+    
+    if entry['mtime_ns'] == source_stat.st_mtime_ns:
+        return True
+    
+    if file_digest(source_path) != entry['sha256']:
+        return False
+    
+    entry['mtime_ns'] = source_stat.st_mtime_ns
+    return True
+
+def adopt_existing_outputs(source_path, source_stat, fingerprint, outputs, root_path):
+    """
+    Record outputs built before the manifest existed, if they are newer than the source
+    
+    Returns:
+        Manifest entry, or None if the outputs have to be rebuilt
+    """
+    try:
+        output_mtimes = [os.stat(root_path / output).st_mtime_ns for output in outputs]
+    except OSError:
+        return None
+    
+    if min(output_mtimes) < source_stat.st_mtime_ns:
+        return None
+    
+    return make_entry(source_stat, file_digest(source_path), fingerprint, outputs)
+
+def remove_outputs(outputs, root_path):
+    """
+    Delete output files, ignoring ones that are already gone
+    
+    Returns:
+        List of removed paths relative to the root
+    """
+    removed = []
+    
+    for output in outputs:
+        try:
+            os.remove(root_path / output)
+            removed.append(output)
+        except FileNotFoundError:
+            pass
+    
+    return removed
+
+def prune_orphans(section, seen_keys, root_path, dispose=None):
+    """
+    Drop entries whose source image no longer exists and delete their outputs
+    
+    Args:
+        section: Manifest section from get_section()
+        seen_keys: Keys of the sources found during this run
+        root_path: Root directory the keys are relative to
+        dispose: Called with the outputs of each dropped entry instead of
+                 deleting them (e.g. to keep them for a grace period), returning
+                 the paths it disposed of
+    
+    Returns:
+        List of removed output paths relative to the root
+    """
+    removed = []
+    
+    for key in [key for key in section if key not in seen_keys]:
+        if (root_path / key).exists():
+            # Still on disk but no longer selected (e.g. now excluded); leave its outputs alone
+            continue
+        
+        outputs = section.pop(key)['outputs']
+        removed.extend(dispose(outputs) if dispose else remove_outputs(outputs, root_path))
+    
+    return removed
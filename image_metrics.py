@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Image Pipeline Metrics
+Per-stage timing of each image's conversion, aggregated into histograms and
+written as JSON lines or Prometheus text, plus memory measurement helpers
+shared by the converters and benchmarks
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def reset_peak_rss():
+    """
+    Reset the process's peak resident set size, where the OS allows it
+    
+    Returns:
+        bool: True if the peak was reset (Linux only)
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB since start or the last reset, if known"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    
+    if resource is None:
+        return None
+    
+    # getrusage reports bytes on macOS and KB elsewhere, and is never reset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+# Stages of an image's conversion that are timed. Resize, encode and write
+# are timed per variant; animated images are decoded, resized and encoded
+# frame by frame, so all of that is counted as encode.
+STAGES = ('stat', 'open', 'decode', 'breakpoints', 'classify', 'convert', 'resize', 'encode', 'write',
+          'fallback')
+
+# Upper bounds in seconds of the histogram buckets timings are counted into
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Number of slowest images listed in summaries
+SLOWEST_COUNT = 5
+
+class StageTimer:
+    """
+    Timings of one image's conversion stages
+    
+    The timings are a plain list of [stage, variant, seconds] so they can be
+    returned from worker processes in a report. Variant encodes run on their
+    own threads, so stage times can overlap and add up to more than wall time.
+    """
+    
+    def __init__(self):
+        self.timings = []
+    
+    @contextmanager
+    def stage(self, name, variant=None):
+        """Time the body of a with block as one stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append([name, variant, time.perf_counter() - start])
+    
+    def call(self, name, variant, func, *args, **kwargs):
+        """Time a function call as one stage and return its result"""
+        with self.stage(name, variant):
+            return func(*args, **kwargs)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style, keeping raw values for percentiles"""
+    
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.values = []
+    
+    def observe(self, value):
+        """Count one value"""
+        self.values.append(value)
+    
+    def bucket_counts(self):
+        """Number of values at or below each bucket bound, then the total"""
+        counts = [sum(1 for value in self.values if value <= bound) for bound in self.buckets]
+        return counts + [len(self.values)]
+    
+    def percentile(self, fraction):
+        """Nearest-rank percentile of the observed values (0.0 if none)"""
+        if not self.values:
+            return 0.0
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class PipelineMetrics:
+    """
+    Stage timings of every image a tool processed in one run
+    
+    Args:
+        tool: Name of the tool, used as a label ('convert', 'responsive', ...)
+    """
+    
+    def __init__(self, tool):
+        self.tool = tool
+        self.stages = {}  # Stage name -> Histogram of each timing
+        self.totals = Histogram()  # Each image's summed stage time
+        self.images = []
+    
+    def record(self, image, timings, **fields):
+        """
+        Add one image's stage timings
+        
+        Args:
+            image: Image path relative to the root
+            timings: StageTimer.timings from the image's report
+            **fields: Extra values for the image's JSON line (status, bytes, ...)
+        """
+        stages = {}
+        variants = {}
+        
+        for stage, variant, seconds in timings:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+            stages[stage] = stages.get(stage, 0.0) + seconds
+            if variant:
+                variants.setdefault(variant, {})[stage] = seconds
+        
+        total = sum(stages.values())
+        self.totals.observe(total)
+        self.images.append(dict(fields, image=image, total_seconds=total,
+                                stages=stages, variants=variants))
+    
+    def slowest(self, count=SLOWEST_COUNT):
+        """The images with the most stage time, slowest first"""
+        return sorted(self.images, key=lambda image: -image['total_seconds'])[:count]
+    
+    def stage_summary(self):
+        """Count, total and percentiles of each stage, in STAGES order"""
+        ordered = [stage for stage in STAGES if stage in self.stages]
+        ordered.extend(sorted(set(self.stages) - set(STAGES)))
+        
+        return {
+            stage: {
+                'count': len(self.stages[stage].values),
+                'sum': sum(self.stages[stage].values),
+                'p50': self.stages[stage].percentile(0.5),
+                'p95': self.stages[stage].percentile(0.95),
+                'max': max(self.stages[stage].values),
+            }
+            for stage in ordered
+        }
+    
+    def write_jsonl(self, path):
+        """Write one JSON line per image, then a summary line with per-stage statistics"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for image in self.images:
+                f.write(json.dumps(dict(image, type='image', tool=self.tool)) + '\n')
+            
+            summary = {
+                'type': 'summary',
+                'tool': self.tool,
+                'images': len(self.images),
+                'stages': self.stage_summary(),
+                'slowest': [image['image'] for image in self.slowest()],
+            }
+            f.write(json.dumps(summary) + '\n')
+    
+    def write_prometheus(self, path):
+        """
+        Write the histograms in Prometheus text format, e.g. for node_exporter's
+        textfile collector; the file is replaced atomically so it is never read half-written
+        """
+        lines = [
+            '# HELP webp_stage_duration_seconds Time spent in each image conversion stage',
+            '# TYPE webp_stage_duration_seconds histogram',
+        ]
+        for stage in self.stage_summary():
+            labels = f'tool="{self.tool}",stage="{stage}"'
+            lines.extend(_histogram_lines('webp_stage_duration_seconds', labels, self.stages[stage]))
+        
+        lines.extend([
+            '# HELP webp_image_duration_seconds Summed stage time of each image',
+            '# TYPE webp_image_duration_seconds histogram',
+        ])
+        lines.extend(_histogram_lines('webp_image_duration_seconds', f'tool="{self.tool}"', self.totals))
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+    
+    def print_summary(self):
+        """Print where conversion time went, stage by stage, and the slowest images"""
+        if not self.images:
+            return
+        
+        print(f"\n⏱️  Stage timings ({len(self.images)} images):")
+        print(f"   {'Stage':<10}{'Count':>7}{'Total':>10}{'p50':>10}{'p95':>10}{'Max':>10}")
+        for stage, summary in self.stage_summary().items():
+            print(f"   {stage:<10}{summary['count']:>7}{summary['sum']:>9.2f}s"
+                  f"{summary['p50']*1000:>8.0f}ms{summary['p95']*1000:>8.0f}ms{summary['max']*1000:>8.0f}ms")
+        
+        print(f"\n🐢 Slowest images:")
+        for image in self.slowest():
+            stage, seconds = max(image['stages'].items(), key=lambda item: item[1])
+            print(f"   {image['total_seconds']:>6.2f}s  {image['image']} (mostly {stage}, {seconds:.2f}s)")
+
+def _histogram_lines(name, labels, histogram):
+    """Prometheus bucket, sum and count lines for one labelled histogram"""
+    bounds = [f"{bound:g}" for bound in histogram.buckets] + ['+Inf']
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+             for bound, count in zip(bounds, histogram.bucket_counts())]
+    lines.append(f'{name}_sum{{{labels}}} {sum(histogram.values):.6f}')
+    lines.append(f'{name}_count{{{labels}}} {len(histogram.values)}')
+    return lines
+
+@contextmanager
+def quiet_output(quiet=True):
+    """Silence the human-readable log printed inside the block, if quiet"""
+    if not quiet:
+        yield
+        return
+    
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        yield
+
+def write_metrics(metrics, jsonl_path=None, prometheus_path=None):
+    """Write a run's metrics to whichever outputs were asked for"""
+    if jsonl_path:
+        metrics.write_jsonl(jsonl_path)
+    if prometheus_path:
+        metrics.write_prometheus(prometheus_path)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Large Image Handling
+Keeps very large sources within a memory budget: a pixel ceiling enforced
+before decoding, and band-wise resizing so no full-height intermediate is built
+"""
+
+import math
+
+from PIL import Image
+
+# Largest width or height a WebP file can have
+WEBP_MAX_SIDE = 16383
+
+# Sources with more pixels than this are downsized (or rejected) before
+# anything else is done with them
+DEFAULT_MAX_PIXELS = 100_000_000
+
+# Sources with at least this many pixels are always processed memory-capped,
+# whatever the budget
+LARGE_IMAGE_PIXELS = 40_000_000
+
+# Output rows produced per band by resize_in_bands()
+BAND_ROWS = 256
+
+# Pillow stores RGB and RGBA pixels in 4 bytes, L in 1
+BYTES_PER_PIXEL = 4
+
+def decoded_mb(size):
+    """Memory taken by a decoded RGB(A) image of the given size, in MB"""
+    return size[0] * size[1] * BYTES_PER_PIXEL / 1024 / 1024
+
+def limit_size(size, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    Largest size with the same aspect ratio that fits within max_pixels and
+    WebP's side limit
+    
+    Returns:
+        The size unchanged if it already fits
+    """
+    width, height = size
+    scale = min(1.0, math.sqrt(max_pixels / (width * height)),
+                WEBP_MAX_SIDE / width, WEBP_MAX_SIDE / height)
+    
+    if scale >= 1.0:
+        return size
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def resize_in_bands(img, size, resample=Image.Resampling.LANCZOS, band_rows=BAND_ROWS):
+    """
+    Resize an image one horizontal band of output rows at a time
+    
+    A plain resize first builds a full-height intermediate at the output width;
+    here each band is resampled from its own box of the source (the filter
+    still reads source rows beyond the box), so only one band's intermediate
+    exists at a time. The result matches a plain resize to within rounding.
+    """
+    if size == img.size:
+        return img
+    
+    width, height = size
+    scale = img.height / height
+    output = Image.new(img.mode, size)
+    
+    for top in range(0, height, band_rows):
+        bottom = min(height, top + band_rows)
+        box = (0, top * scale, img.width, bottom * scale)
+        band = img.resize((width, bottom - top), resample, box=box)
+        output.paste(band, (0, top))
+    
+    return output
+
+def fit_within_limit(img, max_pixels=DEFAULT_MAX_PIXELS, reject=False):
+    """
+    Enforce the pixel ceiling on an opened, not yet loaded, image
+    
+    JPEG sources are decoded at the largest reduced scale (1/2, 1/4 or 1/8)
+    that fits, so they are never decoded at full size; others are decoded and
+    then resized band-wise.
+    
+    Args:
+        img: Image from Image.open()
+        max_pixels: Pixel ceiling
+        reject: Raise instead of downsizing
+    
+    Returns:
+        The image, downsized if it was over the limit
+    
+    Raises:
+        ValueError: If the image is over the limit and reject is set
+    """
+    target = limit_size(img.size, max_pixels)
+    if target == img.size:
+        return img
+    
+    if reject:
+        raise ValueError(f"{img.size[0]}x{img.size[1]} is over the "
+                         f"{max_pixels/1_000_000:g}MP limit")
+    
+    if img.format == 'JPEG':
+        # draft() picks the smallest decode at least the requested size, so
+        # asking for half the target gives the largest one within it
+        img.draft(img.mode, (max(1, target[0] // 2), max(1, target[1] // 2)))
+    
+    target = limit_size(img.size, max_pixels)
+    return resize_in_bands(img, target)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Legacy Fallback Optimization
+Re-encodes the original JPEG and PNG files kept as the <img> fallback:
+progressive JPEG with optimized Huffman tables, recompressed PNG, no
+non-essential metadata, and wide-gamut colour profiles converted to sRGB
+"""
+
+import io
+import os
+from pathlib import Path
+
+from PIL import Image, JpegImagePlugin
+
+from animated_images import is_animated
+
+try:
+    from PIL import ImageCms
+except ImportError:
+    ImageCms = None
+
+# Whether colour profiles can be converted in this Pillow build; part of the
+# converters' settings fingerprints, since it changes their output
+COLOUR_MANAGED = ImageCms is not None
+
+# EXIF tag kept in JPEG fallbacks, so rotated photos still display upright
+EXIF_ORIENTATION = 0x0112
+
+# Image modes whose colour profile can be converted; others keep their profile
+CONVERTIBLE_MODES = {'RGB': 'RGB', 'RGBA': 'RGBA', 'CMYK': 'RGB'}
+
+# Metadata dropped from fallbacks, along with PNG text chunks and sRGB
+# profiles; the orientation tag survives in a minimal EXIF block
+STRIPPED_METADATA = ('exif', 'xmp', 'comment', 'photoshop', 'gamma')
+
+# Fallbacks are only replaced when re-encoding saves at least this fraction,
+# so a rerun never re-encodes a JPEG for a few bytes
+MIN_SAVINGS = 0.01
+
+_srgb_profile = None
+
+def profile_name(icc_profile):
+    """Description of an embedded ICC profile, or None if it can't be read"""
+    if ImageCms is None or not icc_profile:
+        return None
+    try:
+        profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+        return ImageCms.getProfileDescription(profile).strip() or 'unnamed profile'
+    except (ImageCms.PyCMSError, OSError, ValueError):
+        return None
+
+def is_srgb(icc_profile):
+    """Check whether an embedded profile is (a variant of) sRGB"""
+    name = profile_name(icc_profile)
+    return name is not None and 'srgb' in name.lower().replace(' ', '')
+
+def to_srgb(img):
+    """
+    Convert a decoded image with a non-sRGB colour profile to sRGB
+    
+    Browsers treat untagged images as sRGB and the WebP encoder doesn't carry
+    profiles over, so converting once here keeps the fallback and every WebP
+    output the same colour. Needs Pillow's ImageCms; without it, and for modes
+    it can't convert, the image is returned unchanged with its profile.
+    
+    Returns:
+        tuple: (image, name of the profile converted from, or None)
+    """
+    global _srgb_profile
+    
+    icc_profile = img.info.get('icc_profile')
+    if not icc_profile or img.mode not in CONVERTIBLE_MODES or is_srgb(icc_profile):
+        return img, None
+    
+    name = profile_name(icc_profile)
+    if name is None:
+        return img, None
+    
+    if _srgb_profile is None:
+        _srgb_profile = ImageCms.createProfile('sRGB')
+    
+    output_mode = CONVERTIBLE_MODES[img.mode]
+    source_profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+    try:
+        if output_mode == img.mode:
+            # In place, so large images aren't held twice
+            ImageCms.profileToProfile(img, source_profile, _srgb_profile, inPlace=True)
+            converted = img
+        else:
+            converted = ImageCms.profileToProfile(img, source_profile, _srgb_profile,
+                                                  outputMode=output_mode)
+    except ImageCms.PyCMSError:
+        return img, None
+    
+    converted.info.pop('icc_profile', None)
+    return converted, name
+
+def has_extra_exif(img):
+    """Check whether a JPEG carries EXIF beyond the orientation tag"""
+    exif = img.getexif()
+    return any(tag != EXIF_ORIENTATION for tag in exif)
+
+def orientation_exif(img):
+    """Minimal EXIF block holding only the image's orientation, or None if it is upright"""
+    orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+    if orientation == 1:
+        return None
+    
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = orientation
+    return exif.tobytes()
+
+def encode_jpeg(img, source, exif, icc_profile=None):
+    """
+    Progressive JPEG of a decoded JPEG, reusing its quantization tables and
+    chroma subsampling so the re-encode loses as little as possible
+    
+    Args:
+        img: Pixels to encode: the source, or its sRGB conversion
+        source: The JPEG as opened, for its tables and subsampling
+        exif: EXIF block to keep, or None
+        icc_profile: Colour profile to keep, or None
+    """
+    params = {'progressive': True, 'optimize': True, 'qtables': source.quantization}
+    subsampling = JpegImagePlugin.get_sampling(source)
+    if subsampling != -1:
+        params['subsampling'] = subsampling
+    if exif:
+        params['exif'] = exif
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', **params)
+    return buffer.getvalue()
+
+def reduce_png_mode(img):
+    """
+    Losslessly reduce a PNG's mode: drop an alpha channel that is fully
+    opaque, and palettize true-colour images with at most 256 colours
+    """
+    if img.mode == 'RGBA' and img.getchannel('A').getextrema() == (255, 255):
+        img = img.convert('RGB')
+    
+    if img.mode == 'RGB' and 'transparency' not in img.info and img.getcolors(256):
+        palettized = img.convert('P', palette=Image.Palette.ADAPTIVE, colors=256)
+        if palettized.convert('RGB').tobytes() == img.tobytes():
+            img = palettized
+    
+    return img
+
+def encode_png(img, icc_profile=None):
+    """Maximally compressed PNG of a decoded PNG, keeping only its transparency (and profile, if given)"""
+    img = reduce_png_mode(img)
+    
+    params = {'optimize': True}
+    if 'transparency' in img.info:
+        params['transparency'] = img.info['transparency']
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG', **params)
+    return buffer.getvalue()
+
+def optimize_fallback(image_path):
+    """
+    Re-encode a JPEG or PNG fallback in place if that makes it smaller
+    
+    Returns:
+        dict: 'format', 'before' and 'after' bytes, whether the file was
+              'written', the profile converted from ('colour', or None) and
+              the metadata 'stripped'; None for other formats and animations
+    """
+    image_path = Path(image_path)
+    before = os.path.getsize(image_path)
+    
+    with Image.open(image_path) as img:
+        if img.format not in ('JPEG', 'PNG') or is_animated(img):
+            return None
+        
+        image_format = img.format
+        img.load()
+        
+        stripped = [key for key in STRIPPED_METADATA
+                    if key in img.info and (key != 'exif' or has_extra_exif(img))]
+        if image_format == 'PNG' and img.text:
+            stripped.append('text')
+        exif = orientation_exif(img) if image_format == 'JPEG' else None
+        
+        # The JPEG encoder writes out a comment it finds in the image's info
+        img.info.pop('comment', None)
+        
+        icc_profile = img.info.get('icc_profile')
+        srgb_img, colour = to_srgb(img)
+        
+        # A profile that couldn't be converted is kept, so colours stay right
+        kept_profile = None
+        if icc_profile:
+            if colour is None and not is_srgb(icc_profile):
+                kept_profile = icc_profile
+            else:
+                stripped.append('icc_profile')
+        
+        # Already progressive with nothing to strip: re-encoding would only lose quality
+        progressive = img.info.get('progressive') or img.info.get('progression')
+        if image_format == 'JPEG' and progressive and not stripped:
+            return {'format': image_format, 'before': before, 'after': before,
+                    'written': False, 'colour': None, 'stripped': []}
+        
+        if image_format == 'JPEG':
+            data = encode_jpeg(srgb_img, img, exif, kept_profile)
+        else:
+            data = encode_png(srgb_img, kept_profile)
+    
+    written = len(data) <= before * (1 - MIN_SAVINGS)
+    if written:
+        tmp_path = image_path.with_name(image_path.name + '.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, image_path)
+    
+    return {'format': image_format, 'before': before, 'after': len(data) if written else before,
+            'written': written, 'colour': colour, 'stripped': stripped}
+
+def describe_fallback(result):
+    """One-line summary of an optimize_fallback() result"""
+    if not result['written']:
+        return f"{result['before']/1024:.1f}KB, already optimal"
+    
+    saved = (result['before'] - result['after']) / result['before'] * 100
+    notes = ['progressive' if result['format'] == 'JPEG' else 'recompressed']
+    if result['stripped']:
+        notes.append(f"stripped {', '.join(result['stripped'])}")
+    if result['colour']:
+        notes.append(f"sRGB from {result['colour']}")
+    
+    return (f"{result['before']/1024:.1f}KB → {result['after']/1024:.1f}KB "
+            f"(saved {saved:.1f}%; {', '.join(notes)})")
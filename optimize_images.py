@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Image Optimization Pipeline
+Walks the project once, decodes each source image once to write the full-size
+WebP and every responsive variant, then points code references at the WebP files.
+Runs without prompts, so it can be used in CI.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from breakpoints import DEFAULT_BYTE_STEP
+from convert_to_webp import DEFAULT_PROFILE, ENCODER_PROFILES
+from create_responsive_webp import (SIZES, find_source_images, process_all_images, require_avif,
+                                    variant_paths)
+from duplicate_images import DEFAULT_THRESHOLD, update_duplicate_references
+from font_subsetting import optimize_fonts, print_font_report, require_fonttools, update_font_faces
+from generated_images import GENERATED_MODULE
+from hashed_names import DEFAULT_GRACE_DAYS, HEADERS_SNIPPET, current_names
+from image_manifest import MANIFEST_FILENAME, get_section, load_manifest
+from image_metrics import PipelineMetrics, quiet_output, write_metrics
+from large_images import DEFAULT_MAX_PIXELS
+from perceptual_quality import DEFAULT_TARGET_SSIM, require_numpy
+from placeholders import PLACEHOLDER_INDEX
+from srcset_rewriter import update_srcset
+from tree_walker import walk_tree
+from update_images_to_webp import HashedReferenceScanner, update_all_files
+from watch_images import watch
+
+def run_pipeline(root_dir, jobs=1, manifest_path=MANIFEST_FILENAME, delete_original=False,
+                 update_references=True, dry_run=False, fast_resize=False, method=6,
+                 target_ssim=None, avif=False, auto_mode=False, metrics=None,
+                 memory_budget_mb=None, max_pixels=DEFAULT_MAX_PIXELS, reject_oversize=False,
+                 breakpoint_step=None, placeholder_index=None, generated_module=None,
+                 srcset=False, fallbacks=False, referenced_only=False, fonts=False,
+                 hashed_names=False, grace_days=DEFAULT_GRACE_DAYS, headers_snippet=None,
+                 dedupe=False, dedupe_threshold=DEFAULT_THRESHOLD):
+    """
+    Generate all WebP outputs and update code references in one process
+    
+    Args:
+        root_dir: Project root directory
+        jobs: Number of worker processes for image encoding
+        manifest_path: Build manifest path, or None to skip only existing outputs
+        delete_original: Whether to delete source images after conversion
+        update_references: Whether to rewrite code references afterwards
+        dry_run: Only report reference changes, don't write them
+        fast_resize: Use reduced-scale decoding and cascaded downscaling
+        method: WebP encoder effort (0-6)
+        target_ssim: Pick each output's quality to meet this SSIM score, or None
+        avif: Also generate AVIF versions of every output
+        auto_mode: Choose lossless, lossy-with-alpha or lossy WebP encoding per image
+        metrics: image_metrics.PipelineMetrics to record each image's stage timings in
+        memory_budget_mb: Decoded pixel memory shared by the jobs, or None for no budget
+        max_pixels: Downsize sources with more pixels than this
+        reject_oversize: Skip sources over max_pixels instead of downsizing them
+        breakpoint_step: Pick each image's widths so neighbouring variants differ
+                         by about this many bytes, or None to use SIZES
+        placeholder_index: Path to write the images' blur placeholders to, or None
+        generated_module: Path to write the TypeScript image module to, or None
+        srcset: Also point <img>/<Image> tags at the responsive variants
+        fallbacks: Re-encode JPEG and PNG sources as smaller fallbacks
+        referenced_only: Skip images no code file references
+        fonts: Also subset TTF/OTF fonts to WOFF2 and point @font-face rules at them
+        hashed_names: Name variants after their content hash and point references
+                      at the current names; needs the manifest
+        grace_days: Days a replaced content-hashed variant stays on disk
+        headers_snippet: Path to write immutable headers rules for the hashed variants to, or None
+        dedupe: Convert one copy of each duplicate image under public/ and point
+                references to the others at it
+        dedupe_threshold: Most differing perceptual hash bits for near-duplicates,
+                          or None for byte-identical copies only
+    """
+    root_path = Path(root_dir)
+    
+    # The only walk of the run; every stage works from this inventory
+    print(f"\n🔍 Scanning project: {root_path.absolute()}")
+    inventory = walk_tree(root_path)
+    source_images = find_source_images(root_path, inventory)
+    webp_files = inventory.webp_set()
+    code_files = inventory.code_paths()
+    print(f"   {len(source_images)} source images, {len(webp_files)} WebP files, "
+          f"{len(code_files)} code files")
+    
+    # The 'original' size is the full-size WebP, so every output comes from one decode
+    duplicates = process_all_images(root_path, delete_original, jobs, manifest_path, inventory,
+                                    fast_resize, method, target_ssim, avif, auto_mode, metrics,
+                                    memory_budget_mb, max_pixels, reject_oversize,
+                                    breakpoint_step, placeholder_index, generated_module,
+                                    fallbacks, referenced_only, hashed_names, grace_days,
+                                    headers_snippet, dedupe, dedupe_threshold)
+    
+    font_report = None
+    if fonts:
+        font_report = optimize_fonts(root_path, inventory, manifest_path)
+        print_font_report(font_report)
+    
+    if not update_references:
+        return
+    
+    # The pipeline's own files list every image and retired name, which must stay as they are
+    generated = {Path(path).absolute() for path in (manifest_path, placeholder_index,
+                                                    generated_module, headers_snippet) if path}
+    
+    if duplicates and duplicates['canonical_of']:
+        # First, so the rewrites below take references on to the canonical copy's variants;
+        # the manifest knows every variant built, whatever its name
+        outputs = None
+        if manifest_path:
+            outputs = set(current_names(get_section(load_manifest(manifest_path), 'responsive')))
+        update_duplicate_references(root_path, duplicates['canonical_of'], dry_run, webp_files,
+                                    [path for path in code_files if Path(path).absolute() not in generated],
+                                    outputs=outputs)
+    
+    if hashed_names:
+        # The manifest is the only record of which hashed names are current;
+        # retired variants are still on disk, so the tree can't tell
+        section = get_section(load_manifest(manifest_path), 'responsive')
+        update_all_files(root_path, dry_run, webp_files,
+                         [path for path in code_files if Path(path).absolute() not in generated],
+                         scan=HashedReferenceScanner(section), mode='hashed')
+        srcset_webp_files = {output for output in current_names(section).values()
+                             if output.endswith('.webp')}
+    else:
+        for file_path in source_images:
+            for webp_path in variant_paths(file_path).values():
+                if webp_path.exists():
+                    webp_files.add(webp_path.relative_to(root_path).as_posix())
+        
+        update_all_files(root_path, dry_run, webp_files, code_files)
+        
+        # Breakpoint variants are named by width, so only a fresh walk finds them all
+        srcset_webp_files = None if breakpoint_step else webp_files
+    
+    if srcset:
+        update_srcset(root_path, dry_run, srcset_webp_files, code_files,
+                      module_path=generated_module)
+    
+    if font_report:
+        update_font_faces(root_path, dry_run, font_report['woff2_files'], code_files)
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Convert images to WebP, generate responsive sizes and update references")
+    parser.add_argument('root', nargs='?', default='.', help="project root (default: current directory)")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="number of worker processes (0 = one per CPU, default 1)")
+    parser.add_argument('--manifest', default=MANIFEST_FILENAME,
+                        help=f"build manifest path, relative to the root (default {MANIFEST_FILENAME})")
+    parser.add_argument('--no-manifest', dest='manifest', action='store_const', const=None,
+                        help="only skip outputs that already exist")
+    parser.add_argument('--placeholder-index', default=PLACEHOLDER_INDEX, metavar='PATH',
+                        help=f"blur placeholder index, relative to the root (default {PLACEHOLDER_INDEX})")
+    parser.add_argument('--no-placeholder-index', dest='placeholder_index', action='store_const',
+                        const=None, help="don't write a placeholder index")
+    parser.add_argument('--image-module', default=GENERATED_MODULE, metavar='PATH',
+                        help=f"TypeScript image module, relative to the root (default {GENERATED_MODULE})")
+    parser.add_argument('--no-image-module', dest='image_module', action='store_const',
+                        const=None, help="don't write an image module")
+    parser.add_argument('--profile', choices=ENCODER_PROFILES, default=DEFAULT_PROFILE,
+                        help=f"encoder effort profile: fast for dev, max for release (default {DEFAULT_PROFILE})")
+    parser.add_argument('--fast-resize', action='store_true',
+                        help="reduced-scale JPEG decoding and cascaded downscaling "
+                             "for the smaller sizes")
+    parser.add_argument('--target-ssim', type=float, nargs='?', const=DEFAULT_TARGET_SSIM,
+                        help=f"pick each output's quality to meet this SSIM (default {DEFAULT_TARGET_SSIM})")
+    parser.add_argument('--avif', action='store_true',
+                        help="also generate AVIF versions of every output")
+    parser.add_argument('--auto-mode', action='store_true',
+                        help="pick lossless, lossy-with-alpha or lossy encoding per image")
+    parser.add_argument('--skip-references', action='store_true',
+                        help="don't rewrite image references in code")
+    parser.add_argument('--srcset', action='store_true',
+                        help="also add srcSet/sizes to <img> and <Image> tags that have variants")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="report reference changes without writing them")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and build images as they are added or edited")
+    parser.add_argument('--breakpoints', type=float, nargs='?', const=DEFAULT_BYTE_STEP / 1024, metavar='KB',
+                        help=f"pick each image's widths so neighbouring variants differ by KB "
+                             f"(default {DEFAULT_BYTE_STEP / 1024:g}) instead of the fixed sizes")
+    parser.add_argument('--optimize-fallbacks', action='store_true',
+                        help="re-encode JPEG/PNG originals as progressive JPEG / recompressed PNG "
+                             "without metadata")
+    parser.add_argument('--fonts', action='store_true',
+                        help="also subset TTF/OTF fonts to WOFF2 and point @font-face rules at them")
+    parser.add_argument('--all-images', action='store_true',
+                        help="also process images no code file references")
+    parser.add_argument('--hashed-names', action='store_true',
+                        help="name variants after their content hash, for immutable caching")
+    parser.add_argument('--gc-grace-days', type=float, default=DEFAULT_GRACE_DAYS, metavar='DAYS',
+                        help=f"keep replaced content-hashed variants this long (default {DEFAULT_GRACE_DAYS})")
+    parser.add_argument('--headers-snippet', default=HEADERS_SNIPPET, metavar='PATH',
+                        help=f"immutable Cache-Control headers for the content-hashed variants, "
+                             f"relative to the root (default {HEADERS_SNIPPET})")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="convert one copy of each duplicate image under public/ and point "
+                             "references to the others at it")
+    parser.add_argument('--dedupe-threshold', type=int, default=DEFAULT_THRESHOLD, metavar='BITS',
+                        help=f"most perceptual hash bits two images may differ in to count as "
+                             f"duplicates; -1 for byte-identical only (default {DEFAULT_THRESHOLD})")
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help="decoded pixel memory shared by all jobs; larger images are processed memory-capped")
+    parser.add_argument('--max-pixels', type=float, default=DEFAULT_MAX_PIXELS / 1_000_000, metavar='MP',
+                        help=f"downsize sources over this many megapixels (default {DEFAULT_MAX_PIXELS / 1_000_000:g})")
+    parser.add_argument('--reject-oversize', action='store_true',
+                        help="skip sources over --max-pixels instead of downsizing them")
+    parser.add_argument('--metrics-jsonl', metavar='PATH',
+                        help="write each image's stage timings and a summary to PATH as JSON lines")
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help="write stage timing histograms to PATH in Prometheus text format")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="no log output; use with the metrics options")
+    args = parser.parse_args()
+    
+    if args.hashed_names and not args.manifest:
+        parser.error("--hashed-names needs the build manifest")
+    if args.hashed_names and args.watch:
+        parser.error("--hashed-names can't be combined with --watch, which keeps plain names")
+    
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    
+    if args.dedupe_threshold < 0:
+        args.dedupe_threshold = None
+    
+    if args.manifest:
+        args.manifest = os.path.join(args.root, args.manifest)
+    
+    if args.placeholder_index:
+        args.placeholder_index = os.path.join(args.root, args.placeholder_index)
+    
+    if args.image_module:
+        args.image_module = os.path.join(args.root, args.image_module)
+    
+    args.headers_snippet = os.path.join(args.root, args.headers_snippet)
+    
+    if args.target_ssim:
+        require_numpy()
+    
+    if args.avif:
+        require_avif()
+    
+    if args.fonts:
+        require_fonttools()
+    
+    return args
+
+def main():
+    """Main function"""
+    args = parse_args()
+    metrics = PipelineMetrics('pipeline') if args.metrics_jsonl or args.metrics_prom else None
+    
+    with quiet_output(args.quiet):
+        print("\n" + "="*70)
+        print("🖼️  IMAGE OPTIMIZATION PIPELINE")
+        print("="*70)
+        
+        if not Path(args.root).is_dir():
+            print(f"❌ Error: Directory '{args.root}' does not exist")
+            sys.exit(1)
+        
+        print(f"\n⚙️  CONFIGURATION:")
+        if args.breakpoints:
+            print(f"   • Sizes: breakpoints {args.breakpoints:g}KB apart, per image")
+        else:
+            for size_name, config in SIZES.items():
+                width_str = f"{config['width']}px" if config['width'] else "original"
+                print(f"   • {size_name.capitalize()}: {width_str} @ Q{config['quality']}")
+        method = ENCODER_PROFILES[args.profile]['method']
+        print(f"   Profile: {args.profile} (method {method})")
+        print(f"   Parallel jobs: {args.jobs}")
+        print(f"   Fast resize: {args.fast_resize}")
+        print(f"   Memory budget: {f'{args.memory_budget:g}MB' if args.memory_budget else 'none'}")
+        print(f"   Max pixels: {args.max_pixels:g}MP")
+        print(f"   Target SSIM: {args.target_ssim or 'off'}")
+        print(f"   AVIF: {args.avif}")
+        print(f"   Encode mode: {'auto' if args.auto_mode else 'lossy'}")
+        print(f"   Manifest: {args.manifest or 'disabled'}")
+        print(f"   Placeholder index: {args.placeholder_index or 'disabled'}")
+        print(f"   Image module: {args.image_module or 'disabled'}")
+        print(f"   Optimize fallbacks: {args.optimize_fallbacks}")
+        print(f"   Referenced images only: {not args.all_images}")
+        print(f"   Fonts: {args.fonts}")
+        print(f"   Content-hashed names: {args.hashed_names}")
+        print(f"   Deduplicate: {args.dedupe}")
+        
+        run_pipeline(args.root, args.jobs, args.manifest,
+                     update_references=not args.skip_references, dry_run=args.dry_run,
+                     fast_resize=args.fast_resize, method=method, target_ssim=args.target_ssim,
+                     avif=args.avif, auto_mode=args.auto_mode, metrics=metrics,
+                     memory_budget_mb=args.memory_budget,
+                     max_pixels=int(args.max_pixels * 1_000_000),
+                     reject_oversize=args.reject_oversize,
+                     breakpoint_step=int(args.breakpoints * 1024) if args.breakpoints else None,
+                     placeholder_index=args.placeholder_index,
+                     generated_module=args.image_module, srcset=args.srcset,
+                     fallbacks=args.optimize_fallbacks,
+                     referenced_only=not args.all_images, fonts=args.fonts,
+                     hashed_names=args.hashed_names, grace_days=args.gc_grace_days,
+                     headers_snippet=args.headers_snippet, dedupe=args.dedupe,
+                     dedupe_threshold=args.dedupe_threshold)
+        
+        if metrics:
+            metrics.print_summary()
+            write_metrics(metrics, args.metrics_jsonl, args.metrics_prom)
+        
+        if args.watch:
+            watch(args.root, args.manifest, placeholder_index=args.placeholder_index,
+                  generated_module=args.image_module,
+                  fast_resize=args.fast_resize, method=method,
+                  target_ssim=args.target_ssim, avif=args.avif, auto_mode=args.auto_mode,
+                  memory_budget_mb=args.memory_budget,
+                  max_pixels=int(args.max_pixels * 1_000_000),
+                  reject_oversize=args.reject_oversize,
+                  breakpoint_step=int(args.breakpoints * 1024) if args.breakpoints else None,
+                  fallbacks=args.optimize_fallbacks)
+        
+        print("✨ Done!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Perceptual Quality Search
+Finds the lowest WebP quality whose output still meets a target SSIM score,
+so simple images get fewer bytes and detailed ones aren't under-encoded
+"""
+
+import io
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Longest side of the luma plane SSIM is computed on; enough to catch
+# visible artifacts while keeping each probe to a few milliseconds
+SSIM_MAX_SIDE = 512
+
+# Target score used when --target-ssim is given without a value
+DEFAULT_TARGET_SSIM = 0.985
+
+# Side of the square SSIM window, in pixels of the downscaled plane
+SSIM_WINDOW = 7
+
+# Quality range searched, and the step at which the search stops early
+MIN_QUALITY = 40
+MAX_QUALITY = 95
+QUALITY_TOLERANCE = 2
+
+def require_numpy():
+    """Exit with an install hint if NumPy isn't available"""
+    if np is None:
+        raise SystemExit("❌ Error: NumPy is required for perceptual quality targeting\n"
+                         "   Install it with: pip install numpy")
+
+def luma_plane(img, max_side=SSIM_MAX_SIDE):
+    """Downscaled luma (Y) plane of an image as a float64 array"""
+    luma = img.convert('L')
+    scale = max_side / max(luma.size)
+    
+    if scale < 1:
+        size = (max(1, round(luma.size[0] * scale)), max(1, round(luma.size[1] * scale)))
+        luma = luma.resize(size, Image.Resampling.BOX)
+    
+    return np.asarray(luma, dtype=np.float64)
+
+def _window_means(plane, window):
+    """Mean of every window x window block, via a summed-area table"""
+    table = np.pad(plane, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    sums = (table[window:, window:] - table[:-window, window:]
+            - table[window:, :-window] + table[:-window, :-window])
+    return sums / (window * window)
+
+def ssim(reference, candidate, window=SSIM_WINDOW):
+    """
+    Mean structural similarity of two equally sized luma planes
+    
+    Returns:
+        float: 1.0 for identical planes, lower as structure is lost
+    """
+    window = min(window, *reference.shape)
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    
+    mu_x = _window_means(reference, window)
+    mu_y = _window_means(candidate, window)
+    var_x = _window_means(reference * reference, window) - mu_x * mu_x
+    var_y = _window_means(candidate * candidate, window) - mu_y * mu_y
+    covar = _window_means(reference * candidate, window) - mu_x * mu_y
+    
+    ssim_map = (((2 * mu_x * mu_y + c1) * (2 * covar + c2))
+                / ((mu_x * mu_x + mu_y * mu_y + c1) * (var_x + var_y + c2)))
+    
+    return float(ssim_map.mean())
+
+def encode_webp(img, quality, method=6):
+    """Encode an image to WebP in memory"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'WEBP', quality=quality, method=method)
+    return buffer.getvalue()
+
+def search_quality(img, target, start_quality, method=6):
+    """
+    Binary search for the lowest quality whose encode scores at least target SSIM
+    
+    The first probe is at start_quality (the fixed setting), which also gives
+    the byte count the search is saving against. The search stops once the
+    remaining range is narrower than QUALITY_TOLERANCE.
+    
+    Args:
+        img: PIL Image to encode (RGB)
+        target: SSIM score to reach, e.g. DEFAULT_TARGET_SSIM
+        start_quality: Fixed quality the image would otherwise be encoded at
+        method: WebP encoder effort (0-6)
+    
+    Returns:
+        dict: 'quality', 'data' (encoded bytes), 'score', 'fixed_bytes', 'probes'
+    """
+    reference = luma_plane(img)
+    probes = 0
+    
+    def probe(quality):
+        nonlocal probes
+        probes += 1
+        data = encode_webp(img, quality, method)
+        score = ssim(reference, luma_plane(Image.open(io.BytesIO(data))))
+        return {'quality': quality, 'data': data, 'score': score}
+    
+    fixed = probe(start_quality)
+    
+    if fixed['score'] >= target:
+        best = fixed
+        low, high = MIN_QUALITY, start_quality - 1
+    else:
+        best = None
+        low, high = start_quality + 1, MAX_QUALITY
+    
+    while high - low + 1 >= QUALITY_TOLERANCE:
+        result = probe((low + high) // 2)
+        if result['score'] >= target:
+            best = result
+            high = result['quality'] - 1
+        else:
+            low = result['quality'] + 1
+    
+    if best is None:
+        # Even the top of the range misses the target; use the highest quality
+        best = fixed if start_quality >= MAX_QUALITY else probe(MAX_QUALITY)
+    
+    return dict(best, fixed_bytes=len(fixed['data']), probes=probes)
+
+def encode_to_target(img, target, start_quality, method=6, cached=None):
+    """
+    Encode an image at the quality that meets a target SSIM
+    
+    Args:
+        img: PIL Image to encode (RGB)
+        target: SSIM score to reach
+        start_quality: Fixed quality the image would otherwise be encoded at
+        method: WebP encoder effort (0-6)
+        cached: Choice recorded by a previous build of the same source, to skip the search
+    
+    Returns:
+        tuple: (encoded bytes, {'quality': chosen quality, 'fixed_bytes': bytes at start_quality})
+    """
+    if cached:
+        return encode_webp(img, cached['quality'], method), cached
+    
+    result = search_quality(img, target, start_quality, method)
+    return result['data'], {'quality': result['quality'], 'fixed_bytes': result['fixed_bytes']}
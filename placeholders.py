@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Image Placeholders
+Tiny blurred WebP data URLs (LQIP) for each image, collected into an index
+keyed by public path that Next.js Image components can use as blurDataURL
+"""
+
+import base64
+import io
+import json
+from pathlib import Path
+
+from PIL import Image
+
+from image_manifest import write_if_changed
+
+# Default index location, relative to the project root, importable as '@/lib/image-placeholders.json'
+PLACEHOLDER_INDEX = 'src/lib/image-placeholders.json'
+
+# Longest side of a placeholder in pixels; the browser scales it up and blurs it
+PLACEHOLDER_SIDE = 16
+
+# A placeholder only has to suggest colours and shapes, so it is encoded at a
+# quality that keeps it to a few dozen bytes
+PLACEHOLDER_QUALITY = 30
+
+def make_placeholder(img, size=None):
+    """
+    Placeholder for a decoded image
+    
+    Args:
+        img: PIL Image, any size
+        size: (width, height) the image is served at, if not img.size
+              (e.g. when img is a reduced decode)
+    
+    Returns:
+        dict: 'blurDataURL', plus the full 'width' and 'height' for Next.js
+    """
+    width, height = size or img.size
+    if img.mode in ('1', 'P'):
+        img = img.convert('RGBA')  # Palette images can only be resampled nearest-neighbour
+    
+    scale = PLACEHOLDER_SIDE / max(img.size)
+    tiny_size = (max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale)))
+    
+    # BOX with a reducing gap averages whole blocks first, which is cheap on large sources
+    tiny = img.resize(tiny_size, Image.Resampling.BOX, reducing_gap=2.0)
+    if tiny.mode not in ('RGB', 'RGBA'):
+        tiny = tiny.convert('RGBA' if 'A' in tiny.getbands() or 'transparency' in tiny.info else 'RGB')
+    
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY, method=6)
+    data = base64.b64encode(buffer.getvalue()).decode('ascii')
+    
+    return {'blurDataURL': f"data:image/webp;base64,{data}", 'width': width, 'height': height}
+
+def placeholder_for_file(image_path):
+    """
+    Placeholder for an image file, decoded at the smallest scale the format allows
+    
+    Used for images whose variants are already up to date.
+    """
+    with Image.open(image_path) as img:
+        size = img.size
+        img.draft(img.mode, (PLACEHOLDER_SIDE, PLACEHOLDER_SIDE))
+        img.load()
+        return make_placeholder(img, size)
+
+def public_path(path, root_path):
+    """URL path a file is served at: relative to public/ if it is in there, else to the root"""
+    rel_path = Path(path).relative_to(root_path).as_posix()
+    if rel_path.startswith('public/'):
+        rel_path = rel_path[len('public/'):]
+    return '/' + rel_path
+
+def load_index(index_path):
+    """Load a placeholder index, or return an empty one"""
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    return index if isinstance(index, dict) else {}
+
+def save_index(index_path, index):
+    """
+    Write the index if its content changed (see image_manifest.write_if_changed)
+    
+    Returns:
+        bool: True if the file was written
+    """
+    return write_if_changed(index_path, json.dumps(index, indent=2, sort_keys=True) + '\n')
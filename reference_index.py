@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Image Reference Index
+Finds which images the code actually uses, with the same reference patterns
+the WebP reference update rewrites, so the converters can skip unused images
+and report the dead weight they leave in the project
+"""
+
+import argparse
+import json
+import posixpath
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from hashed_names import plain_name
+from tree_walker import walk_tree
+from update_images_to_webp import REFERENCE_PATTERNS, reference_regex
+
+# Extensions of the files a reference can point at: the sources and the
+# formats they are converted to
+ASSET_EXTENSIONS = 'jpg|jpeg|png|gif|bmp|webp|avif'
+
+# Besides the rewritten patterns, static imports and any quoted path to an
+# image count as a use (e.g. `avatar: '/images/me.jpg'` or an array of slide
+# URLs), so nothing in use is ever skipped; these references are only
+# indexed, never rewritten
+INDEX_PATTERNS = REFERENCE_PATTERNS + [
+    (r'import\s+[\w$]+\s+from\s+["\']([^"\']+\.(?:{extensions}))["\']', 'import'),
+    (r'["\'`]([^"\'`\s${}]+\.(?:{extensions}))["\'`]', 'string literal'),
+]
+ASSET_REFERENCE_RE = reference_regex(INDEX_PATTERNS, ASSET_EXTENSIONS)
+
+# Template literals building an image path, e.g. `/images/${slug}.jpg`: every
+# image under the literal's static prefix may be used
+DYNAMIC_REFERENCE_RE = re.compile(r'`([^`$]*)\$\{[^`]*\.(?:' + ASSET_EXTENSIONS + r')`',
+                                  re.IGNORECASE)
+
+# URLs with a scheme or protocol-relative ones point outside the project
+EXTERNAL_RE = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//)', re.IGNORECASE)
+
+# Images Next.js serves by file name convention from the app directory
+NEXT_METADATA_IMAGE_RE = re.compile(r'(?:^|/)app/(?:.*/)?(?:icon|apple-icon|opengraph-image|'
+                                    r'twitter-image)\d*\.\w+$')
+
+# Module path aliases used when tsconfig.json defines none
+DEFAULT_ALIASES = {'@/': 'src/'}
+
+def path_aliases(root_path):
+    """
+    Import path prefixes and the folders they stand for, from tsconfig.json's
+    compilerOptions.paths (e.g. '@/*': ['./src/*'] gives {'@/': 'src/'})
+    """
+    try:
+        with open(Path(root_path) / 'tsconfig.json', 'r', encoding='utf-8') as f:
+            paths = json.load(f).get('compilerOptions', {}).get('paths', {})
+    except (OSError, ValueError, AttributeError):
+        return dict(DEFAULT_ALIASES)
+    
+    aliases = {}
+    for alias, targets in paths.items():
+        if alias.endswith('*') and targets and targets[0].endswith('*'):
+            target = posixpath.normpath(targets[0][:-1])
+            aliases[alias[:-1]] = '' if target == '.' else target + '/'
+    return aliases or dict(DEFAULT_ALIASES)
+
+def resolve_reference(reference, code_dir, aliases):
+    """
+    Project paths (relative to the root) a reference may point at
+    
+    Args:
+        reference: The path as written in the code
+        code_dir: Folder of the code file, relative to the root
+        aliases: path_aliases() of the project
+    
+    Returns:
+        list: Candidate paths; empty for external URLs
+    """
+    reference = reference.split('?', 1)[0].split('#', 1)[0]
+    if EXTERNAL_RE.match(reference):
+        return []
+    
+    # Root-relative URLs are served from public/, but may also be written
+    # relative to the root (as find_webp_reference() allows)
+    if reference.startswith('/'):
+        return ['public' + reference, reference.lstrip('/')]
+    
+    for alias, target in aliases.items():
+        if reference.startswith(alias):
+            return [posixpath.normpath(target + reference[len(alias):])]
+    
+    return [posixpath.normpath(posixpath.join(code_dir, reference))]
+
+def stem_of(rel_path):
+    """A path without its extension"""
+    return posixpath.splitext(rel_path)[0]
+
+def source_stems(rel_path):
+    """
+    Stems of the sources a file may have been generated from: its own, and
+    for WebP/AVIF files, the one without a variant suffix ('-mobile', '-640w');
+    content-hashed names count as their plain name
+    """
+    stem, extension = posixpath.splitext(plain_name(rel_path))
+    stems = [stem]
+    if extension.lower() in ('.webp', '.avif') and '-' in posixpath.basename(stem):
+        stems.append(stem.rsplit('-', 1)[0])
+    return stems
+
+@dataclass
+class ReferenceIndex:
+    """Which project files the code references, built by build_reference_index()"""
+    referrers: dict = field(default_factory=dict)  # Referenced path -> code files referencing it
+    dynamic_prefixes: set = field(default_factory=set)  # Path prefixes of template literal references
+    used_stems: set = field(default_factory=set)  # Source stems of every referenced path
+    
+    def add(self, rel_path, code_file):
+        """Record a reference from a code file"""
+        self.referrers.setdefault(rel_path, set()).add(code_file)
+        self.used_stems.update(source_stems(rel_path))
+    
+    def is_used(self, rel_path, source=True):
+        """
+        Check whether a file is used by the code
+        
+        A source image counts as used if it, or any file generated from it,
+        is referenced; a WebP/AVIF file (source=False) also if its source is.
+        """
+        if rel_path in self.referrers:
+            return True
+        if any(rel_path.startswith(prefix) for prefix in self.dynamic_prefixes):
+            return True
+        
+        stems = [stem_of(rel_path)] if source else source_stems(rel_path)
+        return any(stem in self.used_stems for stem in stems)
+
+def build_reference_index(root_dir, inventory=None, ignore=()):
+    """
+    Scan every code file for references to images
+    
+    Args:
+        root_dir: Project root
+        inventory: tree_walker.walk_tree() result for root_dir, if already walked
+        ignore: Paths of files not to scan, such as the pipeline's own generated files
+    
+    Returns:
+        ReferenceIndex
+    """
+    root_path = Path(root_dir)
+    if inventory is None:
+        inventory = walk_tree(root_path)
+    
+    aliases = path_aliases(root_path)
+    ignored = {Path(path).absolute() for path in ignore}
+    index = ReferenceIndex()
+    
+    for entry in inventory.code_files:
+        if entry.path.absolute() in ignored:
+            continue
+        try:
+            content = entry.path.read_bytes().decode('utf-8')
+        except (OSError, UnicodeDecodeError):
+            continue
+        
+        code_dir = posixpath.dirname(entry.rel_path)
+        for match in ASSET_REFERENCE_RE.finditer(content):
+            for rel_path in resolve_reference(match.group(match.lastindex + 1), code_dir, aliases):
+                index.add(rel_path, entry.rel_path)
+        
+        for match in DYNAMIC_REFERENCE_RE.finditer(content):
+            for prefix in resolve_reference(match.group(1) or './', code_dir, aliases):
+                index.dynamic_prefixes.add('' if prefix == '.' else prefix)
+    
+    for entry in inventory.images:
+        if NEXT_METADATA_IMAGE_RE.search(entry.rel_path):
+            index.add(entry.rel_path, '(Next.js file convention)')
+    
+    return index
+
+def split_referenced(image_paths, index, root_path):
+    """
+    Separate source images the code uses from those it doesn't
+    
+    Returns:
+        tuple: (used paths, unused paths), each in the given order
+    """
+    used, unused = [], []
+    for file_path in image_paths:
+        rel_path = Path(file_path).relative_to(root_path).as_posix()
+        (used if index.is_used(rel_path) else unused).append(file_path)
+    return used, unused
+
+def skip_unreferenced(root_path, inventory, image_paths, ignore=()):
+    """
+    Leave out the images no code references, saying how many were skipped
+    
+    Args:
+        root_path: Project root
+        inventory: tree_walker.walk_tree() result for root_path
+        image_paths: Source images to filter
+        ignore: Generated files not to count as references (see build_reference_index())
+    
+    Returns:
+        list: The referenced images, in the given order
+    """
+    index = build_reference_index(root_path, inventory, ignore)
+    used, unused = split_referenced(image_paths, index, root_path)
+    
+    if unused:
+        unused_bytes = sum(Path(file_path).stat().st_size for file_path in unused)
+        print(f"\n🔗 Skipping {len(unused)} images no code references ({unused_bytes/1024/1024:.2f} MB); "
+              f"list them with reference_index.py, or convert them with --all-images")
+    
+    return used
+
+def unused_assets(inventory, index):
+    """
+    Images and WebP files nothing in the code uses
+    
+    Returns:
+        list: (path relative to the root, bytes), largest first
+    """
+    unused = [(entry.rel_path, entry.stat.st_size) for entry in inventory.images
+              if not index.is_used(entry.rel_path)]
+    unused.extend((entry.rel_path, entry.stat.st_size) for entry in inventory.webp_files
+                  if not index.is_used(entry.rel_path, source=False))
+    return sorted(unused, key=lambda item: (-item[1], item[0]))
+
+def print_unused_report(unused, limit=None):
+    """Print unused files with their sizes, and the totals per extension"""
+    total = sum(size for _, size in unused)
+    print(f"\n🗑️  Unreferenced images: {len(unused)} files, {total/1024/1024:.2f} MB")
+    
+    by_extension = {}
+    for rel_path, size in unused:
+        extension = posixpath.splitext(rel_path)[1].lower()
+        count, total_size = by_extension.get(extension, (0, 0))
+        by_extension[extension] = (count + 1, total_size + size)
+    for extension, (count, size) in sorted(by_extension.items(), key=lambda item: -item[1][1]):
+        print(f"   {extension}: {count} files, {size/1024/1024:.2f} MB")
+    
+    shown = unused if limit is None else unused[:limit]
+    if shown:
+        print()
+    for rel_path, size in shown:
+        print(f"   {size/1024:>10.1f}KB  {rel_path}")
+    if len(shown) < len(unused):
+        print(f"   ... and {len(unused) - len(shown)} more (see --json)")
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="List the images and WebP files nothing in the code references")
+    parser.add_argument('root', nargs='?', default='.', help="project root (default: current directory)")
+    parser.add_argument('--limit', type=int, default=50,
+                        help="most files to list (default 50, 0 for all)")
+    parser.add_argument('--json', metavar='PATH',
+                        help="also write the unused files and their sizes to PATH as JSON")
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    args = parse_args()
+    
+    print("\n" + "="*70)
+    print("🔗 IMAGE REFERENCE INDEX")
+    print("="*70)
+    
+    root_path = Path(args.root)
+    if not root_path.is_dir():
+        print(f"❌ Error: Directory '{args.root}' does not exist")
+        sys.exit(1)
+    
+    inventory = walk_tree(root_path)
+    index = build_reference_index(root_path, inventory)
+    unused = unused_assets(inventory, index)
+    
+    print(f"\n🔍 {len(inventory.code_files)} code files reference {len(index.referrers)} paths")
+    if index.dynamic_prefixes:
+        print(f"   Built at runtime (kept as used): "
+              f"{', '.join(sorted(prefix + '*' for prefix in index.dynamic_prefixes))}")
+    print_unused_report(unused, args.limit or None)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([{'path': rel_path, 'bytes': size} for rel_path, size in unused], f, indent=1)
+        print(f"\n💾 Unused files written to {args.json}")
+    
+    print("\n" + "="*70 + "\n")
+
+if __name__ == "__main__":
+    main()
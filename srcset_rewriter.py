@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Responsive Image Reference Rewriter
+Upgrades <img> and Next.js <Image> usages in TSX/JSX files to the generated
+responsive variants: srcSet and sizes on <img>, and the generated module's
+loader and sizes on <Image>, only where the variants exist
+"""
+
+import argparse
+import difflib
+import hashlib
+import posixpath
+import re
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from create_responsive_webp import SIZES
+from generated_images import GENERATED_MODULE
+from hashed_names import plain_name
+from tree_walker import walk_tree
+from update_images_to_webp import (get_webp_equivalent, load_patch_plan, patched_bytes,
+                                   plan_totals, save_patch_plan, splice_edits, update_all_files)
+
+# Files whose image tags are rewritten
+JSX_EXTENSIONS = {'.tsx', '.jsx'}
+
+# sizes attribute added where a tag has none: the image spans the viewport
+DEFAULT_SIZES = '100vw'
+
+# Name of the <Image> loader exported by the generated module
+LOADER_NAME = 'imageLoader'
+
+# An <img> or <Image> opening tag. Attribute values may be quoted strings or
+# {expressions} with one level of nested braces, either of which can hold '>'
+TAG_RE = re.compile(r'<(img|Image)\b((?:[^>{}"\']|"[^"]*"|\'[^\']*\'|'
+                    r'\{(?:[^{}]|\{[^{}]*\})*\})*)>')
+
+# A literal src attribute: src="...", src='...' or src={"..."}
+SRC_RE = re.compile(r'(?<![\w-])src\s*=\s*(?:"([^"{}]+)"|\'([^\'{}]+)\'|'
+                    r'\{\s*(?:"([^"]+)"|\'([^\']+)\')\s*\})')
+
+# Tags that already choose their own candidates are left alone
+RESPONSIVE_ATTR_RE = re.compile(r'(?<![\w-])(?:srcSet|srcset|loader)\s*=')
+SIZES_ATTR_RE = re.compile(r'(?<![\w-])sizes\s*=')
+
+# An import statement, with its quote character and trailing semicolon if any
+IMPORT_RE = re.compile(r'^import\b[^;\'"]*?([\'"])[^\'"\n]+\1(;?)[ \t]*$', re.MULTILINE)
+LOADER_IMPORT_RE = re.compile(r'import\s*\{[^}]*\b' + LOADER_NAME + r'\b')
+
+# File name of a generated variant: the full-size name plus a SIZES suffix or -<width>w
+VARIANT_NAME_RE = re.compile(
+    r'^(.+?)(' + '|'.join(re.escape(config['suffix']) for config in SIZES.values()
+                          if config['suffix']) + r'|-\d+w)\.webp$')
+
+def module_specifier(module_path, root_path):
+    """Import specifier of the generated module: '@/...' under src/, else root-relative"""
+    rel_path = Path(module_path).relative_to(root_path).with_suffix('').as_posix()
+    if rel_path.startswith('src/'):
+        return '@/' + rel_path[len('src/'):]
+    return '/' + rel_path
+
+class SrcsetScanner:
+    """
+    Plans the srcSet/sizes rewrite of one file at a time
+    
+    Called as scan(content, webp_files), like update_images_to_webp's
+    scan_references(), so patch plans are built, reviewed and applied the same
+    way. Variant widths are read from file headers once and cached.
+    """
+    
+    def __init__(self, root_dir, sizes=DEFAULT_SIZES, module_path=None):
+        self.root_path = Path(root_dir)
+        self.sizes = sizes
+        module_path = Path(module_path or self.root_path / GENERATED_MODULE)
+        
+        # <Image> tags are only pointed at a loader that exists
+        self.loader_specifier = None
+        if module_path.exists():
+            self.loader_specifier = module_specifier(module_path.absolute(),
+                                                     self.root_path.absolute())
+        
+        self._webp_files = None
+        self._groups = {}
+        self._widths = {}
+    
+    def variant_groups(self, webp_files):
+        """
+        Full-size WebP path -> (its path on disk, paths of its smaller
+        variants), relative to the root; keyed without content hashes, so
+        hashed outputs are grouped by their plain names
+        """
+        if webp_files is not self._webp_files:
+            groups = {}
+            on_disk = {}
+            for rel_path in webp_files:
+                plain_path = plain_name(rel_path)
+                on_disk[plain_path] = rel_path
+                match = VARIANT_NAME_RE.match(posixpath.basename(plain_path))
+                if match:
+                    full_size = posixpath.join(posixpath.dirname(rel_path), match.group(1) + '.webp')
+                    groups.setdefault(full_size, []).append(rel_path)
+            
+            self._groups = {full_size: (on_disk[full_size], variants)
+                            for full_size, variants in groups.items() if full_size in on_disk}
+            self._webp_files = webp_files
+        
+        return self._groups
+    
+    def width(self, rel_path):
+        """Width of a WebP file from its header, or None if it can't be read"""
+        if rel_path not in self._widths:
+            try:
+                with Image.open(self.root_path / rel_path) as img:
+                    self._widths[rel_path] = img.size[0]
+            except OSError:
+                self._widths[rel_path] = None
+        return self._widths[rel_path]
+    
+    def candidates(self, src, webp_files):
+        """
+        srcSet candidates for an image reference, as written in the code
+        
+        Returns:
+            list: (url, width) pairs, narrowest first, or None if the image has
+                  no smaller variants
+        """
+        webp_src = src if src.lower().endswith('.webp') else get_webp_equivalent(src)
+        if not webp_src:
+            return None
+        
+        groups = self.variant_groups(webp_files)
+        for rel_path in (webp_src.lstrip('/'),
+                         'public' + webp_src if webp_src.startswith('/') else None):
+            if not rel_path or plain_name(rel_path) not in groups:
+                continue
+            
+            # Candidates keep the URL prefix the reference was written with
+            prefix = webp_src[:webp_src.rfind('/') + 1]
+            full_size, variants = groups[plain_name(rel_path)]
+            widths = {}
+            for path in [full_size] + variants:
+                width = self.width(path)
+                if width and width not in widths:
+                    widths[width] = prefix + posixpath.basename(path)
+            
+            if len(widths) < 2:
+                return None
+            return [(widths[width], width) for width in sorted(widths)]
+        
+        return None
+    
+    def __call__(self, content, webp_files):
+        """
+        Find image tags to upgrade, in a single pass
+        
+        Returns:
+            tuple: (new content, changes in file order; see splice_edits())
+        """
+        if '<img' not in content and '<Image' not in content:
+            return content, []
+        
+        edits = []
+        for match in TAG_RE.finditer(content):
+            tag_name, attributes = match.group(1), match.group(2)
+            if RESPONSIVE_ATTR_RE.search(attributes):
+                continue
+            
+            src_match = SRC_RE.search(attributes)
+            if not src_match:
+                continue
+            if tag_name == 'Image' and not self.loader_specifier:
+                continue
+            
+            src = next(group for group in src_match.groups() if group)
+            candidates = self.candidates(src, webp_files)
+            if not candidates:
+                continue
+            
+            if tag_name == 'img':
+                srcset = ', '.join(f"{url} {width}w" for url, width in candidates)
+                added = [f'srcSet="{srcset}"']
+                summary = f"srcSet ({len(candidates)} widths)"
+            else:
+                added = [f'loader={{{LOADER_NAME}}}']
+                summary = f"{LOADER_NAME} ({len(candidates)} widths)"
+            if not SIZES_ATTR_RE.search(attributes):
+                added.append(f'sizes="{self.sizes}"')
+            
+            # New attributes follow src, on their own lines if src is on its own line
+            before_src = attributes[:src_match.start()]
+            if '\n' in before_src:
+                separator = before_src[before_src.rfind('\n'):]
+            else:
+                separator = ' '
+            
+            insert_at = match.start(2) + src_match.end()
+            edits.append((insert_at, insert_at, ''.join(separator + attribute for attribute in added),
+                          {'old': src, 'new': summary, 'type': f'<{tag_name}>'}))
+        
+        if any(details['type'] == '<Image>' for *_, details in edits):
+            import_edit = self.loader_import(content, edits[0][0])
+            if import_edit:
+                edits.insert(0, import_edit)
+        
+        return splice_edits(content, edits)
+    
+    def loader_import(self, content, first_edit):
+        """Edit adding the loader's import after the file's last import, if it has none yet"""
+        if LOADER_IMPORT_RE.search(content):
+            return None
+        
+        imports = [match for match in IMPORT_RE.finditer(content) if match.end() <= first_edit]
+        if not imports:
+            return None
+        
+        # Same quotes and semicolons as the file's own imports
+        last = imports[-1]
+        quote, semicolon = last.group(1), last.group(2)
+        statement = (f"\nimport {{ {LOADER_NAME} }} from "
+                     f"{quote}{self.loader_specifier}{quote}{semicolon}")
+        return (last.end(), last.end(), statement,
+                {'old': '', 'new': self.loader_specifier, 'type': 'import'})
+
+def plan_diff(plan, root_dir):
+    """Unified diff of the changes a patch plan makes, for review"""
+    root_path = Path(root_dir)
+    lines = []
+    
+    for entry in sorted(plan['files'], key=lambda entry: entry['path']):
+        data = (root_path / entry['path']).read_bytes()
+        if hashlib.sha256(data).hexdigest() != entry['sha256']:
+            lines.append(f"# {entry['path']} changed since planning; not shown\n")
+            continue
+        
+        old = data.decode('utf-8').splitlines(keepends=True)
+        new = patched_bytes(data, entry).decode('utf-8').splitlines(keepends=True)
+        lines.extend(difflib.unified_diff(old, new, f"a/{entry['path']}", f"b/{entry['path']}"))
+    
+    return ''.join(lines)
+
+def jsx_files(code_files):
+    """The TSX/JSX files among code files"""
+    return [Path(file_path) for file_path in code_files
+            if Path(file_path).suffix.lower() in JSX_EXTENSIONS]
+
+def update_srcset(root_dir, dry_run=True, webp_files=None, code_files=None,
+                  sizes=DEFAULT_SIZES, plan=None, show_diff=True, module_path=None):
+    """
+    Upgrade image tags in TSX/JSX files to the responsive variants
+    
+    Args:
+        root_dir: Root directory of the project
+        dry_run: Only report (and diff) the changes, don't write them
+        webp_files: WebP paths relative to root_dir, if already known
+        code_files: Code file paths, if already known; only TSX/JSX ones are scanned
+        sizes: sizes attribute for tags that have none
+        plan: Patch plan from an earlier dry run to apply instead of scanning again
+        show_diff: Print a unified diff of a dry run's changes
+        module_path: Generated image module <Image> tags get their loader from,
+                     if not at the default location
+    
+    Returns:
+        dict: The patch plan (when applying, the changes actually made)
+    """
+    root_path = Path(root_dir)
+    if webp_files is None or code_files is None:
+        inventory = walk_tree(root_path)
+        webp_files = inventory.webp_set() if webp_files is None else webp_files
+        code_files = inventory.code_paths() if code_files is None else code_files
+    
+    scanner = SrcsetScanner(root_path, sizes, module_path)
+    if not scanner.loader_specifier:
+        print(f"   ℹ️  No generated image module: <Image> tags are left alone")
+    
+    start = time.perf_counter()
+    plan = update_all_files(root_path, dry_run, webp_files, jsx_files(code_files), plan,
+                            scan=scanner, mode='srcset')
+    print(f"⏱️  Responsive image rewrite planned in {(time.perf_counter() - start)*1000:.0f}ms")
+    
+    if dry_run and show_diff and plan['files']:
+        print("\n" + plan_diff(plan, root_path))
+    
+    return plan
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Point <img> and <Image> tags in TSX/JSX files at the responsive variants")
+    parser.add_argument('root', nargs='?', default='.', help="project root (default: current directory)")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="apply the changes without asking for confirmation")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"sizes attribute for tags that have none (default {DEFAULT_SIZES})")
+    parser.add_argument('--plan-out', metavar='PATH',
+                        help="write the dry-run patch plan to PATH as JSON and stop")
+    parser.add_argument('--apply-plan', metavar='PATH',
+                        help="apply a patch plan written by --plan-out instead of scanning")
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    args = parse_args()
+    
+    print("\n" + "="*70)
+    print("📐 RESPONSIVE IMAGE REFERENCES")
+    print("="*70)
+    
+    if not Path(args.root).is_dir():
+        print(f"❌ Error: Directory '{args.root}' does not exist")
+        sys.exit(1)
+    
+    if args.apply_plan:
+        print(f"\n📥 Applying patch plan: {args.apply_plan}")
+        update_srcset(args.root, dry_run=False, sizes=args.sizes,
+                      plan=load_patch_plan(args.apply_plan, mode='srcset'))
+        print("✨ Done!")
+        return
+    
+    plan = update_srcset(args.root, dry_run=True, sizes=args.sizes)
+    files_modified, total_changes = plan_totals(plan)
+    
+    if args.plan_out:
+        save_patch_plan(plan, args.plan_out)
+        print(f"💾 Patch plan written to {args.plan_out} (apply it with --apply-plan)")
+        return
+    
+    if files_modified == 0:
+        print("✨ No changes needed! No image tags with responsive variants to upgrade.")
+        return
+    
+    print(f"\n⚠️  This will modify {files_modified} files and upgrade {total_changes} image tags.")
+    if not args.yes:
+        response = input("\n🚀 Proceed with actual update? (y/n): ").lower().strip()
+        
+        if response != 'y':
+            print("❌ Update cancelled")
+            return
+    
+    update_srcset(args.root, dry_run=False, sizes=args.sizes, plan=plan)
+    print("✨ Done!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Synthetic Benchmark Corpus
+Generates a reproducible project of photographic and flat images in every
+source format, plus TSX and CSS files referencing them, for benchmarking
+"""
+
+import json
+import random
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from tree_walker import SUPPORTED_FORMATS
+
+# Default image resolutions, from a thumbnail-sized upload to a camera original
+DEFAULT_RESOLUTIONS = [(640, 480), (1280, 960), (2400, 1600)]
+
+# Flat graphics are drawn from a small palette, like logos and UI screenshots
+FLAT_PALETTE = [(255, 255, 255), (33, 37, 41), (13, 110, 253), (220, 53, 69),
+                (25, 135, 84), (255, 193, 7)]
+
+# Photographs are smooth colour fields (upscaled from a grid of this many
+# pixels per cell) overlaid with per-pixel grain, so they compress like photos
+PHOTO_CELL = 24
+PHOTO_GRAIN = 0.12
+
+# File describing how a corpus was generated, written at its root
+CORPUS_FILENAME = 'corpus.json'
+
+# Bump when the corpus files are named or drawn differently; kept corpora
+# and baselines from another layout are then regenerated and not compared
+CORPUS_LAYOUT = 2
+
+def photo_image(size, rng):
+    """Photograph-like RGB image: smooth colour variation plus sensor-like grain"""
+    width, height = size
+    grid = (width // PHOTO_CELL + 2, height // PHOTO_CELL + 2)
+    
+    base = Image.frombytes('RGB', grid, rng.randbytes(grid[0] * grid[1] * 3))
+    base = base.resize(size, Image.Resampling.BICUBIC)
+    grain = Image.frombytes('L', size, rng.randbytes(width * height)).convert('RGB')
+    
+    return Image.blend(base, grain, PHOTO_GRAIN)
+
+def flat_image(size, rng):
+    """Flat graphic: solid shapes in a handful of colours on a transparent background"""
+    width, height = size
+    img = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    
+    for _ in range(12):
+        x0, x1 = sorted(rng.randrange(width) for _ in range(2))
+        y0, y1 = sorted(rng.randrange(height) for _ in range(2))
+        shape = draw.rectangle if rng.random() < 0.5 else draw.ellipse
+        shape((x0, y0, x1, y1), fill=rng.choice(FLAT_PALETTE) + (255,))
+    
+    return img
+
+def save_corpus_image(img, path):
+    """Save an image in the format its extension implies, in a mode that format supports"""
+    suffix = path.suffix.lower()
+    
+    if suffix == '.png':
+        img.save(path, optimize=False)
+    elif suffix == '.gif':
+        img.convert('RGB').quantize(256).save(path)
+    elif suffix in ('.jpg', '.jpeg'):
+        img.convert('RGB').save(path, quality=90)
+    else:
+        img.convert('RGB').save(path)
+
+def code_file(kind, index, image_urls, lines, density, rng):
+    """
+    One TSX or CSS file of the given length, with an image reference on about density of its lines
+    
+    Returns:
+        tuple: (content, number of references)
+    """
+    out = []
+    references = 0
+    
+    if kind == 'tsx':
+        out.append("import React from 'react';\n\n")
+        out.append(f"export default function Section{index}() {{\n  return (\n    <div>\n")
+    
+    for line in range(lines):
+        if rng.random() < density:
+            url = rng.choice(image_urls)
+            references += 1
+            if kind == 'tsx':
+                out.append(f'      <img src="{url}" alt="Item {line}" loading="lazy" />\n')
+            else:
+                out.append(f'.item-{index}-{line} {{ background: url({url}) no-repeat center; }}\n')
+        elif kind == 'tsx':
+            out.append(f'      <p className="text-sm text-gray-500">Line {line} of section {index}</p>\n')
+        else:
+            out.append(f'.item-{index}-{line} {{ margin: {line % 16}px; color: #{line % 4096:03x}; }}\n')
+    
+    if kind == 'tsx':
+        out.append("    </div>\n  );\n}\n")
+    
+    return ''.join(out), references
+
+def generate_corpus(dest_dir, seed=0, resolutions=None, copies=1, code_files=20,
+                    lines_per_file=200, reference_density=0.2, missing_ratio=0.1):
+    """
+    Write a synthetic project into dest_dir
+    
+    Every combination of source format, content kind (photo, flat) and
+    resolution is generated copies times under public/images/. The same
+    arguments always produce byte-identical files.
+    
+    Args:
+        dest_dir: Directory to write the project into
+        seed: Random seed
+        resolutions: (width, height) pairs; defaults to DEFAULT_RESOLUTIONS
+        copies: Number of distinct images per format/kind/resolution
+        code_files: Number of code files, alternating TSX and CSS
+        lines_per_file: Lines of content per code file
+        reference_density: Fraction of code lines holding an image reference
+        missing_ratio: Fraction of references to images that don't exist,
+                       which the rewriter must leave alone
+    
+    Returns:
+        dict: The generation parameters and totals, also written to CORPUS_FILENAME
+    """
+    rng = random.Random(seed)
+    resolutions = [tuple(size) for size in (resolutions or DEFAULT_RESOLUTIONS)]
+    root_path = Path(dest_dir)
+    image_dir = root_path / 'public' / 'images'
+    image_dir.mkdir(parents=True, exist_ok=True)
+    
+    image_urls = []
+    image_bytes = 0
+    for suffix in sorted(SUPPORTED_FORMATS):
+        for kind, draw in (('photo', photo_image), ('flat', flat_image)):
+            for width, height in resolutions:
+                for copy in range(copies):
+                    # The format is part of the stem, so every file gets its own WebP
+                    image_path = image_dir / f"{kind}-{width}x{height}-{copy}-{suffix[1:]}{suffix}"
+                    save_corpus_image(draw((width, height), rng), image_path)
+                    image_bytes += image_path.stat().st_size
+                    image_urls.append(f"/images/{image_path.name}")
+    
+    missing_count = max(1, round(len(image_urls) * missing_ratio)) if missing_ratio else 0
+    reference_urls = image_urls + [f"/images/missing-{index}.jpg" for index in range(missing_count)]
+    
+    references = 0
+    code_bytes = 0
+    for index in range(code_files):
+        kind = 'tsx' if index % 2 == 0 else 'css'
+        folder = root_path / 'src' / ('components' if kind == 'tsx' else 'styles')
+        folder.mkdir(parents=True, exist_ok=True)
+        
+        content, count = code_file(kind, index, reference_urls, lines_per_file,
+                                   reference_density, rng)
+        code_path = folder / f"section-{index}.{kind}"
+        code_path.write_text(content, encoding='utf-8')
+        references += count
+        code_bytes += len(content.encode('utf-8'))
+    
+    corpus = {
+        'layout': CORPUS_LAYOUT,
+        'seed': seed,
+        'resolutions': [list(size) for size in resolutions],
+        'copies': copies,
+        'code_files': code_files,
+        'lines_per_file': lines_per_file,
+        'reference_density': reference_density,
+        'missing_ratio': missing_ratio,
+        'images': len(image_urls),
+        'image_bytes': image_bytes,
+        'references': references,
+        'code_bytes': code_bytes,
+    }
+    
+    with open(root_path / CORPUS_FILENAME, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, indent=2)
+    
+    return corpus
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Project Tree Walker
+Walks the project once with os.scandir, pruning excluded and .gitignored
+folders before descending into them, and sorts what it finds into the
+images, WebP files, fonts and code files every stage works from
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Source image formats the converters read
+SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
+
+# Font formats the font stage subsets to WOFF2
+FONT_EXTENSIONS = {'.ttf', '.otf'}
+
+# File extensions that may reference images
+CODE_EXTENSIONS = {'.tsx', '.ts', '.jsx', '.js', '.css', '.scss', '.json', '.md', '.webmanifest'}
+
+# Folders never walked into
+EXCLUDE_FOLDERS = {'node_modules', '.git', '.next', 'out', '__pycache__', 'venv'}
+
+@dataclass(frozen=True)
+class FileEntry:
+    """A file found by the walk, with the stat result taken at the time"""
+    path: Path
+    rel_path: str  # Relative to the root, with forward slashes
+    stat: os.stat_result
+
+@dataclass
+class Inventory:
+    """Everything one walk of the project found, in walk order"""
+    root: Path
+    images: list = field(default_factory=list)
+    webp_files: list = field(default_factory=list)
+    code_files: list = field(default_factory=list)
+    fonts: list = field(default_factory=list)
+    ignore_rules: 'IgnoreRules' = None  # Rules the walk was pruned with, if any
+    
+    def image_paths(self):
+        """Paths of all source-format images"""
+        return [entry.path for entry in self.images]
+    
+    def code_paths(self):
+        """Paths of all code files"""
+        return [entry.path for entry in self.code_files]
+    
+    def webp_set(self):
+        """WebP paths relative to the root, as update_all_files expects"""
+        return {entry.rel_path for entry in self.webp_files}
+    
+    def stats(self):
+        """Cached stat results of every file, keyed by path"""
+        return {entry.path: entry.stat
+                for entries in (self.images, self.webp_files, self.code_files, self.fonts)
+                for entry in entries}
+
+def _glob_to_regex(pattern):
+    """Translate a .gitignore glob (with ** support) to a regex over slash-separated paths"""
+    regex = []
+    index = 0
+    
+    while index < len(pattern):
+        char = pattern[index]
+        
+        if pattern.startswith('**/', index):
+            regex.append('(?:.*/)?')
+            index += 3
+            continue
+        if pattern.startswith('/**', index) and index + 3 == len(pattern):
+            regex.append('/.*')
+            index += 3
+            continue
+        
+        if char == '*':
+            regex.append('[^/]*')
+        elif char == '?':
+            regex.append('[^/]')
+        elif char == '[':
+            close = pattern.find(']', index + 1)
+            if close == -1:
+                regex.append(re.escape(char))
+            else:
+                body = pattern[index + 1:close]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                regex.append(f'[{body}]')
+                index = close
+        elif char == '\\' and index + 1 < len(pattern):
+            index += 1
+            regex.append(re.escape(pattern[index]))
+        else:
+            regex.append(re.escape(char))
+        index += 1
+    
+    return re.compile(''.join(regex) + r'\Z')
+
+class IgnoreRules:
+    """
+    The subset of .gitignore semantics needed to prune a walk
+    
+    Supports comments, negation, directory-only patterns, anchored patterns
+    and ** wildcards. Each .gitignore applies to its own directory and below;
+    later rules override earlier ones.
+    """
+    
+    def __init__(self):
+        self._rules = []
+    
+    def add_file(self, gitignore_path, base):
+        """
+        Load the rules from a .gitignore file
+        
+        Args:
+            gitignore_path: Path of the .gitignore file
+            base: Its directory relative to the root ('' for the root itself)
+        """
+        try:
+            with open(gitignore_path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            return
+        
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            
+            # A slash anywhere but the end anchors the pattern to its .gitignore's directory
+            anchored = '/' in line
+            line = line.lstrip('/')
+            if not line:
+                continue
+            
+            self._rules.append((base, _glob_to_regex(line), anchored, negate, dir_only))
+    
+    def is_ignored(self, rel_path, is_dir):
+        """Check a path relative to the root against every rule that applies to it"""
+        ignored = False
+        
+        for base, regex, anchored, negate, dir_only in self._rules:
+            if dir_only and not is_dir:
+                continue
+            
+            if base:
+                if not rel_path.startswith(base + '/'):
+                    continue
+                path = rel_path[len(base) + 1:]
+            else:
+                path = rel_path
+            
+            target = path if anchored else path.rsplit('/', 1)[-1]
+            if regex.match(target):
+                ignored = not negate
+        
+        return ignored
+    
+    def excludes(self, rel_path):
+        """Check whether a walk would skip a file, because it or a folder above it is ignored"""
+        parts = rel_path.split('/')
+        
+        for depth in range(1, len(parts)):
+            if self.is_ignored('/'.join(parts[:depth]), True):
+                return True
+        
+        return self.is_ignored(rel_path, False)
+
+def walk_tree(root_dir, exclude_folders=EXCLUDE_FOLDERS, use_gitignore=True):
+    """
+    Walk the project once and sort its files into an inventory
+    
+    Directories are visited top-down in listing order, like os.walk, and
+    excluded or ignored ones are never opened.
+    
+    Args:
+        root_dir: Project root directory
+        exclude_folders: Folder names to skip wherever they appear
+        use_gitignore: Also skip whatever the project's .gitignore files ignore
+    
+    Returns:
+        Inventory
+    """
+    root_path = Path(root_dir)
+    rules = IgnoreRules() if use_gitignore else None
+    inventory = Inventory(root_path, ignore_rules=rules)
+    pending = [(os.fspath(root_path), '')]
+    
+    while pending:
+        dir_path, rel_dir = pending.pop()
+        
+        if rules is not None:
+            rules.add_file(os.path.join(dir_path, '.gitignore'), rel_dir)
+        
+        try:
+            with os.scandir(dir_path) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+        
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            
+            if is_dir:
+                if entry.name in exclude_folders:
+                    continue
+                if rules is not None and rules.is_ignored(rel_path, True):
+                    continue
+                subdirs.append((entry.path, rel_path))
+                continue
+            
+            suffix = os.path.splitext(entry.name)[1].lower()
+            if suffix in SUPPORTED_FORMATS:
+                bucket = inventory.images
+            elif suffix == '.webp':
+                bucket = inventory.webp_files
+            elif suffix in CODE_EXTENSIONS:
+                bucket = inventory.code_files
+            elif suffix in FONT_EXTENSIONS:
+                bucket = inventory.fonts
+            else:
+                continue
+            
+            if rules is not None and rules.is_ignored(rel_path, False):
+                continue
+            
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            
+            bucket.append(FileEntry(Path(entry.path), rel_path, stat))
+        
+        # Reversed onto the stack so subdirectories are visited in listing order
+        pending.extend(reversed(subdirs))
+    
+    return inventory
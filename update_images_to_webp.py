@@ -4,45 +4,60 @@ Update Image References to WebP
 Automatically updates all image references in code to use WebP versions if available
 """
 
+import argparse
+import hashlib
+import json
 import os
+import posixpath
 import re
+from bisect import bisect_right
 from pathlib import Path
 from collections import defaultdict
 
-# File extensions to search in
-CODE_EXTENSIONS = {'.tsx', '.ts', '.jsx', '.js', '.css', '.scss', '.json', '.md'}
+from hashed_names import HEADERS_SNIPPET, current_names, plain_name
+from image_manifest import MANIFEST_FILENAME, get_section, load_manifest
+from tree_walker import EXCLUDE_FOLDERS, walk_tree
 
 # Image extensions to replace
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
 
-# Folders to exclude
-EXCLUDE_FOLDERS = {'node_modules', '.git', '.next', 'out', '__pycache__', 'venv'}
+# Patterns to match image references, with the image path as their first group
+# and {extensions} standing for the extensions matched
+# Matches: src="/path/image.jpg", src='/path/image.jpg', url(/path/image.jpg), etc.
+REFERENCE_PATTERNS = [
+    (r'src\s*=\s*["\']([^"\']+\.(?:{extensions}))["\']', 'src attribute'),
+    (r'href\s*=\s*["\']([^"\']+\.(?:{extensions}))["\']', 'href attribute'),
+    (r'url\(["\']?([^)"\']+\.(?:{extensions}))["\']?\)', 'CSS url()'),
+    (r'image\s*:\s*["\']([^"\']+\.(?:{extensions}))["\']', 'image property'),
+    (r'backgroundImage\s*:\s*["\']url\(([^)]+\.(?:{extensions}))\)["\']', 'backgroundImage'),
+]
 
-def should_skip_directory(path):
-    """Check if directory should be skipped"""
-    parts = Path(path).parts
-    return any(excluded in parts for excluded in EXCLUDE_FOLDERS)
+# Extensions of the images whose references are rewritten
+REWRITTEN_EXTENSIONS = 'jpg|jpeg|png|gif|bmp'
+
+def reference_regex(patterns, extensions):
+    """
+    Compile reference patterns into one alternation, so each file is scanned
+    in a single pass; each pattern is wrapped in an outer group around its
+    path group
+    """
+    return re.compile('|'.join(f"({pattern.replace('{extensions}', extensions)})"
+                               for pattern, _ in patterns), re.IGNORECASE)
+
+REFERENCE_RE = reference_regex(REFERENCE_PATTERNS, REWRITTEN_EXTENSIONS)
+
+NEWLINE_RE = re.compile('\n')
+
+# Any path to a generated output, wherever it appears (attributes, srcSet
+# lists, strings), as content-hashed names have to be followed everywhere
+OUTPUT_REFERENCE_RE = re.compile(r'[^\s"\'`()<>{},=]+\.(?:webp|avif)(?![\w.-])', re.IGNORECASE)
+
+# Bump when the patch plan layout changes; older plans are rejected
+PLAN_VERSION = 1
 
 def find_webp_files(root_dir):
-    """Find all WebP files in the project"""
-    webp_files = set()
-    root_path = Path(root_dir)
-    
-    for dirpath, dirnames, filenames in os.walk(root_path):
-        if should_skip_directory(dirpath):
-            dirnames[:] = []
-            continue
-        
-        dirnames[:] = [d for d in dirnames if d not in EXCLUDE_FOLDERS]
-        
-        for filename in filenames:
-            if filename.endswith('.webp'):
-                file_path = Path(dirpath) / filename
-                # Store relative path from root
-                rel_path = file_path.relative_to(root_path)
-                webp_files.add(str(rel_path).replace('\\', '/'))
-    
-    return webp_files
+    """Find all WebP files in the project, as paths relative to root_dir"""
+    return walk_tree(root_dir).webp_set()
 
 def get_webp_equivalent(image_path):
     """Get the WebP equivalent path for an image"""
@@ -51,6 +66,175 @@ def get_webp_equivalent(image_path):
             return image_path[:-len(ext)] + '.webp'
     return None
 
+def find_webp_reference(image_path, webp_files):
+    """
+    WebP path to use in place of an image reference, if a WebP version exists
+    
+    Returns:
+        The referenced path with a .webp extension, or None
+    """
+    webp_path = get_webp_equivalent(image_path)
+    
+    if webp_path:
+        # Check various path formats: relative to the root, as written, and
+        # root-relative URLs served from public/
+        check_paths = [
+            webp_path.lstrip('/'),  # Remove leading slash
+            webp_path,
+            'public' + webp_path if webp_path.startswith('/') else None,
+        ]
+        
+        for check_path in check_paths:
+            if check_path and check_path in webp_files:
+                return webp_path
+    
+    return None
+
+def line_starts(content):
+    """Offsets at which each line of content starts, for bisect lookups"""
+    return [0] + [match.end() for match in NEWLINE_RE.finditer(content)]
+
+def splice_edits(content, edits):
+    """
+    Apply text edits to content and describe them as patch plan changes
+    
+    Args:
+        content: File content
+        edits: (start, end, replacement, details) tuples in file order, with
+               character offsets; details holds the change's 'old', 'new' and 'type'
+    
+    Returns:
+        tuple: (new content, changes with their line and UTF-8 byte span, so
+                they can be applied later without scanning again)
+    """
+    if not edits:
+        return content, []
+    
+    pieces = []
+    changes = []
+    last_end = 0
+    last_end_byte = 0
+    starts = line_starts(content)
+    
+    for start, end, replacement, details in edits:
+        gap = content[last_end:start]
+        pieces.append(gap)
+        pieces.append(replacement)
+        
+        start_byte = last_end_byte + len(gap.encode('utf-8'))
+        last_end_byte = start_byte + len(content[start:end].encode('utf-8'))
+        last_end = end
+        
+        changes.append({
+            'line': bisect_right(starts, start),
+            **details,
+            'start': start_byte,
+            'end': last_end_byte,
+            'replacement': replacement,
+        })
+    
+    pieces.append(content[last_end:])
+    return ''.join(pieces), changes
+
+def scan_references(content, webp_files):
+    """
+    Find image references that have a WebP version, in a single pass
+    
+    Where two patterns match overlapping text, the leftmost match is used.
+    
+    Returns:
+        tuple: (new content, changes in file order; see splice_edits())
+    """
+    edits = []
+    resolved = {}
+    
+    for match in REFERENCE_RE.finditer(content):
+        # Each pattern is wrapped in an outer group around its path group
+        outer = match.lastindex
+        image_path = match.group(outer + 1)
+        
+        if image_path not in resolved:
+            resolved[image_path] = find_webp_reference(image_path, webp_files)
+        webp_path = resolved[image_path]
+        
+        if not webp_path:
+            continue
+        
+        replacement = match.group(0).replace(image_path, webp_path)
+        edits.append((match.start(), match.end(), replacement, {
+            'old': image_path,
+            'new': webp_path,
+            'type': REFERENCE_PATTERNS[(outer - 1) // 2][1],
+        }))
+    
+    return splice_edits(content, edits)
+
+class HashedReferenceScanner:
+    """
+    Points references at the content-hashed outputs recorded in the manifest
+    
+    Called as scan(content, webp_files), like scan_references(). Source
+    images are found with the same patterns scan_references() uses and
+    pointed at their full-size variant; references to an output by its plain
+    name or an earlier hash are found anywhere and pointed at its current name.
+    """
+    
+    def __init__(self, section):
+        self.current = current_names(section)
+    
+    def resolve(self, reference, source):
+        """
+        Current hashed name to use in place of a reference, or None
+        
+        Paths are checked as find_webp_reference() checks them: relative to
+        the root and served from public/. The reference's folder, query and
+        fragment are kept.
+        """
+        path, suffix = re.match(r'([^?#]*)(.*)', reference).groups()
+        output = get_webp_equivalent(path) if source else path
+        if not output:
+            return None
+        
+        for check_path in (output.lstrip('/'), 'public' + output if output.startswith('/') else None):
+            if not check_path:
+                continue
+            current = self.current.get(plain_name(check_path))
+            if current and current != check_path:
+                return path[:path.rfind('/') + 1] + posixpath.basename(current) + suffix
+        
+        return None
+    
+    def __call__(self, content, webp_files):
+        """
+        Find references to rename, in a single pass per kind
+        
+        Returns:
+            tuple: (new content, changes in file order; see splice_edits())
+        """
+        edits = []
+        
+        for match in REFERENCE_RE.finditer(content):
+            outer = match.lastindex
+            image_path = match.group(outer + 1)
+            new_path = self.resolve(image_path, source=True)
+            if new_path:
+                start = match.start(outer + 1)
+                edits.append((start, match.end(outer + 1), new_path, {
+                    'old': image_path, 'new': new_path,
+                    'type': REFERENCE_PATTERNS[(outer - 1) // 2][1]}))
+        
+        for match in OUTPUT_REFERENCE_RE.finditer(content):
+            new_path = self.resolve(match.group(0), source=False)
+            if new_path:
+                edits.append((match.start(), match.end(), new_path, {
+                    'old': match.group(0), 'new': new_path, 'type': 'hashed name'}))
+        
+        return splice_edits(content, sorted(edits, key=lambda edit: edit[0]))
+
+def referenced_images(content):
+    """Image paths referenced in content, as written, in file order"""
+    return [match.group(match.lastindex + 1) for match in REFERENCE_RE.finditer(content)]
+
 def update_file_content(file_path, webp_files, dry_run=True):
     """
     Update image references in a file to use WebP
@@ -59,108 +243,187 @@ def update_file_content(file_path, webp_files, dry_run=True):
         tuple: (was_modified, changes_made)
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        original_content = content
-        changes = []
-        
-        # Pattern to match image references
-        # Matches: src="/path/image.jpg", src='/path/image.jpg', url(/path/image.jpg), etc.
-        patterns = [
-            (r'src\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp))["\']', 'src attribute'),
-            (r'href\s*=\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp))["\']', 'href attribute'),
-            (r'url\(["\']?([^)"\']+\.(?:jpg|jpeg|png|gif|bmp))["\']?\)', 'CSS url()'),
-            (r'image\s*:\s*["\']([^"\']+\.(?:jpg|jpeg|png|gif|bmp))["\']', 'image property'),
-            (r'backgroundImage\s*:\s*["\']url\(([^)]+\.(?:jpg|jpeg|png|gif|bmp))\)["\']', 'backgroundImage'),
-        ]
+        # Read as bytes so the byte spans in changes match the file on disk
+        content = Path(file_path).read_bytes().decode('utf-8')
         
-        for pattern, pattern_type in patterns:
-            matches = list(re.finditer(pattern, content, re.IGNORECASE))
-            
-            for match in reversed(matches):  # Reverse to maintain positions
-                image_path = match.group(1)
-                webp_path = get_webp_equivalent(image_path)
-                
-                if webp_path:
-                    # Check if WebP version exists
-                    # Try both absolute and relative path checks
-                    webp_exists = False
-                    
-                    # Check various path formats
-                    check_paths = [
-                        webp_path.lstrip('/'),  # Remove leading slash
-                        webp_path,
-                        'public' + webp_path if webp_path.startswith('/') else None,
-                    ]
-                    
-                    for check_path in check_paths:
-                        if check_path and check_path in webp_files:
-                            webp_exists = True
-                            break
-                    
-                    if webp_exists:
-                        # Replace the image path
-                        old_text = match.group(0)
-                        new_text = old_text.replace(image_path, webp_path)
-                        
-                        start, end = match.span()
-                        content = content[:start] + new_text + content[end:]
-                        
-                        changes.append({
-                            'line': content[:start].count('\n') + 1,
-                            'old': image_path,
-                            'new': webp_path,
-                            'type': pattern_type
-                        })
+        new_content, changes = scan_references(content, webp_files)
         
         # Write changes if not dry run
-        if content != original_content:
+        if new_content != content:
             if not dry_run:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
+                Path(file_path).write_bytes(new_content.encode('utf-8'))
             return True, changes
         
         return False, []
-        
+    
     except Exception as e:
         print(f"❌ Error processing {file_path}: {str(e)}")
         return False, []
 
-def update_all_files(root_dir, dry_run=True):
-    """Update all code files to use WebP images"""
+def find_code_files(root_dir):
+    """Find all code files that may reference images"""
+    return walk_tree(root_dir).code_paths()
+
+def plan_file(file_path, webp_files, scan=scan_references):
+    """
+    Plan the reference changes for one file
+    
+    Args:
+        file_path: Code file to scan
+        webp_files: WebP paths relative to the root
+        scan: Scanner producing the changes, called as scan(content, webp_files)
+    
+    Returns:
+        dict: {'sha256': hash of the file as scanned, 'changes': [...]},
+              or None if the file needs no changes or can't be read
+    """
+    try:
+        data = Path(file_path).read_bytes()
+        _, changes = scan(data.decode('utf-8'), webp_files)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"❌ Error processing {file_path}: {str(e)}")
+        return None
+    
+    if not changes:
+        return None
+    
+    return {'sha256': hashlib.sha256(data).hexdigest(), 'changes': changes}
+
+def build_patch_plan(root_dir, webp_files=None, code_files=None, scan=scan_references,
+                     mode='webp'):
+    """
+    Scan code files for image references that can point at WebP versions
+    
+    Args:
+        root_dir: Root directory of the project
+        webp_files: WebP paths relative to root_dir, if already known
+        code_files: Code file paths to scan, if already known
+        scan: Scanner to plan each file with (see plan_file())
+        mode: Name of the kind of rewrite, recorded in the plan
+    
+    Returns:
+        dict: Patch plan, with one entry per file to change (path relative
+              to root_dir, content hash and changes with byte spans)
+    """
     root_path = Path(root_dir)
     
+    # One walk finds both, when neither was passed in
+    inventory = None
+    if webp_files is None or code_files is None:
+        inventory = walk_tree(root_path)
+    
     print(f"\n🔍 Step 1: Finding WebP files...")
-    webp_files = find_webp_files(root_dir)
+    if webp_files is None:
+        webp_files = inventory.webp_set()
     print(f"   Found {len(webp_files)} WebP files")
     
     print(f"\n🔍 Step 2: Scanning code files...")
+    if code_files is None:
+        code_files = inventory.code_paths()
     
-    files_modified = 0
-    total_changes = 0
-    files_by_type = defaultdict(int)
-    changes_by_file = {}
+    files = []
+    for file_path in code_files:
+        entry = plan_file(file_path, webp_files, scan)
+        if entry:
+            entry['path'] = Path(file_path).relative_to(root_path).as_posix()
+            files.append(entry)
+    
+    return {'version': PLAN_VERSION, 'mode': mode, 'files': files}
+
+def save_patch_plan(plan, plan_path):
+    """Write a patch plan as JSON, for review or to apply later"""
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=1)
+
+def load_patch_plan(plan_path, mode='webp'):
+    """Read a patch plan written by save_patch_plan() for the given kind of rewrite"""
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"unsupported patch plan version: {plan.get('version')}")
+    
+    if plan.get('mode', 'webp') != mode:
+        raise ValueError(f"patch plan is for a {plan.get('mode')} rewrite, not {mode}")
+    
+    return plan
+
+def patched_bytes(data, entry):
+    """A file's content with its planned replacements spliced in"""
+    pieces = []
+    last_end = 0
+    for change in entry['changes']:
+        pieces.append(data[last_end:change['start']])
+        pieces.append(change['replacement'].encode('utf-8'))
+        last_end = change['end']
+    pieces.append(data[last_end:])
+    
+    return b''.join(pieces)
+
+def apply_file_plan(file_path, entry):
+    """
+    Splice a file's planned replacements into it
+    
+    Returns:
+        bool: True if applied, False if the file changed since it was planned
+    """
+    data = Path(file_path).read_bytes()
+    if hashlib.sha256(data).hexdigest() != entry['sha256']:
+        return False
+    
+    # Replaced in one step, so a dev server or deploy never reads a half-written file
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    tmp_path.write_bytes(patched_bytes(data, entry))
+    os.replace(tmp_path, file_path)
+    return True
+
+def apply_patch_plan(plan, root_dir, webp_files=None, scan=scan_references):
+    """
+    Apply a patch plan without rescanning the files it covers
+    
+    Files whose hash no longer matches the plan are scanned again against
+    the WebP files on disk now, and only their current changes applied.
+    
+    Returns:
+        dict: Plan of the changes actually applied
+    """
+    root_path = Path(root_dir)
+    applied = []
     
-    for dirpath, dirnames, filenames in os.walk(root_path):
-        if should_skip_directory(dirpath):
-            dirnames[:] = []
+    for entry in plan['files']:
+        file_path = root_path / entry['path']
+        
+        try:
+            if apply_file_plan(file_path, entry):
+                applied.append(entry)
+                continue
+        except OSError as e:
+            print(f"❌ Error processing {file_path}: {str(e)}")
             continue
         
-        dirnames[:] = [d for d in dirnames if d not in EXCLUDE_FOLDERS]
-        
-        for filename in filenames:
-            file_path = Path(dirpath) / filename
-            
-            if file_path.suffix.lower() in CODE_EXTENSIONS:
-                was_modified, changes = update_file_content(file_path, webp_files, dry_run)
-                
-                if was_modified:
-                    files_modified += 1
-                    total_changes += len(changes)
-                    rel_path = file_path.relative_to(root_path)
-                    changes_by_file[str(rel_path)] = changes
-                    files_by_type[file_path.suffix] += 1
+        # Edited since the plan was made: re-verify just this file
+        if webp_files is None:
+            webp_files = find_webp_files(root_path)
+        
+        fresh = plan_file(file_path, webp_files, scan)
+        print(f"🔁 Changed since planning, re-scanned: {entry['path']}")
+        if fresh and apply_file_plan(file_path, fresh):
+            fresh['path'] = entry['path']
+            applied.append(fresh)
+    
+    return {'version': PLAN_VERSION, 'mode': plan.get('mode', 'webp'), 'files': applied}
+
+def plan_totals(plan):
+    """Number of files and of references a patch plan changes"""
+    return len(plan['files']), sum(len(entry['changes']) for entry in plan['files'])
+
+def print_plan(plan, dry_run=True, reference_kind='image'):
+    """Print the summary and per-file changes of a patch plan"""
+    files_modified, total_changes = plan_totals(plan)
+    files_by_type = defaultdict(int)
+    for entry in plan['files']:
+        files_by_type[Path(entry['path']).suffix] += 1
     
     # Print results
     print("\n" + "="*70)
@@ -172,26 +435,72 @@ def update_all_files(root_dir, dry_run=True):
     
     print(f"\n📊 Summary:")
     print(f"   Files modified: {files_modified}")
-    print(f"   Total image references updated: {total_changes}")
+    print(f"   Total {reference_kind} references updated: {total_changes}")
     
     if files_by_type:
         print(f"\n   Files by type:")
         for ext, count in sorted(files_by_type.items()):
             print(f"      {ext}: {count} files")
     
-    if changes_by_file:
+    if plan['files']:
         print(f"\n📝 Detailed Changes:")
-        for file_path, changes in sorted(changes_by_file.items()):
-            print(f"\n   📄 {file_path}")
-            for change in changes:
+        for entry in sorted(plan['files'], key=lambda entry: entry['path']):
+            print(f"\n   📄 {entry['path']}")
+            for change in entry['changes']:
                 print(f"      Line {change['line']}: {change['old']} → {change['new']}")
     
     print("\n" + "="*70 + "\n")
+
+def update_all_files(root_dir, dry_run=True, webp_files=None, code_files=None, plan=None,
+                     scan=scan_references, mode='webp', reference_kind='image'):
+    """
+    Update all code files to use WebP images
+    
+    Args:
+        root_dir: Root directory of the project
+        dry_run: Only report changes, don't write them
+        webp_files: WebP paths relative to root_dir, if already known
+        code_files: Code file paths to scan, if already known
+        plan: Patch plan from an earlier dry run to apply instead of scanning again
+        scan: Scanner to plan each file with (see plan_file())
+        mode: Name of the kind of rewrite, recorded in the plan
+        reference_kind: What the changed references point at, for the summary
     
-    return files_modified, total_changes
+    Returns:
+        dict: The patch plan (when applying, the changes actually made)
+    """
+    if plan is None:
+        plan = build_patch_plan(root_dir, webp_files, code_files, scan, mode)
+    
+    if not dry_run:
+        plan = apply_patch_plan(plan, root_dir, webp_files, scan)
+    
+    print_plan(plan, dry_run, reference_kind)
+    
+    return plan
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Point image references in code at WebP versions")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="apply the changes without asking for confirmation")
+    parser.add_argument('--plan-out', metavar='PATH',
+                        help="write the dry-run patch plan to PATH as JSON and stop")
+    parser.add_argument('--apply-plan', metavar='PATH',
+                        help="apply a patch plan written by --plan-out instead of scanning")
+    parser.add_argument('--hashed-names', action='store_true',
+                        help="point references at the content-hashed variants recorded in the manifest")
+    parser.add_argument('--manifest', default=MANIFEST_FILENAME,
+                        help=f"build manifest for --hashed-names (default {MANIFEST_FILENAME})")
+    parser.add_argument('--headers-snippet', default=HEADERS_SNIPPET,
+                        help=f"headers snippet written with the hashed names, left alone "
+                             f"(default {HEADERS_SNIPPET})")
+    return parser.parse_args()
 
 def main():
     """Main function"""
+    args = parse_args()
+    
     print("\n" + "="*70)
     print("🔄 UPDATE IMAGE REFERENCES TO WEBP")
     print("="*70)
@@ -201,12 +510,36 @@ def main():
     print(f"\n📂 Working directory: {current_dir}")
     print(f"   Excluding folders: {', '.join(EXCLUDE_FOLDERS)}")
     
+    scan, mode, code_files = scan_references, 'webp', None
+    if args.hashed_names:
+        section = get_section(load_manifest(args.manifest), 'responsive')
+        print(f"   Content-hashed names: {len(section)} images in {args.manifest}")
+        scan, mode = HashedReferenceScanner(section), 'hashed'
+        
+        # The manifest and headers snippet also list retired names, which must stay as they are
+        generated = {Path(path).absolute() for path in (args.manifest, args.headers_snippet)}
+        code_files = [path for path in find_code_files(current_dir)
+                      if path.absolute() not in generated]
+    
+    if args.apply_plan:
+        print(f"\n📥 Applying patch plan: {args.apply_plan}")
+        update_all_files(current_dir, dry_run=False, plan=load_patch_plan(args.apply_plan, mode),
+                         scan=scan, mode=mode)
+        print("✨ Done! All image references have been updated to use WebP format.")
+        return
+    
     # Dry run first
     print("\n" + "="*70)
     print("🧪 RUNNING DRY RUN (Preview only, no changes will be made)")
     print("="*70)
     
-    files_modified, total_changes = update_all_files(current_dir, dry_run=True)
+    plan = update_all_files(current_dir, dry_run=True, code_files=code_files, scan=scan, mode=mode)
+    files_modified, total_changes = plan_totals(plan)
+    
+    if args.plan_out:
+        save_patch_plan(plan, args.plan_out)
+        print(f"💾 Patch plan written to {args.plan_out} (apply it with --apply-plan)")
+        return
     
     if files_modified == 0:
         print("✨ No changes needed! All images are already using WebP or no WebP versions found.")
@@ -214,18 +547,19 @@ def main():
     
     # Ask for confirmation
     print(f"\n⚠️  This will modify {files_modified} files and update {total_changes} image references.")
-    response = input("\n🚀 Proceed with actual update? (y/n): ").lower().strip()
-    
-    if response != 'y':
-        print("❌ Update cancelled")
-        return
+    if not args.yes:
+        response = input("\n🚀 Proceed with actual update? (y/n): ").lower().strip()
+        
+        if response != 'y':
+            print("❌ Update cancelled")
+            return
     
-    # Do actual update
+    # Apply the dry run's plan; only files edited in the meantime are scanned again
     print("\n" + "="*70)
     print("✍️  UPDATING FILES...")
     print("="*70)
     
-    update_all_files(current_dir, dry_run=False)
+    update_all_files(current_dir, dry_run=False, plan=plan, scan=scan, mode=mode)
     
     print("✨ Done! All image references have been updated to use WebP format.")
 
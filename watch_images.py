@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Image Watcher
+Watches the project for new or edited images, generates their WebP variants
+once each one settles and points the code files that reference them at the
+WebP versions, without rescanning the rest of the project
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from breakpoints import DEFAULT_BYTE_STEP
+from convert_to_webp import ENCODER_PROFILES
+from create_responsive_webp import (generate_responsive_images, is_responsive_source,
+                                    require_avif, responsive_fingerprint, variant_paths)
+from generated_images import GENERATED_MODULE, catalog_entry, catalog_from_section, save_module
+from image_manifest import (MANIFEST_FILENAME, cached_details, file_digest, get_section,
+                            is_up_to_date, load_manifest, make_entry, relative_key,
+                            remove_outputs, save_manifest)
+from large_images import DEFAULT_MAX_PIXELS
+from perceptual_quality import DEFAULT_TARGET_SSIM, require_numpy
+from placeholders import PLACEHOLDER_INDEX, load_index, public_path, save_index
+from tree_walker import CODE_EXTENSIONS, EXCLUDE_FOLDERS, walk_tree
+from update_images_to_webp import apply_file_plan, plan_file, referenced_images
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# A change is acted on once the file has gone this long without another one,
+# so a burst of saves, or a copy still being written, triggers one rebuild
+DEBOUNCE_SECONDS = 0.5
+
+# How often the polling fallback re-stats the tree
+POLL_INTERVAL = 1.0
+
+# How often the main loop checks for settled changes
+TICK_SECONDS = 0.1
+
+# Watchdog event types that mean a file's contents may have changed; reads
+# (including the encoder's own) also raise events, which are ignored
+WRITE_EVENTS = {'created', 'modified', 'moved', 'deleted', 'closed'}
+
+class ChangeQueue:
+    """
+    Changed paths, each held back until it has been quiet for the debounce period
+    
+    Filled from the observer thread or the polling loop, drained by the main loop.
+    """
+    
+    def __init__(self, debounce=DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self._changed = {}
+        self._lock = threading.Lock()
+    
+    def add(self, path):
+        """Record a change, restarting the path's quiet period"""
+        with self._lock:
+            self._changed.pop(Path(path), None)
+            self._changed[Path(path)] = time.monotonic()
+    
+    def settled(self):
+        """Remove and return the paths that have been quiet long enough, oldest change first"""
+        now = time.monotonic()
+        
+        with self._lock:
+            ready = [path for path, changed_at in self._changed.items()
+                     if now - changed_at >= self.debounce]
+            for path in ready:
+                del self._changed[path]
+        
+        return ready
+
+def tree_snapshot(inventory):
+    """(mtime_ns, size) of every image and code file in an inventory, keyed by path"""
+    return {entry.path: (entry.stat.st_mtime_ns, entry.stat.st_size)
+            for entries in (inventory.images, inventory.code_files)
+            for entry in entries}
+
+def changed_paths(old, new):
+    """Paths added, modified or removed between two snapshots"""
+    changed = [path for path, signature in new.items() if old.get(path) != signature]
+    changed.extend(path for path in old if path not in new)
+    return changed
+
+def start_observer(root_dir, queue):
+    """
+    Feed file changes under root_dir into queue through watchdog, which uses
+    inotify on Linux (and the native equivalent elsewhere)
+    
+    Returns:
+        The running observer; stop() and join() it when done
+    """
+    class ChangeHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory or event.event_type not in WRITE_EVENTS:
+                return
+            queue.add(os.fsdecode(event.src_path))
+            if getattr(event, 'dest_path', None):
+                queue.add(os.fsdecode(event.dest_path))
+    
+    observer = Observer()
+    observer.schedule(ChangeHandler(), os.fspath(root_dir), recursive=True)
+    observer.start()
+    
+    return observer
+
+class ImageWatcher:
+    """
+    Incremental build state for one project: the WebP files present, which code
+    files reference which image names, and the build manifest
+    
+    Built from a single walk; afterwards only changed files are read.
+    """
+    
+    def __init__(self, root_dir, manifest_path=None, placeholder_index=None, generated_module=None,
+                 fast_resize=False, method=6, target_ssim=None, avif=False, auto_mode=False,
+                 memory_budget_mb=None, max_pixels=DEFAULT_MAX_PIXELS, reject_oversize=False,
+                 breakpoint_step=None, fallbacks=False):
+        self.root_path = Path(root_dir).absolute()
+        self.manifest_path = manifest_path
+        self.encode_settings = {'fast_resize': fast_resize, 'method': method,
+                                'target_ssim': target_ssim, 'avif': avif,
+                                'auto_mode': auto_mode, 'memory_budget_mb': memory_budget_mb,
+                                'max_pixels': max_pixels, 'reject_oversize': reject_oversize,
+                                'breakpoint_step': breakpoint_step, 'fallbacks': fallbacks}
+        self.fingerprint = responsive_fingerprint(method, fast_resize, target_ssim, avif, auto_mode,
+                                                  max_pixels, breakpoint_step, fallbacks)
+        self.latencies = []
+        
+        self.inventory = walk_tree(self.root_path)
+        self.webp_files = self.inventory.webp_set()
+        
+        # Image file name (lowercase) -> code files referencing it, and back
+        self.referrers = {}
+        self.references = {}
+        for file_path in self.inventory.code_paths():
+            self.index_code_file(file_path)
+        
+        if manifest_path:
+            self.manifest = load_manifest(manifest_path)
+            self.section = get_section(self.manifest, 'responsive')
+        
+        # Public path of each full-size WebP -> blur placeholder
+        self.placeholder_index = placeholder_index
+        self.placeholders = load_index(placeholder_index) if placeholder_index else {}
+        
+        # The module describes every image, so it is regenerated from the manifest's records
+        self.generated_module = generated_module if manifest_path else None
+    
+    def index_code_file(self, file_path):
+        """(Re)record the image names a code file references"""
+        for name in self.references.pop(file_path, ()):
+            self.referrers[name].discard(file_path)
+        
+        try:
+            content = file_path.read_bytes().decode('utf-8')
+        except (OSError, UnicodeDecodeError):
+            return
+        
+        names = {Path(image_path).name.lower() for image_path in referenced_images(content)}
+        for name in names:
+            self.referrers.setdefault(name, set()).add(file_path)
+        self.references[file_path] = names
+    
+    def is_watched(self, file_path):
+        """Check a changed path against the folders and .gitignore rules the walk skips"""
+        try:
+            rel_path = file_path.relative_to(self.root_path).as_posix()
+        except ValueError:
+            return False
+        
+        if any(part in EXCLUDE_FOLDERS for part in rel_path.split('/')[:-1]):
+            return False
+        
+        rules = self.inventory.ignore_rules
+        return rules is None or not rules.excludes(rel_path)
+    
+    def build_image(self, image_path):
+        """
+        Generate the variants of a new or edited image and record them
+        
+        Returns:
+            tuple: (source stat, encode seconds), or None if nothing was built
+        """
+        source_stat = image_path.stat()
+        key = relative_key(image_path, self.root_path)
+        cached_qualities = None
+        
+        if self.manifest_path:
+            entry = self.section.get(key)
+            
+            # Touched or re-saved without any change to its pixels
+            if is_up_to_date(entry, image_path, source_stat, self.fingerprint, self.root_path):
+                return None
+            
+            if entry and entry['settings'] == self.fingerprint:
+                cached = cached_details(entry, 'qualities')
+                if cached and cached['sha256'] == file_digest(image_path):
+                    cached_qualities = cached['qualities']
+        
+        report = {}
+        start = time.perf_counter()
+        generated = generate_responsive_images(image_path, overwrite=True,
+                                               cached_qualities=cached_qualities,
+                                               report=report, **self.encode_settings)
+        encode_seconds = time.perf_counter() - start
+        
+        if not generated:
+            return None
+        
+        generated_paths = list(generated.values())
+        generated_paths.extend(report.get('avif', {}).values())
+        output_keys = [relative_key(path, self.root_path) for path in generated_paths]
+        self.webp_files.update(key for key in output_keys if key.endswith('.webp'))
+        self.placeholders[self.placeholder_key(image_path)] = report['placeholder']
+        
+        if self.manifest_path:
+            details = {'placeholder': report['placeholder'],
+                       'image': catalog_entry(report['variants'], self.root_path)}
+            if self.encode_settings['target_ssim'] or self.encode_settings['auto_mode']:
+                details['qualities'] = report['qualities']
+            old_entry = self.section.get(key)
+            
+            # An optimized fallback is recorded as rewritten, so its own change event is a no-op
+            recorded_stat = image_path.stat() if report.get('fallback', {}).get('written') else source_stat
+            self.section[key] = make_entry(recorded_stat, file_digest(image_path),
+                                           self.fingerprint, output_keys, details)
+            
+            # Breakpoint widths follow the pixels, so an edit can retire some variants
+            if old_entry:
+                stale = set(old_entry['outputs']) - set(output_keys)
+                for removed in remove_outputs(sorted(stale), self.root_path):
+                    self.webp_files.discard(removed)
+                    print(f"   🧹 Removed stale variant: {removed}")
+        
+        return source_stat, encode_seconds
+    
+    def placeholder_key(self, image_path):
+        """Placeholder index key of a source image: the public path of its full-size WebP"""
+        return public_path(variant_paths(image_path)['original'], self.root_path)
+    
+    def remove_image(self, image_path):
+        """Remove the variants of a deleted image, if the manifest recorded them"""
+        self.placeholders.pop(self.placeholder_key(image_path), None)
+        if not self.manifest_path:
+            return
+        
+        entry = self.section.pop(relative_key(image_path, self.root_path), None)
+        if not entry:
+            return
+        
+        for removed in remove_outputs(entry['outputs'], self.root_path):
+            print(f"   🧹 Removed orphaned variant: {removed}")
+            self.webp_files.discard(removed)
+    
+    def rewrite_references(self, file_paths):
+        """
+        Point the image references in the given code files at WebP versions
+        
+        Returns:
+            int: Number of references changed
+        """
+        total_changes = 0
+        
+        for file_path in sorted(file_paths):
+            entry = plan_file(file_path, self.webp_files)
+            if not entry or not apply_file_plan(file_path, entry):
+                continue
+            
+            rel_path = relative_key(file_path, self.root_path)
+            print(f"   ✏️  {rel_path}: {len(entry['changes'])} references updated")
+            total_changes += len(entry['changes'])
+        
+        return total_changes
+    
+    def process(self, paths):
+        """Rebuild the settled changed images and rewrite only the code that references them"""
+        built = []
+        removed = False
+        touched_names = set()
+        code_files = set()
+        
+        for file_path in paths:
+            file_path = file_path.absolute()
+            if not self.is_watched(file_path):
+                continue
+            
+            if file_path.suffix.lower() in CODE_EXTENSIONS:
+                # Edited code may reference images that already have WebP versions
+                self.index_code_file(file_path)
+                if file_path.exists():
+                    code_files.add(file_path)
+                continue
+            
+            if not is_responsive_source(file_path):
+                continue
+            
+            if not file_path.exists():
+                print(f"\n🗑️  Deleted: {relative_key(file_path, self.root_path)}")
+                self.remove_image(file_path)
+                removed = True
+                continue
+            
+            try:
+                result = self.build_image(file_path)
+            except OSError as e:
+                print(f"❌ Error processing {file_path}: {str(e)}")
+                continue
+            
+            if result:
+                built.append((file_path, *result))
+                touched_names.add(file_path.name.lower())
+        
+        for name in touched_names:
+            code_files.update(self.referrers.get(name, ()))
+        
+        if code_files:
+            self.rewrite_references(code_files)
+            
+            # Rewritten files now reference the WebP names
+            for file_path in code_files:
+                self.index_code_file(file_path)
+        
+        if (built or removed) and self.generated_module:
+            save_module(self.generated_module, catalog_from_section(self.section, self.root_path))
+        if (built or removed) and self.manifest_path:
+            save_manifest(self.manifest_path, self.manifest)
+        if (built or removed) and self.placeholder_index:
+            save_index(self.placeholder_index, self.placeholders)
+        
+        # From the last save of the source to its variants and references being in place
+        ready = time.time()
+        for file_path, source_stat, encode_seconds in built:
+            latency = ready - source_stat.st_mtime
+            self.latencies.append(latency)
+            print(f"   ⏱️  {file_path.name}: ready {latency:.2f}s after save "
+                  f"(encode {encode_seconds:.2f}s)")
+    
+    def print_summary(self):
+        """Print the images built and their save-to-ready latency"""
+        print("\n" + "="*70)
+        print("📊 WATCH SUMMARY")
+        print("="*70)
+        print(f"✅ Images built: {len(self.latencies)}")
+        
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            median = latencies[len(latencies) // 2]
+            print(f"⏱️  Save to ready: median {median:.2f}s, max {latencies[-1]:.2f}s")
+        print("="*70 + "\n")
+
+def watch(root_dir, manifest_path=None, debounce=DEBOUNCE_SECONDS, interval=POLL_INTERVAL,
+          polling=False, placeholder_index=None, generated_module=None, **encode_settings):
+    """
+    Watch a project and build each image as it is added or edited, until interrupted
+    
+    Args:
+        root_dir: Project root directory
+        manifest_path: Build manifest to keep up to date, or None
+        debounce: Seconds a file must go unchanged before it is processed
+        interval: Seconds between scans when polling
+        polling: Poll even if watchdog (inotify) is available
+        placeholder_index: Blur placeholder index to keep up to date, or None
+        generated_module: TypeScript image module to keep up to date, or None;
+                          needs the manifest
+        **encode_settings: fast_resize, method, target_ssim, avif, auto_mode,
+                           memory_budget_mb, max_pixels, reject_oversize,
+                           breakpoint_step and fallbacks,
+                           as for generate_responsive_images()
+    """
+    watcher = ImageWatcher(root_dir, manifest_path, placeholder_index, generated_module,
+                           **encode_settings)
+    root_path = watcher.root_path
+    observer = None
+    
+    if polling or Observer is None:
+        if Observer is None and not polling:
+            print("💡 watchdog not installed, polling instead of inotify "
+                  "(install it with: pip install watchdog)")
+        
+        # A change only shows up at the next poll, so it must also outlast
+        # one more poll to be known to have settled
+        queue = ChangeQueue(debounce + interval)
+        snapshot = tree_snapshot(watcher.inventory)
+        next_poll = time.monotonic() + interval
+        backend = f"polling every {interval:g}s"
+    else:
+        queue = ChangeQueue(debounce)
+        observer = start_observer(root_path, queue)
+        backend = "filesystem events"
+    
+    print(f"\n👀 Watching {root_path} ({backend}, {debounce:g}s debounce)")
+    print(f"   {len(watcher.inventory.images)} images, {len(watcher.inventory.code_files)} code files")
+    print("   Press Ctrl+C to stop")
+    
+    try:
+        while True:
+            if observer is None and time.monotonic() >= next_poll:
+                new_snapshot = tree_snapshot(walk_tree(root_path))
+                for file_path in changed_paths(snapshot, new_snapshot):
+                    queue.add(file_path)
+                snapshot = new_snapshot
+                next_poll = time.monotonic() + interval
+            
+            settled = queue.settled()
+            if settled:
+                watcher.process(settled)
+            
+            time.sleep(TICK_SECONDS)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+    
+    watcher.print_summary()
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Watch for new or edited images and build their WebP variants as they change")
+    parser.add_argument('root', nargs='?', default='.', help="project root (default: current directory)")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help=f"seconds a file must be unchanged before it is processed (default {DEBOUNCE_SECONDS})")
+    parser.add_argument('--polling', action='store_true',
+                        help="poll the tree instead of using filesystem events")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help=f"seconds between scans when polling (default {POLL_INTERVAL})")
+    parser.add_argument('--manifest', default=MANIFEST_FILENAME,
+                        help=f"build manifest path, relative to the root (default {MANIFEST_FILENAME})")
+    parser.add_argument('--no-manifest', dest='manifest', action='store_const', const=None,
+                        help="don't record builds in the manifest")
+    parser.add_argument('--placeholder-index', default=PLACEHOLDER_INDEX, metavar='PATH',
+                        help=f"blur placeholder index, relative to the root (default {PLACEHOLDER_INDEX})")
+    parser.add_argument('--no-placeholder-index', dest='placeholder_index', action='store_const',
+                        const=None, help="don't keep a placeholder index")
+    parser.add_argument('--image-module', default=GENERATED_MODULE, metavar='PATH',
+                        help=f"TypeScript image module, relative to the root (default {GENERATED_MODULE})")
+    parser.add_argument('--no-image-module', dest='image_module', action='store_const',
+                        const=None, help="don't keep an image module")
+    parser.add_argument('--profile', choices=ENCODER_PROFILES, default='fast',
+                        help="encoder effort profile (default fast)")
+    parser.add_argument('--fast-resize', action='store_true',
+                        help="reduced-scale JPEG decoding and cascaded downscaling "
+                             "for the smaller sizes")
+    parser.add_argument('--target-ssim', type=float, nargs='?', const=DEFAULT_TARGET_SSIM,
+                        help=f"pick each variant's quality to meet this SSIM (default {DEFAULT_TARGET_SSIM})")
+    parser.add_argument('--avif', action='store_true',
+                        help="also generate AVIF versions of every size")
+    parser.add_argument('--auto-mode', action='store_true',
+                        help="pick lossless, lossy-with-alpha or lossy encoding per image")
+    parser.add_argument('--breakpoints', type=float, nargs='?', const=DEFAULT_BYTE_STEP / 1024, metavar='KB',
+                        help=f"pick each image's widths so neighbouring variants differ by KB "
+                             f"(default {DEFAULT_BYTE_STEP / 1024:g}) instead of the fixed sizes")
+    parser.add_argument('--optimize-fallbacks', action='store_true',
+                        help="re-encode JPEG/PNG originals as progressive JPEG / recompressed PNG "
+                             "without metadata")
+    args = parser.parse_args()
+    
+    if args.manifest:
+        args.manifest = os.path.join(args.root, args.manifest)
+    
+    if args.placeholder_index:
+        args.placeholder_index = os.path.join(args.root, args.placeholder_index)
+    
+    if args.image_module:
+        args.image_module = os.path.join(args.root, args.image_module)
+    
+    if args.target_ssim:
+        require_numpy()
+    
+    if args.avif:
+        require_avif()
+    
+    return args
+
+def main():
+    """Main function"""
+    args = parse_args()
+    
+    print("\n" + "="*70)
+    print("👀 IMAGE WATCHER")
+    print("="*70)
+    
+    if not Path(args.root).is_dir():
+        print(f"❌ Error: Directory '{args.root}' does not exist")
+        sys.exit(1)
+    
+    method = ENCODER_PROFILES[args.profile]['method']
+    print(f"\n⚙️  CONFIGURATION:")
+    print(f"   Profile: {args.profile} (method {method})")
+    print(f"   Fast resize: {args.fast_resize}")
+    print(f"   Target SSIM: {args.target_ssim or 'off'}")
+    print(f"   AVIF: {args.avif}")
+    print(f"   Encode mode: {'auto' if args.auto_mode else 'lossy'}")
+    print(f"   Breakpoints: {f'{args.breakpoints:g}KB apart' if args.breakpoints else 'off'}")
+    print(f"   Optimize fallbacks: {args.optimize_fallbacks}")
+    print(f"   Manifest: {args.manifest or 'disabled'}")
+    print(f"   Placeholder index: {args.placeholder_index or 'disabled'}")
+    print(f"   Image module: {(args.image_module or 'disabled') if args.manifest else 'disabled (needs the manifest)'}")
+    
+    watch(args.root, args.manifest, args.debounce, args.interval, args.polling,
+          args.placeholder_index, args.image_module,
+          fast_resize=args.fast_resize, method=method, target_ssim=args.target_ssim,
+          avif=args.avif, auto_mode=args.auto_mode,
+          breakpoint_step=int(args.breakpoints * 1024) if args.breakpoints else None,
+          fallbacks=args.optimize_fallbacks)
+
+if __name__ == "__main__":
+    main()